@@ -2,19 +2,102 @@
 from __future__ import annotations
 
 import logging
+import time
+from bisect import insort
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from operator import attrgetter
+
+import pandas as pd
 
 from bot_trading.application.engine.order_executor import OrderExecutor
-from bot_trading.application.engine.signals import SignalType
+from bot_trading.application.engine.signals import Signal, SignalType
 from bot_trading.application.risk_management import RiskManager
 from bot_trading.application.strategy_registry import StrategyRegistry
 from bot_trading.application.strategies.base import Strategy
+from bot_trading.application.trade_store import TradeStore
 from bot_trading.domain.entities import OrderRequest, SymbolConfig, TradeRecord
 from bot_trading.infrastructure.data_fetcher import MarketDataService
 
 logger = logging.getLogger(__name__)
 
+# Orden de timeframes de menor a mayor y su posición para comparaciones O(1)
+_TF_ORDER = ("M1", "M5", "M15", "M30", "H1", "H4", "D1")
+_TF_INDEX = {tf: idx for idx, tf in enumerate(_TF_ORDER)}
+
+# Tabla de despacho por tipo de señal: True si la orden abre posición, False si
+# la cierra. Los tipos ausentes (HOLD) no generan ninguna orden
+_OPENS_POSITION: dict[SignalType, bool] = {
+    SignalType.BUY: True,
+    SignalType.SELL: True,
+    SignalType.CLOSE: False,
+}
+
+# Duración en minutos y límite de velas por timeframe (compatibles con MT5).
+# IMPORTANTE: Estos valores deben considerar que descargamos desde el timeframe
+# MÍNIMO y lo remuestreamos. Por ello, para timeframes altos usamos ventanas
+# más cortas para no exceder los límites de MT5 al descargar el timeframe base.
+_TF_WINDOW_SPEC = {
+    "M1": (1, 1440),      # 1 día de datos (suficiente para análisis intraday)
+    "M5": (5, 1440),      # 5 días de datos
+    "M15": (15, 1000),    # ~10 días de datos
+    "M30": (30, 720),     # ~15 días de datos
+    "H1": (60, 500),      # ~20 días de datos
+    "H4": (240, 500),     # ~50 días de datos (12000 velas M1 = aprox. 8 días)
+    "D1": (1440, 500),    # ~200 días de datos
+}
+
+
+@lru_cache(maxsize=32)
+def _data_window_for(timeframes: frozenset[str]) -> timedelta:
+    """Calcula (y memoiza) la ventana de datos para un conjunto de timeframes.
+
+    Args:
+        timeframes: Conjunto inmutable de timeframes requeridos.
+
+    Returns:
+        Timedelta con la ventana de datos necesaria.
+    """
+    # Encontrar el timeframe más alto (más lento); los desconocidos cuentan como M1
+    max_tf = "M1"
+    max_minutes, max_candles = _TF_WINDOW_SPEC[max_tf]
+    for tf in timeframes:
+        minutes, candles = _TF_WINDOW_SPEC.get(tf, (1, 500))
+        if minutes > max_minutes:
+            max_minutes, max_candles, max_tf = minutes, candles, tf
+
+    # Ventana = número de velas * duración de cada vela
+    data_window = timedelta(minutes=max_minutes * max_candles)
+
+    logger.debug(
+        "Ventana de datos calculada: %s (%d velas de %s) para timeframes %s",
+        data_window, max_candles, max_tf, sorted(timeframes)
+    )
+    return data_window
+
+    # La ventana solo depende del conjunto de timeframes y los símbolos suelen
+    # compartirlo, por lo que se memoiza a nivel de módulo con lru_cache (la
+    # instancia de TradingBot no es hashable al ser una dataclass con eq). La
+    # duración y el límite de velas de cada timeframe viven en una sola tabla
+    # para resolver ambos valores con una única búsqueda.
+
+
+@lru_cache(maxsize=256)
+def _order_comment(strategy_name: str, timeframe: str) -> str:
+    """Comentario de trazabilidad de las órdenes (pocas combinaciones distintas)."""
+    return f"{strategy_name}-{timeframe}"
+
+
+# Clave de ordenación del historial de trades
+_EXIT_TIME = attrgetter("exit_time")
+
+# Separadores de los logs del bucle sincronizado
+_SEP_EQ = "=" * 80
+_SEP_DASH = "-" * 80
+
 
 @dataclass
 class TradingBot:
@@ -28,183 +111,539 @@ class TradingBot:
     symbols: list[SymbolConfig]
     trade_history: list[TradeRecord] = field(default_factory=list)
     strategy_registry: StrategyRegistry = field(default_factory=StrategyRegistry)
-    
+    max_workers: int = 8  # Hilos máximos para descargar datos y evaluar estrategias
+    _strategy_tfs: dict[str, frozenset[str]] = field(init=False, repr=False)
+    _allowed_symbols_by_strategy: dict[str, frozenset[str] | None] = field(
+        init=False, repr=False
+    )
+    _magic_by_strategy: dict[str, int] = field(init=False, repr=False)
+    _executor: ThreadPoolExecutor | None = field(init=False, repr=False, default=None)
+    _global_required_tfs: frozenset[str] = field(init=False, repr=False)
+    _per_symbol_extra_tfs: dict[str, frozenset[str]] = field(init=False, repr=False)
+    _strategies_by_symbol: dict[str, frozenset[str]] = field(init=False, repr=False)
+    _pairs: list[tuple[SymbolConfig, Strategy]] = field(init=False, repr=False)
+    _fetch_plan: dict[str, tuple[frozenset[str], timedelta]] = field(
+        init=False, repr=False
+    )
+    _strategy_cache_key: tuple[tuple[int, ...], tuple[tuple[int, str], ...]] = field(
+        init=False, repr=False
+    )
+    _trade_keys: set[tuple] = field(init=False, repr=False, default_factory=set)
+    _trade_store: TradeStore = field(init=False, repr=False)
+    # Posiciones abiertas con Magic Number legado (MD5): (símbolo, magic actual)
+    # -> magic legado, para que los CLOSE se envíen con el número real
+    _legacy_close_magic: dict[tuple[str, int], int] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    # Posiciones (símbolo, magic) legadas o desconocidas ya avisadas en el log
+    _reported_magics: set[tuple[str, int]] = field(
+        init=False, repr=False, default_factory=set
+    )
+
     def __post_init__(self) -> None:
         """Inicializa el registro de estrategias después de la construcción."""
-        # Registrar todas las estrategias al iniciar
+        self._refresh_strategy_cache()
+
+        # Claves de los trades ya conocidos para deduplicar en O(1) sin recorrer
+        # el historial completo en cada ciclo
+        self._trade_keys = {t.trade_key for t in self.trade_history}
+        # El historial se mantiene ordenado por cierre (ver _update_trade_history)
+        self.trade_history.sort(key=_EXIT_TIME)
+        # Copia columnar del historial: los límites de riesgo por símbolo y por
+        # estrategia reciben el PnL filtrado con operaciones vectorizadas
+        self._trade_store = TradeStore(self.trade_history)
+
+    def _refresh_strategy_cache(self) -> None:
+        """Precalcula todo lo que depende de la lista de estrategias y símbolos.
+
+        Se ejecuta al construir el bot y, desde run_once, solo si las listas de
+        estrategias o símbolos han cambiado desde el último cálculo.
+        """
+        # Registrar todas las estrategias al iniciar y cachear su Magic Number,
+        # que no cambia tras el registro
+        self._magic_by_strategy = {
+            strategy.name: self.strategy_registry.register_strategy(strategy.name)
+            for strategy in self.strategies
+        }
+
+        # Precalcular timeframes y símbolos permitidos por estrategia: no cambian
+        # entre ciclos, así run_once no reconstruye estos conjuntos por símbolo
+        self._strategy_tfs = {
+            strategy.name: frozenset(strategy.timeframes) for strategy in self.strategies
+        }
+        self._allowed_symbols_by_strategy = {}
         for strategy in self.strategies:
-            self.strategy_registry.register_strategy(strategy.name)
+            # Si allowed_symbols no existe o es None, la estrategia opera todos los símbolos
+            allowed = getattr(strategy, "allowed_symbols", None)
+            self._allowed_symbols_by_strategy[strategy.name] = (
+                frozenset(allowed) if allowed is not None else None
+            )
+
+        # Timeframes de las estrategias que operan todos los símbolos (comunes a
+        # todos) y timeframes adicionales de las estrategias restringidas
+        self._global_required_tfs = frozenset().union(
+            *(
+                self._strategy_tfs[name]
+                for name, allowed in self._allowed_symbols_by_strategy.items()
+                if allowed is None
+            )
+        )
+        self._per_symbol_extra_tfs = {
+            symbol.name: frozenset().union(
+                *(
+                    self._strategy_tfs[name]
+                    for name, allowed in self._allowed_symbols_by_strategy.items()
+                    if allowed is not None and symbol.name in allowed
+                )
+            )
+            for symbol in self.symbols
+        }
+        # Estrategias que operan cada símbolo, para descartar símbolos sin
+        # estrategias habilitadas antes de descargar sus datos
+        self._strategies_by_symbol = {
+            symbol.name: frozenset(
+                name
+                for name, allowed in self._allowed_symbols_by_strategy.items()
+                if allowed is None or symbol.name in allowed
+            )
+            for symbol in self.symbols
+        }
+        # Pares (símbolo, estrategia) que pueden generar señales, en el orden de
+        # self.symbols y self.strategies: run_once no recorre los no permitidos
+        self._pairs = [
+            (symbol, strategy)
+            for symbol in self.symbols
+            for strategy in self.strategies
+            if strategy.name in self._strategies_by_symbol[symbol.name]
+        ]
+
+        # Plan de descarga por símbolo: timeframes compatibles y ventana de datos.
+        # Los símbolos sin timeframes compatibles no aparecen en el plan
+        self._fetch_plan = {}
+        for symbol in self.symbols:
+            required_timeframes = self._required_timeframes_for(symbol)
+            if required_timeframes:
+                self._fetch_plan[symbol.name] = (
+                    required_timeframes,
+                    self._calculate_data_window(required_timeframes),
+                )
+        self._strategy_cache_key = self._current_strategy_cache_key()
+
+    def _current_strategy_cache_key(
+        self,
+    ) -> tuple[tuple[int, ...], tuple[tuple[int, str], ...]]:
+        """Identifica las estrategias y símbolos actuales para invalidar cachés.
+
+        La clave son las identidades de los objetos contenidos (y el nombre de
+        cada símbolo), así que detecta listas reasignadas, elementos añadidos o
+        quitados y también elementos sustituidos en el sitio
+        (bot.strategies[0] = otra).
+        """
+        return (
+            tuple(map(id, self.strategies)),
+            tuple((id(symbol), symbol.name) for symbol in self.symbols),
+        )
+
+    def start(self) -> None:
+        """Crea los recursos persistentes entre ciclos.
+
+        Mantiene vivo el pool de hilos de descarga de datos y evaluación de
+        estrategias para que cada ciclo no tenga que crear y destruir sus hilos.
+        Es idempotente; run_forever y run_synchronized lo invocan
+        automáticamente.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, self.max_workers), thread_name_prefix="bot-worker"
+            )
+            logger.info("Pool persistente de trabajo iniciado con %d hilos", self.max_workers)
+
+    def stop(self) -> None:
+        """Libera los recursos persistentes creados por start()."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            logger.info("Pool persistente de trabajo detenido")
+
+    def _data_executor(
+        self, max_workers: int
+    ) -> AbstractContextManager[ThreadPoolExecutor]:
+        """Devuelve el pool de hilos a usar en un ciclo.
+
+        Args:
+            max_workers: Hilos a usar si hay que crear un pool temporal.
+
+        Returns:
+            El pool persistente (sin cerrarlo al salir) si el bot está
+            iniciado, o un pool temporal que se cierra al terminar el ciclo.
+        """
+        if self._executor is not None:
+            return nullcontext(self._executor)
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bot-worker")
 
     def run_once(self, now: datetime | None = None) -> None:
         """Ejecuta un ciclo completo del bot una sola vez."""
         current_time = now or datetime.now(timezone.utc)
         logger.info("Iniciando ciclo del bot en %s", current_time)
+        if self._strategy_cache_key != self._current_strategy_cache_key():
+            logger.info("Lista de estrategias o símbolos modificada, recalculando cachés")
+            self._refresh_strategy_cache()
         
         # Sincronizar estado de órdenes abiertas con el broker
         self.order_executor.sync_state()
+        # Copia local de las posiciones abiertas: se actualiza con las órdenes
+        # aprobadas del ciclo sin volver a consultar al ejecutor por cada señal
+        open_positions = self._resolve_open_positions(
+            self.order_executor.get_open_positions_snapshot()
+        )
         
         # Actualizar trade_history con trades cerrados del broker
         self._update_trade_history()
+        self.risk_manager.begin_cycle(self._trade_store.generation)
         
         if not self.risk_manager.check_bot_risk_limits(self.trade_history):
             logger.warning("Bot bloqueado por límites globales de riesgo")
             return
 
+        # Los límites por símbolo y por estrategia solo dependen del historial,
+        # que no cambia durante el ciclo: se evalúan una única vez
+        allowed_symbols = set()
         for symbol in self.symbols:
-            if not self.risk_manager.check_symbol_risk_limits(symbol.name, self.trade_history):
+            if self.risk_manager.check_symbol_risk_limits(
+                symbol.name, self._trade_store.pnl_for_symbol(symbol.name)
+            ):
+                allowed_symbols.add(symbol.name)
+            else:
                 logger.info("Símbolo %s bloqueado por riesgo", symbol.name)
-                continue
+        allowed_strategies = set()
+        for strategy in self.strategies:
+            if self.risk_manager.check_strategy_risk_limits(
+                strategy.name, self._trade_store.pnl_for_strategy(strategy.name)
+            ):
+                allowed_strategies.add(strategy.name)
+            else:
+                logger.info("Estrategia %s bloqueada por riesgo", strategy.name)
 
-            # Calcular timeframes requeridos SOLO para estrategias que operan este símbolo
-            required_timeframes = set()
-            for strategy in self.strategies:
-                # Verificar si la estrategia puede operar este símbolo
-                # Si allowed_symbols no existe o es None, la estrategia opera todos los símbolos
-                can_operate = True
-                if hasattr(strategy, 'allowed_symbols') and strategy.allowed_symbols is not None:
-                    can_operate = symbol.name in strategy.allowed_symbols
-                
-                if can_operate:
-                    required_timeframes.update(strategy.timeframes)
-            
-            # Si no hay timeframes requeridos para este símbolo, saltar
-            if not required_timeframes:
-                logger.debug("No hay estrategias que operen %s, saltando", symbol.name)
+        if not allowed_symbols:
+            logger.debug("No hay símbolos habilitados en este ciclo")
+            return
+        if not allowed_strategies:
+            logger.info("No hay estrategias habilitadas")
+            return
+
+        max_workers = max(1, min(self.max_workers, len(allowed_symbols)))
+        # Fase 1: determinar los datos que necesita cada símbolo
+        batch_symbols: list[SymbolConfig] = []
+        timeframes_by_symbol: dict[str, frozenset[str]] = {}
+        start_by_symbol: dict[str, datetime] = {}
+        for symbol in self.symbols:
+            if symbol.name not in allowed_symbols:
                 continue
-            
-            # Filtrar timeframes incompatibles con el min_timeframe del símbolo
-            # Solo mantener timeframes >= min_timeframe
-            compatible_timeframes = set()
-            tf_order = ["M1", "M5", "M15", "M30", "H1", "H4", "D1"]
-            try:
-                min_tf_idx = tf_order.index(symbol.min_timeframe)
-                for tf in required_timeframes:
-                    if tf in tf_order:
-                        tf_idx = tf_order.index(tf)
-                        if tf_idx >= min_tf_idx:
-                            compatible_timeframes.add(tf)
-                    else:
-                        # Si no está en la lista, incluir por seguridad
-                        compatible_timeframes.add(tf)
-            except ValueError:
-                # Si min_timeframe no está en la lista, usar todos
-                compatible_timeframes = required_timeframes
-            
-            required_timeframes = compatible_timeframes
-            
-            if not required_timeframes:
-                logger.warning(
-                    "No hay timeframes compatibles para %s (min_timeframe=%s). "
-                    "Las estrategias requieren timeframes incompatibles.",
-                    symbol.name, symbol.min_timeframe
-                )
+            # Sin estrategias habilitadas para el símbolo no hay nada que evaluar
+            if not allowed_strategies & self._strategies_by_symbol.get(
+                symbol.name, frozenset()
+            ):
+                logger.debug("Sin estrategias habilitadas para %s", symbol.name)
                 continue
-            
-            # Calcular ventana de datos necesaria basada en estrategias
-            data_window = self._calculate_data_window(required_timeframes)
-            
-            try:
-                data_by_timeframe = self.market_data_service.get_resampled_data(
-                    symbol=symbol,
-                    target_timeframes=required_timeframes,
-                    start=current_time - data_window,
-                    end=current_time,
-                )
-            except Exception as e:
-                logger.error("Error obteniendo datos para %s: %s", symbol.name, e)
+
+            # Timeframes y ventana de datos precalculados para el símbolo
+            plan = self._fetch_plan.get(symbol.name)
+            if plan is None:
                 continue
+            required_timeframes, data_window = plan
+            batch_symbols.append(symbol)
+            timeframes_by_symbol[symbol.name] = required_timeframes
+            start_by_symbol[symbol.name] = current_time - data_window
 
-            for strategy in self.strategies:
-                if not self.risk_manager.check_strategy_risk_limits(
-                    strategy.name, self.trade_history
-                ):
+        # Fase 2: descargar los datos de todos los símbolos en una sola llamada
+        # y evaluar cada par (símbolo, estrategia) en el mismo pool de hilos
+        with self._data_executor(max_workers) as executor:
+            data_batch = self.market_data_service.get_resampled_data_batch(
+                batch_symbols,
+                target_timeframes=timeframes_by_symbol,
+                start=start_by_symbol,
+                end=current_time,
+                executor=executor,
+            )
+
+            # Los símbolos cuya descarga falló ya se registraron en el log y no
+            # están en el lote
+            pairs = [
+                (symbol, strategy, data_batch[symbol.name])
+                for symbol, strategy in self._pairs
+                if symbol.name in data_batch and strategy.name in allowed_strategies
+            ]
+            # map conserva el orden de los pares aunque terminen en otro orden
+            signals_by_pair = list(executor.map(self._evaluate_pair, pairs))
+
+        # Filtrar señales y acumular las órdenes del ciclo en el hilo principal,
+        # respetando el orden original de símbolos y estrategias
+        pending_orders: list[OrderRequest] = []
+        for (_, strategy, _), signals in zip(pairs, signals_by_pair):
+            self._collect_orders(strategy, signals, open_positions, pending_orders)
+
+        # Fase 3: enviar todas las órdenes aprobadas del ciclo en un solo lote
+        if pending_orders:
+            results = self.order_executor.execute_orders(pending_orders, current_time)
+            for order_request, result in zip(pending_orders, results):
+                if result.success:
                     logger.info(
-                        "Estrategia %s bloqueada por riesgo", strategy.name
+                        "Orden %s ejecutada exitosamente: %s",
+                        order_request.order_type,
+                        result.order_id,
                     )
-                    continue
 
-                signals = strategy.generate_signals(data_by_timeframe)
-                logger.debug(
-                    "Estrategia %s generó %d señales para %s",
-                    strategy.name,
-                    len(signals),
-                    symbol.name,
-                )
-                
-                # Obtener Magic Number de la estrategia (debe estar registrada)
-                magic_number = self.strategy_registry.get_magic_number(strategy.name)
-                if magic_number is None:
-                    logger.error(
-                        "Estrategia %s no tiene Magic Number asignado. Registrándola ahora.",
-                        strategy.name
+        # La descarga de datos (red/IPC con el broker) es independiente entre
+        # símbolos, así que se pide en lote a MarketDataService, que la solapa
+        # en un pool de hilos: la latencia del ciclo pasa de ser la suma de los
+        # round-trips a aproximadamente el más lento.
+        # Las estrategias de cada par (símbolo, estrategia) se evalúan en ese
+        # mismo pool, pero el filtrado de señales y el envío de órdenes se
+        # mantienen en el hilo principal y en el orden de self.symbols para
+        # conservar la semántica de has_open_position (sin condiciones de
+        # carrera entre señales del mismo ciclo). El cliente de MT5 es
+        # síncrono, por eso se usan hilos en lugar de corrutinas asyncio.
+        # Las órdenes no se envían señal a señal sino que se acumulan y se
+        # despachan juntas al final con execute_orders, de modo que el broker
+        # puede atender el lote completo en una sola llamada.
+
+    def _required_timeframes_for(self, symbol: SymbolConfig) -> frozenset[str]:
+        """Calcula los timeframes necesarios para un símbolo.
+
+        Solo considera las estrategias que pueden operar el símbolo y descarta
+        los timeframes menores que el min_timeframe del símbolo.
+
+        Args:
+            symbol: Configuración del símbolo.
+
+        Returns:
+            Conjunto de timeframes compatibles (vacío si no hay ninguno).
+        """
+        # Timeframes requeridos SOLO por las estrategias que operan este símbolo
+        required_timeframes = self._global_required_tfs | self._per_symbol_extra_tfs.get(
+            symbol.name, frozenset()
+        )
+
+        # Si no hay timeframes requeridos para este símbolo, saltar
+        if not required_timeframes:
+            logger.debug("No hay estrategias que operen %s, saltando", symbol.name)
+            return required_timeframes
+
+        # Filtrar timeframes incompatibles con el min_timeframe del símbolo
+        # Solo mantener timeframes >= min_timeframe
+        min_tf_idx = _TF_INDEX.get(symbol.min_timeframe)
+        if min_tf_idx is None:
+            # Si min_timeframe no está en la lista, usar todos
+            return required_timeframes
+
+        # Los timeframes desconocidos se incluyen por seguridad (rango = min_tf_idx)
+        compatible_timeframes = frozenset(
+            tf for tf in required_timeframes
+            if _TF_INDEX.get(tf, min_tf_idx) >= min_tf_idx
+        )
+
+        if not compatible_timeframes:
+            logger.warning(
+                "No hay timeframes compatibles para %s (min_timeframe=%s). "
+                "Las estrategias requieren timeframes incompatibles.",
+                symbol.name, symbol.min_timeframe
+            )
+
+        return compatible_timeframes
+
+    @staticmethod
+    def _evaluate_pair(
+        pair: tuple[SymbolConfig, Strategy, dict[str, pd.DataFrame]]
+    ) -> list[Signal]:
+        """Ejecuta una estrategia sobre los datos de un símbolo.
+
+        Se invoca desde el pool de hilos, por lo que no modifica estado del bot.
+
+        Args:
+            pair: Tupla (símbolo, estrategia, datos por timeframe).
+
+        Returns:
+            Señales generadas por la estrategia.
+        """
+        symbol, strategy, data_by_timeframe = pair
+        signals = strategy.generate_signals(data_by_timeframe)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Estrategia %s generó %d señales para %s",
+                strategy.name,
+                len(signals),
+                symbol.name,
+            )
+        return signals
+
+    def _resolve_open_positions(
+        self, snapshot: frozenset[tuple[str, int | None]]
+    ) -> set[tuple[str, int | None]]:
+        """Traduce los Magic Numbers legados de las posiciones al número actual.
+
+        Las posiciones abiertas con versiones anteriores del bot llevan el
+        Magic Number derivado de MD5. Se asocian a su estrategia para no abrir
+        duplicados y se recuerda el número legado para cerrarlas. Las
+        posiciones con un Magic Number desconocido en un símbolo operado se
+        avisan una vez en el log.
+
+        Args:
+            snapshot: Posiciones (símbolo, magic_number) del ejecutor.
+
+        Returns:
+            Conjunto de posiciones (símbolo, magic_number actual).
+        """
+        self._legacy_close_magic = {}
+        if not snapshot:
+            return set()
+
+        registry = self.strategy_registry
+        resolved: set[tuple[str, int | None]] = set()
+        for symbol, magic in snapshot:
+            current = registry.resolve_magic_number(magic)
+            if current is None:
+                if (
+                    magic is not None
+                    and symbol in self._strategies_by_symbol
+                    and (symbol, magic) not in self._reported_magics
+                ):
+                    self._reported_magics.add((symbol, magic))
+                    logger.warning(
+                        "Posición abierta en %s con Magic Number %d desconocido: "
+                        "no se asocia a ninguna estrategia registrada",
+                        symbol,
+                        magic,
                     )
-                    magic_number = self.strategy_registry.register_strategy(strategy.name)
-                
-                for signal in signals:
-                    if signal.signal_type in {SignalType.BUY, SignalType.SELL}:
-                        # Verificar si ya existe una posición abierta
-                        if self.order_executor.has_open_position(
-                            signal.symbol, 
-                            strategy.name,
-                            magic_number
-                        ):
-                            logger.debug(
-                                "Orden %s ignorada: ya existe posición abierta para %s con estrategia %s",
-                                signal.signal_type.value,
-                                signal.symbol,
-                                strategy.name,
-                            )
-                            continue
-                        
-                        order_request = OrderRequest(
-                            symbol=signal.symbol,
-                            volume=signal.size,
-                            order_type=signal.signal_type.value,
-                            stop_loss=signal.stop_loss,
-                            take_profit=signal.take_profit,
-                            comment=f"{signal.strategy_name}-{signal.timeframe}",
-                            magic_number=magic_number,
-                        )
-                        result = self.order_executor.execute_order(order_request)
-                        if result.success:
-                            logger.info("Orden ejecutada exitosamente: %s", result.order_id)
-                    elif signal.signal_type == SignalType.CLOSE:
-                        # Verificar existencia antes de intentar cerrar
-                        if not self.order_executor.has_open_position(
-                            signal.symbol, 
-                            strategy.name,
-                            magic_number
-                        ):
-                            logger.debug(
-                                "Señal CLOSE ignorada: no existe posición abierta para %s", 
-                                signal.symbol
-                            )
-                            continue
-
-                        order_request = OrderRequest(
-                            symbol=signal.symbol,
-                            volume=signal.size,
-                            order_type=signal.signal_type.value,
-                            stop_loss=signal.stop_loss,
-                            take_profit=signal.take_profit,
-                            comment=f"{signal.strategy_name}-{signal.timeframe}",
-                            magic_number=magic_number,
-                        )
-                        self.order_executor.execute_order(order_request)
-                    else:
-                        logger.debug(
-                            "Señal %s ignorada por ser tipo %s",
-                            signal,
-                            signal.signal_type,
-                        )
+                resolved.add((symbol, magic))
+                continue
+            if current != magic:
+                self._legacy_close_magic[(symbol, current)] = magic
+                if (symbol, magic) not in self._reported_magics:
+                    self._reported_magics.add((symbol, magic))
+                    logger.warning(
+                        "Posición abierta en %s con Magic Number legado %d de '%s'; "
+                        "se gestiona como %d (ver docs/MIGRACION_MAGIC_NUMBERS.md)",
+                        symbol,
+                        magic,
+                        registry.get_strategy_name(current),
+                        current,
+                    )
+            resolved.add((symbol, current))
+        return resolved
+
+    def _collect_orders(
+        self,
+        strategy: Strategy,
+        signals: list[Signal],
+        open_positions: set[tuple[str, int | None]],
+        pending_orders: list[OrderRequest],
+    ) -> None:
+        """Filtra las señales de una estrategia y acumula las órdenes aprobadas.
+
+        Args:
+            strategy: Estrategia que generó las señales.
+            signals: Señales generadas para un símbolo.
+            open_positions: Posiciones (símbolo, magic_number) abiertas o que
+                quedarán abiertas al ejecutar las órdenes pendientes. Se
+                actualiza con cada orden aprobada.
+            pending_orders: Lista de órdenes del ciclo donde se añaden las aprobadas.
+        """
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+        # Magic Number cacheado de la estrategia (todas se registran al iniciar
+        # y al cambiar la lista de estrategias)
+        magic_number = self._magic_by_strategy[strategy.name]
+
+        for signal in signals:
+            opens_position = _OPENS_POSITION.get(signal.signal_type)
+            if opens_position is None:
+                if debug_enabled:
+                    logger.debug(
+                        "Señal %s ignorada por ser tipo %s",
+                        signal,
+                        signal.signal_type,
+                    )
+                continue
+
+            position_key = (signal.symbol, magic_number)
+            if opens_position == (position_key in open_positions):
+                # BUY/SELL con posición ya abierta o CLOSE sin posición (real o pendiente)
+                if debug_enabled:
+                    logger.debug(
+                        "Orden %s ignorada para %s con estrategia %s: %s",
+                        signal.signal_type.value,
+                        signal.symbol,
+                        strategy.name,
+                        "ya existe posición abierta" if opens_position
+                        else "no existe posición abierta",
+                    )
+                continue
+
+            # Un CLOSE de una posición legada debe llevar su Magic Number real
+            order_magic = (
+                magic_number if opens_position
+                else self._legacy_close_magic.pop(position_key, magic_number)
+            )
+            pending_orders.append(self._build_order_request(signal, order_magic))
+            if opens_position:
+                open_positions.add(position_key)
+            else:
+                open_positions.discard(position_key)
+
+        # Como las órdenes se envían en lote al final del ciclo, el ejecutor
+        # todavía no conoce las posiciones que abrirán o cerrarán las órdenes
+        # pendientes. open_positions refleja ese estado futuro para que una
+        # segunda señal BUY/SELL de la misma estrategia y símbolo no duplique
+        # la posición y para que un CLOSE tras un BUY del mismo ciclo sea válido.
+        # El nivel DEBUG se consulta una vez por estrategia: con DEBUG desactivado
+        # el bucle de señales no paga ni la llamada a logger.debug ni la
+        # construcción de sus argumentos.
+
+    @staticmethod
+    def _build_order_request(signal: Signal, magic_number: int) -> OrderRequest:
+        """Construye la orden correspondiente a una señal operable.
+
+        Args:
+            signal: Señal BUY, SELL o CLOSE emitida por una estrategia.
+            magic_number: Magic Number de la estrategia emisora.
+
+        Returns:
+            OrderRequest lista para enviar al broker.
+        """
+        return OrderRequest(
+            symbol=signal.symbol,
+            volume=signal.size,
+            order_type=signal.signal_type.value,
+            stop_loss=signal.stop_loss,
+            take_profit=signal.take_profit,
+            comment=_order_comment(signal.strategy_name, signal.timeframe),
+            magic_number=magic_number,
+        )
 
     def run_forever(self, sleep_seconds: int = 60) -> None:
-        """Ejecuta el bot en bucle infinito con pausas."""
-        import time
+        """Ejecuta el bot en bucle infinito con pausas.
 
-        while True:
-            self.run_once()
-            time.sleep(sleep_seconds)
+        Los ciclos se lanzan en instantes fijos separados sleep_seconds segundos
+        (reloj monotónico), de modo que la duración de run_once no se acumula
+        como deriva. Si un ciclo se retrasa más de un periodo completo, los
+        instantes perdidos se saltan en lugar de ejecutarse seguidos.
+        """
+        self.start()
+        try:
+            next_deadline = time.monotonic()
+            while True:
+                self.run_once()
+                next_deadline += sleep_seconds
+                now = time.monotonic()
+                if next_deadline <= now:
+                    missed = int((now - next_deadline) // sleep_seconds) + 1
+                    logger.warning(
+                        "Ciclo retrasado: se omiten %d ejecuciones programadas", missed
+                    )
+                    next_deadline += missed * sleep_seconds
+                time.sleep(next_deadline - now)
+        finally:
+            self.stop()
 
     def run_synchronized(self, timeframe_minutes: int = 1, wait_after_close: int = 5) -> None:
         """Ejecuta el bot sincronizado con el cierre de velas.
@@ -231,107 +670,97 @@ class TradingBot:
             - Espera 5 seg después de cada cierre
             - Ejecuta run_once()
         """
-        import time
-        
-        logger.info("="*80)
+        logger.info(_SEP_EQ)
         logger.info("Iniciando bucle sincronizado con velas de %d minutos", timeframe_minutes)
         logger.info("Esperando %d segundos después del cierre de cada vela", wait_after_close)
         logger.info("Presiona Ctrl+C para detener el bot")
-        logger.info("="*80)
+        logger.info(_SEP_EQ)
         
-        while True:
-            try:
-                # Calcular cuánto falta para el próximo cierre de vela
-                now = datetime.now(timezone.utc)
-                
-                # Calcular el próximo cierre según el timeframe
-                if timeframe_minutes == 1:
-                    # Para M1: próximo minuto
-                    next_close = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
-                elif timeframe_minutes == 5:
-                    # Para M5: próximo múltiplo de 5 minutos
-                    minutes_to_add = 5 - (now.minute % 5)
-                    if minutes_to_add == 5:
-                        minutes_to_add = 0
-                    next_close = now.replace(second=0, microsecond=0) + timedelta(minutes=minutes_to_add)
-                elif timeframe_minutes == 15:
-                    # Para M15: próximo múltiplo de 15 minutos
-                    minutes_to_add = 15 - (now.minute % 15)
-                    if minutes_to_add == 15:
-                        minutes_to_add = 0
-                    next_close = now.replace(second=0, microsecond=0) + timedelta(minutes=minutes_to_add)
-                elif timeframe_minutes == 30:
-                    # Para M30: próximo múltiplo de 30 minutos
-                    minutes_to_add = 30 - (now.minute % 30)
-                    if minutes_to_add == 30:
-                        minutes_to_add = 0
-                    next_close = now.replace(second=0, microsecond=0) + timedelta(minutes=minutes_to_add)
-                elif timeframe_minutes == 60:
-                    # Para H1: próxima hora
-                    next_close = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-                elif timeframe_minutes == 240:
-                    # Para H4: próxima hora múltiplo de 4
-                    hours_to_add = 4 - (now.hour % 4)
-                    if hours_to_add == 4:
-                        hours_to_add = 0
-                    next_close = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=hours_to_add)
-                else:
-                    # Genérico: próximo múltiplo del timeframe
-                    minutes_to_add = timeframe_minutes - (now.minute % timeframe_minutes)
-                    if minutes_to_add == timeframe_minutes:
-                        minutes_to_add = 0
-                    next_close = now.replace(second=0, microsecond=0) + timedelta(minutes=minutes_to_add)
-                
-                # Añadir tiempo de espera después del cierre
-                execution_time = next_close + timedelta(seconds=wait_after_close)
-                
-                # Calcular segundos a esperar
-                wait_seconds = (execution_time - now).total_seconds()
+        period = timeframe_minutes * 60
+        self.start()
+        try:
+            while True:
+                try:
+                    # Calcular el próximo instante de ejecución: cierre de vela + espera.
+                    # Las velas de cualquier timeframe cierran en múltiplos exactos de
+                    # su periodo contados desde el epoch Unix (UTC).
+                    now_s = time.time()
+                    execution_s = (now_s // period) * period + wait_after_close
+                    if execution_s <= now_s:
+                        execution_s += period
                 
-                if wait_seconds > 0:
-                    logger.info(
-                        "Esperando %.1f segundos hasta %s (cierre de vela + %d seg)",
-                        wait_seconds, execution_time.strftime("%H:%M:%S"), wait_after_close
-                    )
-                    time.sleep(wait_seconds)
-                elif wait_seconds < -1:
-                    # Si ya pasó el tiempo, calcular el siguiente
-                    logger.debug("Tiempo de ejecución ya pasó, calculando siguiente vela...")
-                    continue
+                    wait_seconds = execution_s - now_s
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info(
+                            "Esperando %.1f segundos hasta %s (cierre de vela + %d seg)",
+                            wait_seconds,
+                            time.strftime("%H:%M:%S", time.gmtime(execution_s)),
+                            wait_after_close,
+                        )
+                    time.sleep(max(0.0, wait_seconds))
                 
-                # Ejecutar ciclo del bot
-                logger.info("-"*80)
-                logger.info("Ejecutando ciclo de trading en %s", datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"))
-                logger.info("-"*80)
-                self.run_once()
+                    # Ejecutar ciclo del bot
+                    logger.info(_SEP_DASH)
+                    # La marca temporal del ciclo se deriva del instante planificado,
+                    # sin volver a consultar el reloj del sistema
+                    cycle_time = datetime.fromtimestamp(execution_s, tz=timezone.utc)
+                    logger.info("Ejecutando ciclo de trading en %s", cycle_time.strftime("%Y-%m-%d %H:%M:%S"))
+                    logger.info(_SEP_DASH)
+                    self.run_once(now=cycle_time)
                 
-            except KeyboardInterrupt:
-                logger.info("\n⚠️ Bucle interrumpido por el usuario")
-                break
-            except Exception as e:
-                logger.error("❌ Error en bucle sincronizado: %s", e, exc_info=True)
-                # Esperar un poco antes de reintentar para evitar loops infinitos de errores
-                logger.info("Esperando 10 segundos antes de reintentar...")
-                time.sleep(10)
+                except KeyboardInterrupt:
+                    logger.info("\n⚠️ Bucle interrumpido por el usuario")
+                    break
+                except Exception as e:
+                    logger.error("❌ Error en bucle sincronizado: %s", e, exc_info=True)
+                    # Esperar un poco antes de reintentar para evitar loops infinitos de errores
+                    logger.info("Esperando 10 segundos antes de reintentar...")
+                    time.sleep(10)
+        finally:
+            self.stop()
+
+        # El próximo cierre se obtiene con aritmética modular sobre segundos Unix
+        # en lugar de una cadena if/elif por timeframe: una sola fórmula sirve
+        # para M1, M5, H1, H4 o cualquier periodo en minutos. Si run_once tarda
+        # más de lo previsto, el siguiente objetivo se recalcula desde el reloj
+        # actual y no se acumula deriva. Si el arranque cae dentro de la ventana
+        # de espera de una vela recién cerrada, esa vela todavía se procesa.
 
     def _update_trade_history(self) -> None:
         """Actualiza el historial de trades con los cerrados del broker.
         
         Usa una tupla con entry_time, exit_time, symbol y strategy_name para identificar
-        trades únicos de forma más robusta.
+        trades únicos de forma más robusta. Las claves conocidas se mantienen en
+        self._trade_keys, por lo que el coste por ciclo es proporcional a los
+        trades devueltos por el broker y no al tamaño del historial. Cada trade
+        nuevo se añade también al almacén columnar usado por los límites de riesgo.
         """
         try:
             closed_trades = self.broker_client.get_closed_trades()
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
             # Agregar solo los nuevos trades que no estén ya en el historial
             # Usar strategy_name en lugar de magic_number ya que TradeRecord no lo tiene
-            existing_trades = {
-                (t.entry_time, t.exit_time, t.symbol, t.strategy_name) 
-                for t in self.trade_history
-            }
             for trade in closed_trades:
-                trade_key = (trade.entry_time, trade.exit_time, trade.symbol, trade.strategy_name)
-                if trade_key not in existing_trades:
-                    self.trade_history.append(trade)
+                trade_key = trade.trade_key
+                if trade_key in self._trade_keys:
+                    continue
+                try:
+                    # Mantener el historial ordenado por cierre: el drawdown
+                    # recorre los trades en orden cronológico
+                    insort(self.trade_history, trade, key=_EXIT_TIME)
+                    try:
+                        self._trade_store.add(trade)
+                    except Exception:
+                        # Historial y almacén deben contener los mismos trades
+                        self.trade_history.remove(trade)
+                        raise
+                except Exception as e:
+                    logger.error("Error añadiendo al historial el trade %s: %s", trade_key, e)
+                    continue
+                # Solo se marca como conocido si entró en historial y almacén:
+                # un fallo se reintenta en el siguiente ciclo
+                self._trade_keys.add(trade_key)
+                if debug_enabled:
                     logger.debug("Trade cerrado agregado al historial: %s", trade)
         except NotImplementedError:
             # El broker simulado no implementa get_closed_trades
@@ -339,7 +768,7 @@ class TradingBot:
         except Exception as e:
             logger.error("Error actualizando historial de trades: %s", e)
 
-    def _calculate_data_window(self, timeframes: set[str]) -> timedelta:
+    def _calculate_data_window(self, timeframes: frozenset[str]) -> timedelta:
         """Calcula la ventana de tiempo necesaria para los timeframes solicitados.
         
         Asegura que haya suficientes datos para calcular indicadores técnicos,
@@ -354,49 +783,4 @@ class TradingBot:
         Returns:
             Timedelta con la ventana de datos necesaria.
         """
-        # Mapeo de timeframe a minutos
-        tf_minutes = {
-            "M1": 1,
-            "M5": 5,
-            "M15": 15,
-            "M30": 30,
-            "H1": 60,
-            "H4": 240,
-            "D1": 1440,
-        }
-        
-        # Límites de velas por timeframe (compatibles con MT5)
-        # IMPORTANTE: Estos valores deben considerar que descargamos desde el timeframe
-        # MÍNIMO y lo remuestreamos. Por ello, para timeframes altos usamos ventanas
-        # más cortas para no exceder los límites de MT5 al descargar el timeframe base.
-        max_candles_by_tf = {
-            "M1": 1440,    # 1 día de datos (suficiente para análisis intraday)
-            "M5": 1440,    # 5 días de datos
-            "M15": 1000,   # ~10 días de datos
-            "M30": 720,    # ~15 días de datos
-            "H1": 500,     # ~20 días de datos
-            "H4": 500,     # ~50 días de datos (12000 velas M1 = aprox. 8 días)
-            "D1": 500,     # ~200 días de datos
-        }
-        
-        # Encontrar el timeframe más alto (más lento)
-        max_minutes = 1
-        max_tf = "M1"
-        for tf in timeframes:
-            minutes = tf_minutes.get(tf, 1)
-            if minutes > max_minutes:
-                max_minutes = minutes
-                max_tf = tf
-        
-        # Usar el límite de velas apropiado para ese timeframe
-        max_candles = max_candles_by_tf.get(max_tf, 500)
-        
-        # Ventana = número de velas * duración de cada vela
-        data_window = timedelta(minutes=max_minutes * max_candles)
-        
-        logger.debug(
-            "Ventana de datos calculada: %s (%d velas de %s) para timeframes %s",
-            data_window, max_candles, max_tf, timeframes
-        )
-        
-        return data_window
+        return _data_window_for(timeframes)
@@ -2,6 +2,9 @@
 from __future__ import annotations
 
 import logging
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 
@@ -10,6 +13,14 @@ from bot_trading.infrastructure.mt5_client import BrokerClient
 
 logger = logging.getLogger(__name__)
 
+# Tipos de orden que abren una posición
+_OPEN_ORDER_TYPES = frozenset({"BUY", "SELL"})
+
+
+def _strategy_prefix(strategy_name: str) -> str:
+    """Nombre corto de la estrategia: lo anterior al primer '-' del comentario."""
+    return strategy_name.split("-", 1)[0]
+
 
 @dataclass
 class OrderExecutor:
@@ -17,6 +28,43 @@ class OrderExecutor:
 
     broker_client: BrokerClient
     open_positions: dict[str, Position] = field(default_factory=dict)
+    # Envíos simultáneos cuando el broker no acepta lotes (1 = secuencial). El
+    # cliente de MT5 no documenta ser seguro entre hilos, por eso es opt-in
+    max_parallel_orders: int = 1
+    # Pausa entre grupos de envíos paralelos para respetar límites de peticiones
+    order_group_pause_seconds: float = 0.0
+    # Índice secundario símbolo -> claves de open_positions, mantenido en
+    # paralelo para consultar y eliminar por símbolo sin recorrer todas las posiciones
+    _by_symbol: dict[str, set[str]] = field(init=False, repr=False, default_factory=dict)
+    # Índice nombre corto de estrategia -> claves de open_positions, solo para
+    # la consulta obsoleta has_open_position(symbol, strategy_name=...)
+    _by_strategy_prefix: dict[str, set[str]] = field(
+        init=False, repr=False, default_factory=dict
+    )
+
+    def __post_init__(self) -> None:
+        """Construye los índices secundarios de las posiciones iniciales."""
+        for position_key, pos in self.open_positions.items():
+            self._index_position(position_key, pos)
+
+    def _index_position(self, position_key: str, pos: Position) -> None:
+        """Añade una posición a los índices por símbolo y por estrategia."""
+        self._by_symbol.setdefault(pos.symbol, set()).add(position_key)
+        self._by_strategy_prefix.setdefault(
+            _strategy_prefix(pos.strategy_name), set()
+        ).add(position_key)
+
+    def _unindex_position(self, position_key: str, pos: Position) -> None:
+        """Quita una posición de los índices, borrando las entradas vacías."""
+        for index, index_key in (
+            (self._by_symbol, pos.symbol),
+            (self._by_strategy_prefix, _strategy_prefix(pos.strategy_name)),
+        ):
+            keys = index.get(index_key)
+            if keys is not None:
+                keys.discard(position_key)
+                if not keys:
+                    del index[index_key]
 
     def _generate_position_key(self, symbol: str, magic_number: int | None) -> str:
         """Genera una clave única para identificar posiciones.
@@ -39,15 +87,43 @@ class OrderExecutor:
             # Reconstruimos el mapa local usando símbolo + magic_number como clave
             # Esto permite múltiples posiciones del mismo símbolo con diferentes estrategias
             self.open_positions.clear()
+            self._by_symbol.clear()
+            self._by_strategy_prefix.clear()
             for pos in real_positions:
                 position_key = self._generate_position_key(pos.symbol, pos.magic_number)
                 self.open_positions[position_key] = pos
+                self._index_position(position_key, pos)
             logger.debug("Estado sincronizado con broker. %d posiciones abiertas.", len(self.open_positions))
         except Exception as e:
             logger.error("Error sincronizando posiciones con broker: %s", e)
 
-    def execute_order(self, order_request: OrderRequest) -> OrderResult:
-        """Envía una orden al broker y devuelve el resultado."""
+    def get_open_positions_snapshot(self) -> frozenset[tuple[str, int | None]]:
+        """Devuelve una instantánea inmutable de las posiciones abiertas.
+
+        Returns:
+            Conjunto de tuplas (símbolo, magic_number) con las posiciones
+            registradas localmente tras la última sincronización.
+        """
+        return frozenset(
+            (pos.symbol, pos.magic_number) for pos in self.open_positions.values()
+        )
+
+    def execute_order(
+        self, order_request: OrderRequest, open_time: datetime | None = None
+    ) -> OrderResult:
+        """Envía una orden al broker y devuelve el resultado.
+
+        Args:
+            order_request: Orden a enviar.
+            open_time: Instante del ciclo a usar como apertura de la posición.
+                Si es None se toma la hora actual.
+        """
+        result = self._send_order(order_request)
+        self._apply_result(order_request, result, open_time)
+        return result
+
+    def _send_order(self, order_request: OrderRequest) -> OrderResult:
+        """Envía una orden al broker sin tocar el registro local de posiciones."""
         logger.info(
             "Enviando orden %s de volumen %s para %s (Magic: %s)",
             order_request.order_type,
@@ -55,18 +131,164 @@ class OrderExecutor:
             order_request.symbol,
             order_request.magic_number,
         )
-        result = self.broker_client.send_market_order(order_request)
+        return self.broker_client.send_market_order(order_request)
+
+    def _send_order_safe(self, order_request: OrderRequest) -> OrderResult:
+        """Como _send_order, pero convierte las excepciones en un OrderResult fallido."""
+        try:
+            return self._send_order(order_request)
+        except Exception as e:
+            logger.error(
+                "Error enviando orden %s para %s: %s",
+                order_request.order_type,
+                order_request.symbol,
+                e,
+            )
+            return OrderResult(success=False, error_message=str(e))
+
+    def _apply_result(
+        self,
+        order_request: OrderRequest,
+        result: OrderResult,
+        open_time: datetime | None = None,
+    ) -> None:
+        """Actualiza el registro local de posiciones según el resultado de una orden.
+
+        Args:
+            order_request: Orden enviada.
+            result: Respuesta del broker para esa orden.
+            open_time: Instante de apertura para las posiciones nuevas.
+        """
         if not result.success:
             logger.error("Orden rechazada: %s", result.error_message)
         else:
-            logger.debug("Orden aceptada con id %s", result.order_id)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Orden aceptada con id %s", result.order_id)
             
-            if order_request.order_type in {"BUY", "SELL"}:
-                self._register_position(order_request, result)
+            if order_request.order_type in _OPEN_ORDER_TYPES:
+                self._register_position(order_request, result, open_time)
             elif order_request.order_type == "CLOSE":
                 self._remove_position(order_request.symbol, order_request.magic_number)
-                
-        return result
+
+    def execute_orders(
+        self, order_requests: list[OrderRequest], open_time: datetime | None = None
+    ) -> list[OrderResult]:
+        """Envía un lote de órdenes al broker y devuelve sus resultados.
+
+        Si el broker expone send_market_orders se le entrega el lote completo en
+        una sola llamada, junto con open_time como instante común del lote. En
+        caso contrario se envían de una en una en el orden recibido o, si
+        max_parallel_orders > 1, en paralelo en grupos de ese tamaño. Un error
+        en una orden no impide enviar las siguientes.
+
+        Args:
+            order_requests: Órdenes a enviar, en orden de ejecución.
+            open_time: Instante del ciclo a usar como apertura de las posiciones.
+
+        Returns:
+            Lista de OrderResult en el mismo orden que order_requests.
+        """
+        if not order_requests:
+            return []
+
+        logger.info("Enviando lote de %d órdenes", len(order_requests))
+        # Capacidad opcional SupportsBatchOrders del broker
+        send_batch = getattr(self.broker_client, "send_market_orders", None)
+        if send_batch is not None:
+            results = self._send_batch_safe(send_batch, order_requests, open_time)
+        elif self.max_parallel_orders > 1 and len(order_requests) > 1:
+            results = self._send_orders_parallel(order_requests)
+        else:
+            results = [self._send_order_safe(r) for r in order_requests]
+
+        # El registro local se actualiza siempre en el hilo llamante y en orden
+        for order_request, result in zip(order_requests, results):
+            self._apply_result(order_request, result, open_time)
+        return results
+
+    def _send_batch_safe(
+        self,
+        send_batch,
+        order_requests: list[OrderRequest],
+        open_time: datetime | None,
+    ) -> list[OrderResult]:
+        """Envía el lote al broker garantizando un resultado por orden.
+
+        Args:
+            send_batch: Método send_market_orders del broker.
+            order_requests: Órdenes a enviar, en orden de ejecución.
+            open_time: Instante común del lote.
+
+        Returns:
+            Lista de OrderResult alineada con order_requests. Si el broker lanza
+            una excepción o devuelve un número de resultados distinto, las
+            órdenes sin resultado fiable se marcan como fallidas.
+        """
+        try:
+            results = list(send_batch(order_requests, open_time))
+        except Exception as e:
+            logger.error("Error enviando lote de %d órdenes: %s", len(order_requests), e)
+            return [OrderResult(success=False, error_message=str(e)) for _ in order_requests]
+
+        if len(results) != len(order_requests):
+            logger.error(
+                "El broker devolvió %d resultados para %d órdenes; "
+                "las órdenes sin resultado se marcan como fallidas",
+                len(results), len(order_requests),
+            )
+            missing = OrderResult(success=False, error_message="Sin resultado del broker")
+            results = results[: len(order_requests)]
+            results.extend(missing for _ in range(len(order_requests) - len(results)))
+        return results
+
+    # Con envío en lote un fallo del broker (p. ej. la reconexión previa de
+    # MetaTrader5Client.send_market_orders) afectaría a todo el lote; aquí se
+    # convierte en un resultado fallido por orden, igual que _send_order_safe
+    # en el envío secuencial, para que el ciclo continúe y el registro local
+    # siga alineado con las órdenes.
+
+    def _send_orders_parallel(self, order_requests: list[OrderRequest]) -> list[OrderResult]:
+        """Envía órdenes en paralelo conservando el orden dentro de cada posición.
+
+        Las órdenes se reparten en olas: cada orden va en la ola siguiente a la
+        última orden anterior de su misma posición (símbolo, magic_number), de
+        modo que un BUY y su CLOSE del mismo ciclo nunca se envían a la vez.
+        Cada ola se envía en grupos de max_parallel_orders órdenes simultáneas.
+
+        Args:
+            order_requests: Órdenes a enviar, en orden de ejecución.
+
+        Returns:
+            Lista de OrderResult en el mismo orden que order_requests.
+        """
+        waves: list[list[int]] = []
+        last_wave: dict[tuple[str, int | None], int] = {}
+        for idx, order_request in enumerate(order_requests):
+            key = (order_request.symbol, order_request.magic_number)
+            wave = last_wave.get(key, -1) + 1
+            last_wave[key] = wave
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(idx)
+
+        results: list[OrderResult | None] = [None] * len(order_requests)
+        group_size = self.max_parallel_orders
+        first_group = True
+        with ThreadPoolExecutor(
+            max_workers=group_size, thread_name_prefix="order-send"
+        ) as pool:
+            for wave in waves:
+                for start in range(0, len(wave), group_size):
+                    if not first_group and self.order_group_pause_seconds > 0:
+                        time.sleep(self.order_group_pause_seconds)
+                    first_group = False
+                    group = wave[start:start + group_size]
+                    sent = pool.map(
+                        self._send_order_safe, (order_requests[i] for i in group)
+                    )
+                    for idx, result in zip(group, sent):
+                        results[idx] = result
+        return results
 
     def _remove_position(self, symbol: str, magic_number: int | None = None) -> None:
         """Elimina posiciones internas asociadas a un símbolo y opcionalmente a una estrategia.
@@ -79,24 +301,30 @@ class OrderExecutor:
         if magic_number is not None:
             # Eliminar posición específica de la estrategia
             position_key = self._generate_position_key(symbol, magic_number)
-            if position_key in self.open_positions:
-                del self.open_positions[position_key]
+            pos = self.open_positions.pop(position_key, None)
+            if pos is not None:
+                self._unindex_position(position_key, pos)
                 logger.debug("Posición eliminada: %s con Magic Number: %s", symbol, magic_number)
             else:
                 logger.warning("No se encontró posición para eliminar: %s (Magic: %s)", symbol, magic_number)
         else:
             # Fallback: eliminar todas las posiciones del símbolo
-            keys_to_remove = [k for k, v in self.open_positions.items() if v.symbol == symbol]
-            for k in keys_to_remove:
-                del self.open_positions[k]
+            for k in tuple(self._by_symbol.get(symbol, ())):
+                self._unindex_position(k, self.open_positions.pop(k))
             logger.debug("Posiciones eliminadas del registro local para %s", symbol)
 
-    def _register_position(self, order_request: OrderRequest, result: OrderResult) -> None:
+    def _register_position(
+        self,
+        order_request: OrderRequest,
+        result: OrderResult,
+        open_time: datetime | None = None,
+    ) -> None:
         """Registra una posición abierta.
         
         Args:
             order_request: Solicitud de orden que generó la posición.
             result: Resultado de la orden ejecutada.
+            open_time: Instante de apertura; si es None se toma la hora actual.
         """
         position = Position(
             symbol=order_request.symbol,
@@ -105,38 +333,62 @@ class OrderExecutor:
             stop_loss=order_request.stop_loss,
             take_profit=order_request.take_profit,
             strategy_name=order_request.comment or "unknown",
-            open_time=datetime.now(timezone.utc),
+            open_time=open_time or datetime.now(timezone.utc),
             magic_number=order_request.magic_number
         )
         # Usar símbolo + magic_number como clave para consistencia
         position_key = self._generate_position_key(order_request.symbol, order_request.magic_number)
         self.open_positions[position_key] = position
-        logger.debug("Posición registrada: %s con Magic Number: %s", position_key, order_request.magic_number)
+        self._index_position(position_key, position)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Posición registrada: %s con Magic Number: %s", position_key, order_request.magic_number)
 
     def has_open_position(
-        self, 
-        symbol: str, 
-        strategy_name: str = None,
-        magic_number: int = None
+        self,
+        symbol: str,
+        strategy_name: str | None = None,
+        magic_number: int | None = None,
     ) -> bool:
         """Verifica si existe una posición abierta para el símbolo dado.
         
         Args:
             symbol: Símbolo a verificar.
-            strategy_name: Opcional, filtrar por nombre de estrategia (fallback legacy).
-            magic_number: Opcional, filtrar por Magic Number (método preferido y robusto).
+            strategy_name: Obsoleto, usar magic_number. Si se indica sin
+                magic_number, filtra las posiciones cuyo nombre de estrategia
+                empieza por este valor y emite DeprecationWarning.
+            magic_number: Opcional, filtrar por Magic Number de la estrategia.
+                Si es None se considera cualquier posición del símbolo.
             
         Returns:
             True si existe al menos una posición abierta que coincida con los criterios.
         """
-        # Método preferido: búsqueda directa usando clave
         if magic_number is not None:
+            # Búsqueda directa usando la clave símbolo + magic_number
             position_key = self._generate_position_key(symbol, magic_number)
             return position_key in self.open_positions
-        
-        # Fallback: búsqueda iterativa (menos eficiente, para compatibilidad)
-        for pos in self.open_positions.values():
-            if pos.symbol == symbol:
-                if strategy_name is None or pos.strategy_name.startswith(strategy_name):
-                    return True
-        return False
+
+        symbol_keys = self._by_symbol.get(symbol)
+        if strategy_name is None:
+            # Sin Magic Number: cualquier posición del símbolo (índice secundario)
+            return bool(symbol_keys)
+
+        warnings.warn(
+            "has_open_position(strategy_name=...) está obsoleto; usar magic_number",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        if not symbol_keys:
+            return False
+        candidates = self._by_strategy_prefix.get(_strategy_prefix(strategy_name), ())
+        return any(
+            key in symbol_keys
+            and self.open_positions[key].strategy_name.startswith(strategy_name)
+            for key in candidates
+        )
+
+    # La consulta por strategy_name es el método antiguo: se mantiene por
+    # compatibilidad pero avisa con DeprecationWarning. El índice por nombre
+    # corto (lo anterior al '-' del comentario "estrategia-timeframe") reduce
+    # la búsqueda a las posiciones de esa estrategia; sobre ellas se aplica el
+    # mismo startswith de siempre, así que la respuesta coincide con la del
+    # recorrido completo anterior cuando se pasa el nombre de la estrategia.
@@ -14,9 +14,13 @@ class SignalType(Enum):
     HOLD = "HOLD"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Signal:
-    """Señal producida por una estrategia."""
+    """Señal producida por una estrategia.
+
+    Es inmutable y usa __slots__: se crean muchas por ciclo, ocupan menos
+    memoria que con __dict__ y pueden usarse como claves de un set.
+    """
 
     symbol: str
     strategy_name: str
@@ -2,7 +2,10 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from itertools import islice
+
+import numpy as np
 
 from bot_trading.domain.entities import RiskLimits, TradeRecord
 
@@ -13,51 +16,305 @@ class RiskLimitExceeded(Exception):
     """Excepción para indicar que un límite de riesgo ha sido violado."""
 
 
+# A partir de este número de trades nuevos compensa el coste fijo de NumPy
+_VECTORIZE_MIN_TRADES = 64
+
+
+def _advance_equity_curve(
+    equity: float,
+    max_equity: float,
+    max_drawdown: float,
+    pnls: list[float] | np.ndarray,
+) -> tuple[float, float, float]:
+    """Avanza la curva de equity con nuevos PnL y actualiza el máximo drawdown.
+
+    Para arrays de NumPy y lotes grandes (p.ej. la primera carga del historial)
+    usa suma y máximo acumulados vectorizados; para los pocos trades nuevos de
+    un ciclo normal un bucle simple es más rápido.
+
+    Args:
+        equity: Equity antes de los nuevos trades.
+        max_equity: Máximo de equity antes de los nuevos trades.
+        max_drawdown: Máximo drawdown (%) antes de los nuevos trades.
+        pnls: PnL de los nuevos trades en orden cronológico (lista o array).
+
+    Returns:
+        Tupla (equity, max_equity, max_drawdown) actualizada.
+    """
+    if isinstance(pnls, np.ndarray) or len(pnls) >= _VECTORIZE_MIN_TRADES:
+        if len(pnls) == 0:
+            return equity, max_equity, max_drawdown
+        equity_curve = equity + np.cumsum(np.asarray(pnls, dtype=np.float64))
+        peaks = np.maximum(np.maximum.accumulate(equity_curve), max_equity)
+        # max_equity siempre > 0 con balance inicial
+        drawdowns = (peaks - equity_curve) / peaks * 100
+        return (
+            float(equity_curve[-1]),
+            float(peaks[-1]),
+            max(max_drawdown, float(drawdowns.max())),
+        )
+
+    for pnl in pnls:
+        equity += pnl
+        if equity > max_equity:
+            max_equity = equity
+
+        # Calcular drawdown actual (max_equity siempre > 0 con balance inicial)
+        current_dd = ((max_equity - equity) / max_equity) * 100
+        if current_dd > max_drawdown:
+            max_drawdown = current_dd
+    return equity, max_equity, max_drawdown
+
+
+def _always_allowed(*args, **kwargs) -> bool:
+    """Comprobación de riesgo de un ámbito sin límites: siempre permite operar."""
+    return True
+
+
+@dataclass
+class _DrawdownState:
+    """Estado acumulado de la curva de equity de un ámbito de riesgo.
+
+    Attributes:
+        equity: Equity tras el último trade procesado.
+        max_equity: Máximo de equity alcanzado.
+        max_drawdown: Máximo drawdown observado en porcentaje.
+        processed: Número de trades de la lista de entrada ya recorridos.
+        last_trade: Último trade recorrido, para detectar listas reemplazadas.
+        generation: Generación del TradeStore con la que se calculó el estado
+            cuando la entrada es un array de PnL (None para listas de trades).
+    """
+
+    equity: float
+    max_equity: float
+    max_drawdown: float = 0.0
+    processed: int = 0
+    last_trade: TradeRecord | None = None
+    generation: int | None = None
+
+
 @dataclass
 class RiskManager:
     """Evalúa límites de riesgo globales, por símbolo y por estrategia."""
 
     risk_limits: RiskLimits
+    _dd_state: dict[tuple[str, str], _DrawdownState] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    # Resultados de las comprobaciones del ciclo en curso, por (ámbito, nombre,
+    # número de trades). None fuera de un ciclo: no se memoiza nada
+    _cycle_results: dict[tuple[str, str, int], bool] | None = field(
+        init=False, repr=False, default=None
+    )
+    # Generación del TradeStore del ciclo en curso (ver begin_cycle). None:
+    # los arrays de PnL se recalculan completos
+    _cycle_generation: int | None = field(init=False, repr=False, default=None)
+
+    def __post_init__(self) -> None:
+        """Especializa las comprobaciones sin límites configurados.
+
+        Si un ámbito no tiene límites, su comprobación se sustituye en la
+        instancia por una función que siempre permite operar, evitando la
+        llamada completa en cada ciclo. Las subclases que redefinen una
+        comprobación conservan su implementación.
+        """
+        limits = self.risk_limits
+        cls = type(self)
+        if (
+            limits.dd_global is None
+            and cls.check_bot_risk_limits is RiskManager.check_bot_risk_limits
+        ):
+            self.check_bot_risk_limits = _always_allowed
+        if (
+            not limits.dd_por_activo
+            and cls.check_symbol_risk_limits is RiskManager.check_symbol_risk_limits
+        ):
+            self.check_symbol_risk_limits = _always_allowed
+        if (
+            not limits.dd_por_estrategia
+            and cls.check_strategy_risk_limits is RiskManager.check_strategy_risk_limits
+        ):
+            self.check_strategy_risk_limits = _always_allowed
+
+    def begin_cycle(self, generation: int | None = None) -> None:
+        """Inicia un ciclo del bot descartando los resultados memoizados del anterior.
 
-    def _calculate_drawdown(self, trades: list[TradeRecord]) -> float:
+        Dentro de un ciclo, repetir una comprobación con el mismo ámbito y el
+        mismo número de trades devuelve el resultado ya calculado.
+
+        Args:
+            generation: Generación del TradeStore del que salen los arrays de
+                PnL que se comprobarán en el ciclo. Si se indica, el drawdown
+                de esos arrays se calcula de forma incremental.
+        """
+        self._cycle_results = {}
+        self._cycle_generation = generation
+
+    def reset_drawdown_cache(self) -> None:
+        """Descarta el estado acumulado de drawdown (p.ej. al reiniciar el historial)."""
+        self._dd_state.clear()
+
+    def _calculate_drawdown(
+        self,
+        trades: list[TradeRecord] | np.ndarray,
+        field_name: str = "",
+        value: str = "",
+    ) -> float:
         """Calcula el drawdown real como porcentaje desde el máximo histórico.
         
         Usa el balance inicial configurado para calcular correctamente el drawdown
         incluso cuando la estrategia comienza con pérdidas.
+
+        El cálculo es incremental: el estado de la curva de equity se guarda por
+        ámbito y en cada llamada solo se recorren los trades añadidos desde la
+        anterior. Se asume que la lista solo crece por el final; si se detecta
+        que fue reemplazada o recortada, el ámbito se recalcula desde cero.
+
+        Si se recibe un array de NumPy con el PnL ya filtrado del ámbito (ver
+        TradeStore) dentro de un ciclo con generación (ver begin_cycle), el
+        cálculo también es incremental: solo se procesa la cola nueva del array
+        mientras la generación no cambie. Sin generación el drawdown se calcula
+        completo de forma vectorizada.
         
         Args:
-            trades: Lista de trades cerrados ordenados cronológicamente.
+            trades: Lista de trades cerrados ordenados cronológicamente, o array
+                con su PnL.
+            field_name: Atributo del trade por el que filtrar ("symbol" o
+                "strategy_name"). Vacío para usar todos los trades.
+            value: Valor que debe tener el atributo para incluir el trade.
             
         Returns:
             Drawdown actual en porcentaje (0-100).
         """
-        if not trades:
+        if len(trades) == 0:
             return 0.0
+
+        if isinstance(trades, np.ndarray):
+            generation = self._cycle_generation
+            if generation is None:
+                initial_balance = self.risk_limits.initial_balance
+                equity, max_equity, max_drawdown = _advance_equity_curve(
+                    initial_balance, initial_balance, 0.0, trades
+                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Drawdown calculado: %.2f%% (Equity: %.2f, Max: %.2f)",
+                                 max_drawdown, equity, max_equity)
+                return max_drawdown
+            return self._advance_array_state(trades, field_name, value, generation)
+
+        key = (field_name, value)
+        state = self._dd_state.get(key)
+        if (
+            state is None
+            or len(trades) < state.processed
+            or (state.processed and trades[state.processed - 1] is not state.last_trade)
+        ):
+            # Usar balance inicial de la configuración
+            initial_balance = self.risk_limits.initial_balance
+            state = _DrawdownState(equity=initial_balance, max_equity=initial_balance)
+            self._dd_state[key] = state
+
+        # PnL de los trades nuevos del ámbito
+        if field_name:
+            pnls = [
+                t.pnl for t in islice(trades, state.processed, None)
+                if getattr(t, field_name) == value
+            ]
+        else:
+            pnls = [t.pnl for t in islice(trades, state.processed, None)]
+
+        equity, max_equity, max_drawdown = _advance_equity_curve(
+            state.equity, state.max_equity, state.max_drawdown, pnls
+        )
+
+        state.equity = equity
+        state.max_equity = max_equity
+        state.max_drawdown = max_drawdown
+        state.processed = len(trades)
+        state.last_trade = trades[-1]
         
-        # Usar balance inicial de la configuración
-        initial_balance = self.risk_limits.initial_balance
-        equity = initial_balance
-        max_equity = initial_balance
-        max_drawdown = 0.0
-        
-        for trade in trades:
-            equity += trade.pnl
-            if equity > max_equity:
-                max_equity = equity
-            
-            # Calcular drawdown actual (max_equity siempre > 0 con balance inicial)
-            current_dd = ((max_equity - equity) / max_equity) * 100
-            if current_dd > max_drawdown:
-                max_drawdown = current_dd
-        
-        logger.debug("Drawdown calculado: %.2f%% (Equity: %.2f, Max: %.2f)", 
-                     max_drawdown, equity, max_equity)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Drawdown calculado: %.2f%% (Equity: %.2f, Max: %.2f)",
+                         max_drawdown, equity, max_equity)
         return max_drawdown
 
+    def _advance_array_state(
+        self, pnls: np.ndarray, field_name: str, value: str, generation: int
+    ) -> float:
+        """Avanza el drawdown de un ámbito con la cola nueva de su array de PnL.
+
+        Args:
+            pnls: PnL del ámbito en orden cronológico (ver TradeStore).
+            field_name: Atributo del ámbito ("symbol", "strategy_name" o vacío).
+            value: Valor del ámbito.
+            generation: Generación del TradeStore del que sale el array.
+
+        Returns:
+            Drawdown actual en porcentaje (0-100).
+        """
+        key = (field_name, value)
+        state = self._dd_state.get(key)
+        if (
+            state is None
+            or state.generation != generation
+            or len(pnls) < state.processed
+        ):
+            logger.debug(
+                "Recalculando drawdown de %s=%s desde cero (generación %d)",
+                field_name or "global", value, generation,
+            )
+            initial_balance = self.risk_limits.initial_balance
+            state = _DrawdownState(
+                equity=initial_balance, max_equity=initial_balance, generation=generation
+            )
+            self._dd_state[key] = state
+
+        state.equity, state.max_equity, state.max_drawdown = _advance_equity_curve(
+            state.equity, state.max_equity, state.max_drawdown, pnls[state.processed:]
+        )
+        state.processed = len(pnls)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Drawdown calculado: %.2f%% (Equity: %.2f, Max: %.2f)",
+                         state.max_drawdown, state.equity, state.max_equity)
+        return state.max_drawdown
+
+    # El TradeStore es casi siempre de solo-añadir por el final: mientras su
+    # generación no cambie, el array filtrado de un ámbito en este ciclo es el
+    # del ciclo anterior más una cola nueva, así que basta con avanzar la curva
+    # de equity sobre esa cola. Una inserción desordenada incrementa la
+    # generación y fuerza el recálculo completo del ámbito. El estado de array
+    # (generation no None) y el de lista (generation None) comparten la clave
+    # del ámbito pero nunca se confunden: cada ruta descarta el estado de la
+    # otra.
+
+    def _cached_result(
+        self, field_name: str, value: str, trades: list[TradeRecord] | np.ndarray
+    ) -> bool | None:
+        """Devuelve el resultado memoizado en el ciclo actual, si existe."""
+        if self._cycle_results is None:
+            return None
+        return self._cycle_results.get((field_name, value, len(trades)))
+
+    def _store_result(
+        self,
+        field_name: str,
+        value: str,
+        trades: list[TradeRecord] | np.ndarray,
+        allowed: bool,
+    ) -> bool:
+        """Memoiza el resultado de una comprobación si hay un ciclo en curso."""
+        if self._cycle_results is not None:
+            self._cycle_results[(field_name, value, len(trades))] = allowed
+        return allowed
+
     def check_bot_risk_limits(self, trades: list[TradeRecord]) -> bool:
         """Valida si el bot puede operar según el drawdown global."""
         if self.risk_limits.dd_global is None:
             return True
+        cached = self._cached_result("", "", trades)
+        if cached is not None:
+            return cached
         drawdown = self._calculate_drawdown(trades)
         allowed = drawdown <= self.risk_limits.dd_global
         if not allowed:
@@ -66,17 +323,19 @@ class RiskManager:
                 drawdown,
                 self.risk_limits.dd_global,
             )
-        return allowed
+        return self._store_result("", "", trades, allowed)
 
     def check_symbol_risk_limits(
-        self, symbol: str, trades: list[TradeRecord]
+        self, symbol: str, trades: list[TradeRecord] | np.ndarray
     ) -> bool:
         """Valida límites de riesgo por símbolo."""
         limit = self.risk_limits.dd_por_activo.get(symbol)
         if limit is None:
             return True
-        filtered = [t for t in trades if t.symbol == symbol]
-        drawdown = self._calculate_drawdown(filtered)
+        cached = self._cached_result("symbol", symbol, trades)
+        if cached is not None:
+            return cached
+        drawdown = self._calculate_drawdown(trades, "symbol", symbol)
         allowed = drawdown <= limit
         if not allowed:
             logger.warning(
@@ -85,17 +344,19 @@ class RiskManager:
                 drawdown,
                 limit,
             )
-        return allowed
+        return self._store_result("symbol", symbol, trades, allowed)
 
     def check_strategy_risk_limits(
-        self, strategy_name: str, trades: list[TradeRecord]
+        self, strategy_name: str, trades: list[TradeRecord] | np.ndarray
     ) -> bool:
         """Valida límites de riesgo por estrategia."""
         limit = self.risk_limits.dd_por_estrategia.get(strategy_name)
         if limit is None:
             return True
-        filtered = [t for t in trades if t.strategy_name == strategy_name]
-        drawdown = self._calculate_drawdown(filtered)
+        cached = self._cached_result("strategy_name", strategy_name, trades)
+        if cached is not None:
+            return cached
+        drawdown = self._calculate_drawdown(trades, "strategy_name", strategy_name)
         allowed = drawdown <= limit
         if not allowed:
             logger.warning(
@@ -104,4 +365,4 @@ class RiskManager:
                 drawdown,
                 limit,
             )
-        return allowed
+        return self._store_result("strategy_name", strategy_name, trades, allowed)
@@ -0,0 +1,25 @@
+"""Kernels numéricos compartidos por las estrategias.
+
+Si Numba está instalado los kernels se compilan con @njit (con caché en disco
+para no pagar la compilación en cada arranque); si no, se ejecutan como
+funciones NumPy normales con el mismo resultado.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from bot_trading.infrastructure._njit import njit
+
+
+@njit(cache=True, fastmath=True)
+def simple_cross(last: np.ndarray, prev: np.ndarray) -> np.ndarray:
+    """Devuelve la máscara de filas cuyo último cierre supera al anterior.
+
+    Args:
+        last: Último cierre de cada símbolo (float32 contiguo).
+        prev: Cierre anterior de cada símbolo (float32 contiguo).
+
+    Returns:
+        Array booleano con True donde last > prev.
+    """
+    return last > prev
@@ -2,15 +2,25 @@
 from __future__ import annotations
 
 import logging
+import threading
 from dataclasses import dataclass, field
 from typing import Optional
+import numpy as np
 import pandas as pd
 
 from bot_trading.application.engine.signals import Signal, SignalType
+from bot_trading.application.strategies._kernels import simple_cross
+from bot_trading.domain.entities import MarketSnapshot
 from bot_trading.application.strategies.base import Strategy
 
 logger = logging.getLogger(__name__)
 
+# Máximo de entradas (símbolo, timeframe) en la caché de decisiones
+_DECISION_CACHE_SIZE = 4096
+
+_BUY = SignalType.BUY
+_SIGNAL_SIZE = 0.01
+
 
 @dataclass
 class SimpleExampleStrategy:
@@ -23,6 +33,17 @@ class SimpleExampleStrategy:
     name: str
     timeframes: list[str]
     allowed_symbols: Optional[list[str]] = None  # Lista de símbolos permitidos (None = todos)
+    sl_multiplier: float = 0.9975  # Stop loss 0.25% por debajo del precio
+    tp_multiplier: float = 1.005  # Take profit 0.5% por encima del precio
+    # (símbolo, timeframe) -> ((timestamp ns y cierre de la última vela), señales)
+    _decision_cache: dict[tuple[str, str], tuple[tuple[int, float], tuple[Signal, ...]]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    # El bot evalúa la misma instancia para varios símbolos en su pool de
+    # hilos: lectura, expulsión y escritura de la caché van bajo este cerrojo
+    _decision_lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
 
     def generate_signals(self, data_by_timeframe: dict[str, pd.DataFrame]) -> list[Signal]:
         """Genera señales dummy para guiar el flujo del bot."""
@@ -35,11 +56,16 @@ class SimpleExampleStrategy:
             logger.debug("Datos insuficientes para generar señal en %s", tf)
             return signals
 
-        close_series = data["close"]
-        symbol_name = data.attrs.get("symbol", "UNKNOWN")
-        
+        # Vista NumPy sin copia: el acceso a la cola es un índice directo
+        close_arr = data["close"].to_numpy(copy=False)
+        if isinstance(data_by_timeframe, MarketSnapshot):
+            symbol_name = data_by_timeframe.symbol
+        else:
+            # Diccionario plano: el símbolo viaja en los attrs del DataFrame
+            symbol_name = data.attrs.get("symbol")
+
         # Validar que tenemos un símbolo válido
-        if not symbol_name or symbol_name == "UNKNOWN":
+        if not symbol_name:
             logger.warning("Símbolo no disponible en attrs del DataFrame")
             return signals
         
@@ -51,24 +77,94 @@ class SimpleExampleStrategy:
             )
             return signals  # Retornar lista vacía si el símbolo no está permitido
         
-        if close_series.iloc[-1] > close_series.iloc[-2]:
-            # Calcular stop loss y take profit básicos
-            current_price = float(close_series.iloc[-1])
-            stop_loss = current_price * 0.9975  # 0.25% abajo
-            take_profit = current_price * 1.005  # 0.5% arriba
-            
-            signals.append(
-                Signal(
-                    symbol=symbol_name,
-                    strategy_name=self.name,
-                    timeframe=tf,
-                    signal_type=SignalType.BUY,
-                    size=0.01,
-                    stop_loss=stop_loss,
-                    take_profit=take_profit,
+        last = close_arr[-1].item()
+        cache_key = (symbol_name, tf)
+        candle_id = None
+        if isinstance(data.index, pd.DatetimeIndex):
+            candle_id = (int(data.index.asi8[-1]), last)
+            with self._decision_lock:
+                cached = self._decision_cache.get(cache_key)
+            if cached is not None and cached[0] == candle_id:
+                logger.debug(
+                    "Decisión reutilizada para %s en %s (vela sin cambios)", symbol_name, tf
                 )
-            )
+                return list(cached[1])
+
+        if last > close_arr[-2]:
+            signals.append(self._buy_signal(symbol_name, tf, last))
             logger.debug("Señal BUY generada para %s en %s", symbol_name, tf)
         else:
             logger.debug("No se genera señal operable en %s", tf)
+
+        if candle_id is not None:
+            decision = (candle_id, tuple(signals))
+            with self._decision_lock:
+                cache = self._decision_cache
+                if cache_key not in cache and len(cache) >= _DECISION_CACHE_SIZE:
+                    # Expulsar la entrada más antigua (los dict conservan el orden de inserción)
+                    cache.pop(next(iter(cache)), None)
+                cache[cache_key] = decision
         return signals
+
+    # La caché guarda por (símbolo, timeframe) la última vela evaluada y su
+    # decisión. Si en el siguiente ciclo la vela es la misma (mismo timestamp
+    # y mismo cierre; la vela en formación cambia de cierre y se reevalúa) se
+    # devuelve la decisión anterior sin recalcular ni construir señales. El
+    # cerrojo solo cubre los accesos al dict (la regla se evalúa fuera), así
+    # que la contención entre los hilos del bot es mínima.
+
+    def generate_signals_batch(self, closes: np.ndarray, symbols: list[str]) -> list[Signal]:
+        """Evalúa la regla de la estrategia para varios símbolos a la vez.
+
+        Args:
+            closes: Matriz float64 (símbolos x velas) con los cierres del primer
+                timeframe de la estrategia; la fila i corresponde a symbols[i].
+            symbols: Nombres de los símbolos en el mismo orden que las filas.
+
+        Returns:
+            Lista de señales BUY, en el orden de symbols.
+        """
+        if not self.timeframes or closes.ndim != 2 or closes.shape[1] < 2:
+            logger.debug("Datos insuficientes para evaluar el lote de %s", self.name)
+            return []
+
+        tf = self.timeframes[0]
+        tail = closes[:, -2:]
+        last = tail[:, 1]
+        # La comparación usa float32 (doble de elementos por registro SIMD);
+        # el precio para SL/TP se sigue leyendo en float64 de last
+        tail_f32 = tail.astype(np.float32, order="F")
+        buy_mask = simple_cross(tail_f32[:, 1], tail_f32[:, 0])
+
+        signals: list[Signal] = []
+        for row in np.flatnonzero(buy_mask):
+            symbol_name = symbols[row]
+            if self.allowed_symbols is not None and symbol_name not in self.allowed_symbols:
+                continue
+            signals.append(self._buy_signal(symbol_name, tf, last[row].item()))
+        logger.debug(
+            "Lote de %d símbolos evaluado por %s: %d señales BUY",
+            len(symbols), self.name, len(signals),
+        )
+        return signals
+
+    # La regla se reduce a comparar los dos últimos cierres de cada fila, así
+    # que el lote extrae la cola (N x 2) una sola vez y delega la comparación
+    # en el kernel simple_cross, compilado con Numba si está disponible. Solo
+    # las filas que disparan señal vuelven a Python para construir el Signal.
+    # La copia en float32 con orden Fortran deja cada columna contigua; dos
+    # cierres que solo difieran por debajo de la precisión de float32 cuentan
+    # como iguales y no generan señal, lo que es el lado conservador.
+
+    def _buy_signal(self, symbol_name: str, tf: str, current_price: float) -> Signal:
+        """Construye una señal BUY con stop loss y take profit básicos."""
+        # Argumentos posicionales, en el orden de los campos de Signal
+        return Signal(
+            symbol_name,
+            self.name,
+            tf,
+            _BUY,
+            _SIGNAL_SIZE,
+            current_price * self.sl_multiplier,
+            current_price * self.tp_multiplier,
+        )
@@ -9,20 +9,49 @@ from __future__ import annotations
 import hashlib
 import logging
 from typing import Dict
+import zlib
 
 logger = logging.getLogger(__name__)
 
+# Bits del mapa de ocupación: se indexa con los 20 bits bajos del Magic Number
+_OCCUPANCY_BITS = 20
+_OCCUPANCY_MASK = (1 << _OCCUPANCY_BITS) - 1
+
+
+def legacy_magic_number(strategy_name: str) -> int:
+    """Magic Number que asignaban las versiones anteriores (derivado de MD5).
+
+    Solo se usa para reconocer posiciones abiertas antes de pasar a CRC32; no
+    resuelve colisiones, igual que no lo hacía el cálculo original para la
+    primera estrategia de cada valor.
+
+    Args:
+        strategy_name: Nombre de la estrategia.
+
+    Returns:
+        Magic Number legado (int32 positivo).
+    """
+    hash_hex = hashlib.md5(strategy_name.encode('utf-8')).hexdigest()[:8]
+    return int(hash_hex, 16) % (2**31)
+
 
 class StrategyRegistry:
     """Gestiona el registro de estrategias y asigna Magic Numbers únicos.
     
     El Magic Number se genera mediante un hash del nombre de la estrategia,
-    garantizando que sea consistente entre ejecuciones del bot.
+    garantizando que sea consistente entre ejecuciones del bot. Es un
+    identificador, no un valor de seguridad, por lo que basta un hash no
+    criptográfico (CRC32).
     """
     
     def __init__(self) -> None:
         self._strategy_to_magic: Dict[str, int] = {}
         self._magic_to_strategy: Dict[int, str] = {}
+        # Magic Numbers legados (MD5) -> estrategia, para reconocer posiciones
+        # abiertas con versiones anteriores del bot
+        self._legacy_to_strategy: Dict[int, str] = {}
+        # Mapa de bits (128 KiB) con los slots ocupados, para descartar colisiones sin tocar el dict
+        self._occupied = bytearray(1 << (_OCCUPANCY_BITS - 3))
     
     def register_strategy(self, strategy_name: str) -> int:
         """Registra una estrategia y devuelve su Magic Number único.
@@ -36,28 +65,50 @@ class StrategyRegistry:
         if strategy_name in self._strategy_to_magic:
             return self._strategy_to_magic[strategy_name]
         
-        # Generar Magic Number mediante hash del nombre
-        # Usar solo los primeros 8 caracteres del hash para obtener un entero de 32 bits
-        hash_hex = hashlib.md5(strategy_name.encode('utf-8')).hexdigest()[:8]
-        magic_number = int(hash_hex, 16) % (2**31)  # Mantener en rango de int32 positivo
+        # Generar Magic Number mediante CRC32 del nombre (hash no criptográfico)
+        magic_number = zlib.crc32(strategy_name.encode('utf-8')) & 0x7FFFFFFF  # int32 positivo
         
         # Verificar colisiones (muy improbable pero posible)
-        if magic_number in self._magic_to_strategy:
+        if self._is_taken(magic_number):
             logger.warning(
                 "Colisión de Magic Number detectada para %s y %s. Incrementando.",
                 strategy_name,
                 self._magic_to_strategy[magic_number]
             )
             # Resolver colisión incrementando
-            while magic_number in self._magic_to_strategy:
-                magic_number = (magic_number + 1) % (2**31)
+            while self._is_taken(magic_number):
+                magic_number = (magic_number + 1) & 0x7FFFFFFF
         
         self._strategy_to_magic[strategy_name] = magic_number
         self._magic_to_strategy[magic_number] = strategy_name
+        slot = magic_number & _OCCUPANCY_MASK
+        self._occupied[slot >> 3] |= 1 << (slot & 7)
+        legacy = legacy_magic_number(strategy_name)
+        if legacy != magic_number:
+            self._legacy_to_strategy.setdefault(legacy, strategy_name)
         
         logger.info("Estrategia '%s' registrada con Magic Number: %d", strategy_name, magic_number)
         return magic_number
+
+    # CRC32 se calcula en C dentro de zlib (con instrucciones específicas de la
+    # CPU cuando existen) y devuelve directamente un entero, sin el paso por
+    # la cadena hexadecimal que requería MD5. El valor sigue siendo
+    # determinista entre ejecuciones, pero distinto del que daba MD5: las
+    # posiciones abiertas con Magic Numbers antiguos se reconocen a través de
+    # resolve_magic_number (ver TradingBot) y docs/MIGRACION_MAGIC_NUMBERS.md.
     
+    def _is_taken(self, magic_number: int) -> bool:
+        """Indica si un Magic Number ya está asignado a otra estrategia."""
+        slot = magic_number & _OCCUPANCY_MASK
+        if not self._occupied[slot >> 3] >> (slot & 7) & 1:
+            return False
+        # El bit solo indica que algún número con esos bits bajos está ocupado
+        return magic_number in self._magic_to_strategy
+
+    # El mapa de bits actúa como filtro previo: un bit a cero garantiza que el
+    # número está libre y responde con un acceso a un byte; solo cuando el bit
+    # está a uno (slot compartido o colisión real) se confirma en el dict.
+
     def get_magic_number(self, strategy_name: str) -> int | None:
         """Obtiene el Magic Number de una estrategia registrada.
         
@@ -80,6 +131,25 @@ class StrategyRegistry:
         """
         return self._magic_to_strategy.get(magic_number)
     
+    def resolve_magic_number(self, magic_number: int | None) -> int | None:
+        """Traduce un Magic Number actual o legado al Magic Number actual.
+
+        Args:
+            magic_number: Magic Number leído de una posición del broker.
+
+        Returns:
+            Magic Number actual de la estrategia a la que pertenece, o None si
+            no corresponde a ninguna estrategia registrada.
+        """
+        if magic_number is None:
+            return None
+        if magic_number in self._magic_to_strategy:
+            return magic_number
+        strategy_name = self._legacy_to_strategy.get(magic_number)
+        if strategy_name is None:
+            return None
+        return self._strategy_to_magic[strategy_name]
+
     def is_registered(self, strategy_name: str) -> bool:
         """Verifica si una estrategia está registrada.
         
@@ -0,0 +1,146 @@
+"""Almacén columnar del historial de trades cerrados.
+
+Guarda los campos numéricos de cada TradeRecord en arrays de NumPy paralelos
+(struct of arrays) para que los filtros por símbolo o estrategia y los cálculos
+de drawdown operen sobre memoria contigua en lugar de recorrer objetos Python.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from bot_trading.domain.entities import TradeRecord
+
+logger = logging.getLogger(__name__)
+
+# Capacidad inicial de los arrays; crece al doble cuando se llena
+_INITIAL_CAPACITY = 64
+
+
+def _to_ns(value: datetime) -> int:
+    """Convierte una fecha a nanosegundos desde el epoch (int64)."""
+    return pd.Timestamp(value).value
+
+
+class TradeStore:
+    """Historial de trades cerrados en formato columnar.
+
+    Los símbolos y nombres de estrategia se internan como identificadores
+    enteros (int32), de modo que filtrar por ellos es una comparación
+    vectorizada. Solo guarda columnas: la vista por objetos del historial es
+    TradingBot.trade_history, que no se duplica aquí.
+
+    Attributes:
+        symbol_ids: Tabla de internado símbolo -> identificador.
+        strategy_ids: Tabla de internado estrategia -> identificador.
+        generation: Contador que se incrementa con cada inserción desordenada;
+            mientras no cambia, los arrays solo han crecido por el final.
+    """
+
+    def __init__(self, trades: Iterable[TradeRecord] = ()) -> None:
+        self._size = 0
+        self._pnl = np.empty(_INITIAL_CAPACITY, dtype=np.float64)
+        self._entry_ns = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+        self._exit_ns = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+        self._symbol_id = np.empty(_INITIAL_CAPACITY, dtype=np.int32)
+        self._strategy_id = np.empty(_INITIAL_CAPACITY, dtype=np.int32)
+        self.symbol_ids: dict[str, int] = {}
+        self.strategy_ids: dict[str, int] = {}
+        self.generation = 0
+        for trade in trades:
+            self.add(trade)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, trade: TradeRecord) -> None:
+        """Añade un trade cerrado manteniendo el orden por fecha de cierre.
+
+        Lo habitual es que el trade sea el más reciente y se añada al final;
+        si llega desordenado se inserta en su posición desplazando el resto.
+
+        Args:
+            trade: Trade a añadir.
+        """
+        if self._size == len(self._pnl):
+            self._grow()
+
+        # Conversiones antes de tocar los arrays: si fallan el almacén no cambia
+        pnl = float(trade.pnl)
+        entry_ns = _to_ns(trade.entry_time)
+        exit_ns = _to_ns(trade.exit_time)
+        size = self._size
+        idx = size
+        if size and exit_ns < self._exit_ns[size - 1]:
+            idx = int(np.searchsorted(self._exit_ns[:size], exit_ns, side="right"))
+            # Los arrays filtrados ya entregados dejan de ser prefijos válidos
+            self.generation += 1
+            for column in self._columns():
+                column[idx + 1 : size + 1] = column[idx:size]
+
+        self._pnl[idx] = pnl
+        self._entry_ns[idx] = entry_ns
+        self._exit_ns[idx] = exit_ns
+        self._symbol_id[idx] = self.symbol_ids.setdefault(trade.symbol, len(self.symbol_ids))
+        self._strategy_id[idx] = self.strategy_ids.setdefault(
+            trade.strategy_name, len(self.strategy_ids)
+        )
+        self._size += 1
+
+    def _columns(self) -> tuple[np.ndarray, ...]:
+        """Devuelve todos los arrays de columnas del almacén."""
+        return (self._pnl, self._entry_ns, self._exit_ns, self._symbol_id, self._strategy_id)
+
+    def _grow(self) -> None:
+        """Duplica la capacidad de todos los arrays conservando su contenido."""
+        capacity = len(self._pnl) * 2
+        for name in ("_pnl", "_entry_ns", "_exit_ns", "_symbol_id", "_strategy_id"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[: self._size] = old[: self._size]
+            setattr(self, name, new)
+        logger.debug("TradeStore ampliado a %d trades", capacity)
+
+    def pnl_array(self) -> np.ndarray:
+        """Devuelve el PnL de todos los trades (vista, sin copia)."""
+        return self._pnl[: self._size]
+
+    def exit_times_ns(self) -> np.ndarray:
+        """Devuelve las fechas de cierre en nanosegundos (vista, sin copia)."""
+        return self._exit_ns[: self._size]
+
+    def entry_times_ns(self) -> np.ndarray:
+        """Devuelve las fechas de apertura en nanosegundos (vista, sin copia)."""
+        return self._entry_ns[: self._size]
+
+    def pnl_for_symbol(self, symbol: str) -> np.ndarray:
+        """Devuelve el PnL de los trades de un símbolo en orden cronológico.
+
+        Args:
+            symbol: Símbolo a filtrar.
+
+        Returns:
+            Array con el PnL de los trades del símbolo (vacío si no hay ninguno).
+        """
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            return self._pnl[:0]
+        return self._pnl[: self._size][self._symbol_id[: self._size] == symbol_id]
+
+    def pnl_for_strategy(self, strategy_name: str) -> np.ndarray:
+        """Devuelve el PnL de los trades de una estrategia en orden cronológico.
+
+        Args:
+            strategy_name: Estrategia a filtrar.
+
+        Returns:
+            Array con el PnL de los trades de la estrategia (vacío si no hay ninguno).
+        """
+        strategy_id = self.strategy_ids.get(strategy_name)
+        if strategy_id is None:
+            return self._pnl[:0]
+        return self._pnl[: self._size][self._strategy_id[: self._size] == strategy_id]
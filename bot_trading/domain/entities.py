@@ -5,12 +5,16 @@ facilitar su uso en distintas capas respetando los principios SOLID.
 """
 from __future__ import annotations
 
+from collections import namedtuple
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Iterable, Optional
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-@dataclass
+
+@dataclass(slots=True)
 class SymbolConfig:
     """Configuración de un símbolo a operar.
 
@@ -25,7 +29,30 @@ class SymbolConfig:
     lot_size: float = 0.0
 
 
-@dataclass
+class MarketSnapshot(dict):
+    """Datos de mercado de un símbolo: {timeframe: DataFrame} más el símbolo.
+
+    Es un dict normal (las estrategias existentes lo siguen usando como
+    data_by_timeframe), pero lleva el símbolo como atributo para no tener
+    que leerlo de DataFrame.attrs en cada evaluación.
+
+    Attributes:
+        symbol: Nombre del símbolo al que pertenecen los datos.
+    """
+
+    __slots__ = ("symbol",)
+
+    def __init__(self, symbol: str, frames: dict[str, "pd.DataFrame"] | None = None) -> None:
+        super().__init__(frames or {})
+        self.symbol = symbol
+
+    @property
+    def frames(self) -> dict[str, "pd.DataFrame"]:
+        """Diccionario {timeframe: DataFrame} (el propio snapshot)."""
+        return self
+
+
+@dataclass(slots=True)
 class StrategyConfig:
     """Configuración específica para estrategias.
 
@@ -38,7 +65,7 @@ class StrategyConfig:
     timeframes: list[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class RiskLimits:
     """Límites de riesgo aplicables al bot.
 
@@ -55,7 +82,7 @@ class RiskLimits:
     initial_balance: float = 10000.0
 
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     """Representa una posición abierta en el broker.
 
@@ -80,7 +107,39 @@ class Position:
     magic_number: Optional[int] = None
 
 
-@dataclass
+# Fila de un TradeRecord como tupla con nombre, en el orden de sus campos
+TradeRecordTuple = namedtuple(
+    "TradeRecordTuple",
+    [
+        "symbol",
+        "strategy_name",
+        "entry_time",
+        "exit_time",
+        "entry_price",
+        "exit_price",
+        "size",
+        "pnl",
+        "stop_loss",
+        "take_profit",
+    ],
+)
+
+# Nombres de columna de TradeRecord, en el mismo orden que TradeRecord.as_tuple()
+TRADE_RECORD_FIELDS: tuple[str, ...] = TradeRecordTuple._fields
+
+
+def _column_values(column: Iterable[Any]) -> Iterable[Any]:
+    """Convierte una columna NumPy a objetos Python (fechas incluidas)."""
+    tolist = getattr(column, "tolist", None)
+    if tolist is None:
+        return column
+    if getattr(column, "dtype", None) is not None and column.dtype.kind == "M":
+        # datetime64[ns].tolist() devuelve enteros; en microsegundos da datetime
+        return column.astype("datetime64[us]").tolist()
+    return tolist()
+
+
+@dataclass(slots=True)
 class TradeRecord:
     """Registro de un trade cerrado para reporting y exportación.
 
@@ -108,8 +167,50 @@ class TradeRecord:
     stop_loss: Optional[float]
     take_profit: Optional[float]
 
-
-@dataclass
+    @property
+    def trade_key(self) -> tuple[datetime, datetime, str, str]:
+        """Clave que identifica el trade para deduplicar el historial."""
+        return (self.entry_time, self.exit_time, self.symbol, self.strategy_name)
+
+    def as_tuple(self) -> TradeRecordTuple:
+        """Devuelve los campos del trade en el orden de TRADE_RECORD_FIELDS."""
+        return TradeRecordTuple(
+            self.symbol,
+            self.strategy_name,
+            self.entry_time,
+            self.exit_time,
+            self.entry_price,
+            self.exit_price,
+            self.size,
+            self.pnl,
+            self.stop_loss,
+            self.take_profit,
+        )
+
+    @classmethod
+    def from_columns(cls, **columns: Iterable[Any]) -> list["TradeRecord"]:
+        """Construye TradeRecord en bloque a partir de columnas paralelas.
+
+        Args:
+            **columns: Una secuencia o array NumPy por campo de TradeRecord
+                (ver TRADE_RECORD_FIELDS), todas de la misma longitud.
+
+        Returns:
+            Lista de TradeRecord, uno por fila.
+
+        Raises:
+            KeyError: Si falta alguna columna.
+        """
+        values = [_column_values(columns[name]) for name in TRADE_RECORD_FIELDS]
+        return list(map(cls, *values))
+
+    # map con varios iterables llama a cls(*fila) directamente desde C: no se
+    # crea un diccionario de kwargs por trade ni se asignan campos uno a uno.
+    # Las columnas NumPy se pasan antes a objetos Python con tolist() para no
+    # guardar escalares NumPy (ni enteros en lugar de fechas) en los registros.
+
+
+@dataclass(slots=True)
 class OrderRequest:
     """Solicitud de orden a enviar al broker.
 
@@ -132,7 +233,7 @@ class OrderRequest:
     magic_number: Optional[int] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class OrderResult:
     """Resultado de una orden enviada al broker.
 
@@ -0,0 +1,42 @@
+"""Relleno de velas sintéticas para el broker simulado."""
+from __future__ import annotations
+
+import numpy as np
+
+from bot_trading.infrastructure._njit import NUMBA_AVAILABLE, njit, prange
+
+
+@njit(cache=True, parallel=True)
+def _fill_prices_kernel(out: np.ndarray, first_close: int) -> None:
+    """Escribe open/high/low = 1.0 y close = first_close + i en cada fila de out (n x 4)."""
+    for i in prange(out.shape[0]):
+        out[i, 0] = 1.0
+        out[i, 1] = 1.0
+        out[i, 2] = 1.0
+        out[i, 3] = first_close + i
+
+
+def fill_prices(out: np.ndarray, first_close: int = 0) -> None:
+    """Rellena in situ una matriz (n x 4) con precios OHLC sintéticos.
+
+    Args:
+        out: Matriz C-contigua float32 o float64 a rellenar; columnas open,
+            high, low, close.
+        first_close: Cierre de la primera fila; cada fila siguiente suma uno.
+    """
+    if NUMBA_AVAILABLE:
+        _fill_prices_kernel(out, first_close)
+        return
+    # Sin Numba el bucle por filas sería Python puro: se usan operaciones por columna
+    out[:, :3] = 1.0
+    out[:, 3] = np.arange(first_close, first_close + out.shape[0], dtype=out.dtype)
+
+
+if NUMBA_AVAILABLE:
+    # Compilar (o cargar de la cache en disco) al importar, no en la primera vela;
+    # float64 es el tipo de las velas del broker simulado
+    _fill_prices_kernel(np.empty((2, 4), dtype=np.float64), 0)
+
+# Con Numba el kernel recorre las filas en paralelo (prange) escribiendo una
+# sola vez cada celda de la matriz ya reservada. Sin Numba, fill_prices cae en
+# la versión vectorizada de NumPy, que da exactamente los mismos valores.
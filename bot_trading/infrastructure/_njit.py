@@ -0,0 +1,25 @@
+"""Acceso opcional a numba.njit y numba.prange.
+
+Si Numba está instalado se reexportan njit y prange; si no, se usa un
+sustituto de njit que devuelve la función sin compilar y prange pasa a ser
+range, de modo que los kernels se ejecutan como código NumPy normal con el
+mismo resultado.
+"""
+from __future__ import annotations
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba es opcional
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Sustituto de numba.njit que devuelve la función sin compilar."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+    NUMBA_AVAILABLE = False
+else:
+    NUMBA_AVAILABLE = True
+
+__all__ = ["NUMBA_AVAILABLE", "njit", "prange"]
@@ -1,14 +1,21 @@
 """Servicios para descarga y resampleo de datos de mercado."""
 from __future__ import annotations
 
+from collections.abc import Mapping
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import datetime
+from enum import IntEnum
+from functools import lru_cache
 import logging
 from typing import Iterable
 
+import numpy as np
 import pandas as pd
 
-from bot_trading.domain.entities import SymbolConfig
+from bot_trading.domain.entities import MarketSnapshot, SymbolConfig
+from bot_trading.infrastructure._njit import njit
 from bot_trading.infrastructure.mt5_client import BrokerClient
+from bot_trading.infrastructure.ohlcv_block import OHLCVBlock
 
 logger = logging.getLogger(__name__)
 
@@ -22,15 +29,307 @@ _TIMEFRAME_MAP = {
 }
 
 
+class Timeframe(IntEnum):
+    """Código entero de cada timeframe soportado (índice en _PERIOD_NS)."""
+
+    M1 = 0
+    M5 = 1
+    M15 = 2
+    H1 = 3
+    H4 = 4
+    D1 = 5
+
+
+# Duración de cada timeframe en nanosegundos, indexada por Timeframe
+_PERIOD_NS = np.array(
+    [
+        60 * 10**9,
+        5 * 60 * 10**9,
+        15 * 60 * 10**9,
+        60 * 60 * 10**9,
+        4 * 60 * 60 * 10**9,
+        24 * 60 * 60 * 10**9,
+    ],
+    dtype=np.int64,
+)
+
+# Vista por nombre de la misma tabla, para el código que trabaja con cadenas
+_TIMEFRAME_NS = {tf.name: int(_PERIOD_NS[tf]) for tf in Timeframe}
+
+# Rango de cada timeframe (menor = más fino), para comparar sin recorrer listas
+_TF_RANK: dict[str, int] = {tf.name: int(tf) for tf in Timeframe}
+
+_OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# Agregación OHLCV para el resampleo con pandas (se reutiliza en cada llamada)
+_OHLCV_AGG = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+}
+
+# Especificación por timeframe: (frecuencia pandas, periodo en ns, agregación)
+_TF_SPEC: dict[str, tuple[str, int, dict[str, str]]] = {
+    tf: (freq, _TIMEFRAME_NS[tf], _OHLCV_AGG) for tf, freq in _TIMEFRAME_MAP.items()
+}
+
+# Hilos por defecto para las descargas en lote cuando no se recibe un executor
+_DEFAULT_BATCH_WORKERS = 8
+
+
+def _timeframe_rank_delta(base_tf: str, target_tf: str) -> int:
+    """Devuelve cuántos escalones separan target_tf de base_tf.
+
+    Args:
+        base_tf: Timeframe base disponible.
+        target_tf: Timeframe objetivo a generar.
+
+    Returns:
+        Diferencia de rango: >= 0 si target_tf puede resamplearse desde
+        base_tf, negativa si es más fino. Los timeframes desconocidos tienen
+        rango -1.
+    """
+    return _TF_RANK.get(target_tf, -1) - _TF_RANK.get(base_tf, -1)
+
+
+@lru_cache(maxsize=128)
+def _validated_targets(base_tf: str, target_timeframes: frozenset[str]) -> tuple[str, ...]:
+    """Valida los timeframes pedidos y devuelve los que hay que resamplear.
+
+    El resultado se memoiza: cada símbolo pide casi siempre el mismo conjunto
+    de timeframes, así que la validación solo se hace la primera vez.
+
+    Args:
+        base_tf: Timeframe base del símbolo.
+        target_timeframes: Timeframes solicitados.
+
+    Returns:
+        Timeframes distintos del base, ordenados de menor a mayor periodo.
+
+    Raises:
+        ValueError: Si algún timeframe no está soportado o es menor que el base.
+    """
+    if base_tf not in _TF_RANK:
+        raise ValueError(f"Timeframe base no soportado: {base_tf}")
+
+    for tf in target_timeframes:
+        if tf not in _TF_RANK:
+            raise ValueError(f"Timeframe solicitado no soportado: {tf}")
+        # Validar que el timeframe solicitado sea >= al timeframe base
+        if _timeframe_rank_delta(base_tf, tf) < 0:
+            raise ValueError(
+                f"Timeframe {tf} no es compatible con timeframe base {base_tf}. "
+                f"No se puede resamplear a un timeframe menor que el disponible."
+            )
+
+    return tuple(
+        sorted(
+            (tf for tf in target_timeframes if tf != base_tf),
+            key=_TF_RANK.__getitem__,
+        )
+    )
+
+
+def _sorted_unique(raw: pd.DataFrame) -> pd.DataFrame:
+    """Ordena las velas por fecha y elimina timestamps duplicados.
+
+    Si el índice ya es estrictamente creciente (el caso habitual) se devuelve
+    el mismo DataFrame sin copiarlo. Ante duplicados se conserva la última
+    vela recibida, que es la más actualizada.
+
+    Args:
+        raw: Velas tal como las devuelve el broker.
+
+    Returns:
+        Velas con índice estrictamente creciente.
+    """
+    if not isinstance(raw.index, pd.DatetimeIndex) or len(raw) < 2:
+        return raw
+
+    index_ns = raw.index.asi8
+    if (index_ns[1:] > index_ns[:-1]).all():
+        return raw
+
+    if not (index_ns[1:] >= index_ns[:-1]).all():
+        logger.debug("Velas recibidas desordenadas; se ordenan por fecha")
+        raw = raw.sort_index(kind="mergesort")
+        index_ns = raw.index.asi8
+    # Tras ordenar, una fila es la última de su timestamp si la siguiente difiere
+    keep = np.r_[index_ns[1:] != index_ns[:-1], True]
+    logger.debug("Eliminadas %d velas con timestamp duplicado", len(keep) - int(keep.sum()))
+    return raw[keep]
+
+
+def _compact_volume(raw: pd.DataFrame) -> pd.DataFrame:
+    """Convierte la columna volume a int64 cuando sus valores son enteros.
+
+    MT5 entrega tick_volume como entero sin signo y algunos brokers como
+    float; en ambos casos se normaliza a int64. Si hay NaN o decimales la
+    columna se deja como está para no perder información.
+
+    Args:
+        raw: Velas del timeframe base.
+
+    Returns:
+        El mismo DataFrame con volume en int64 si procede.
+    """
+    if "volume" not in raw.columns:
+        return raw
+    volume = raw["volume"].to_numpy(copy=False)
+    if volume.dtype == np.int64:
+        return raw
+    if volume.dtype.kind == "f":
+        if not np.isfinite(volume).all() or (volume != np.floor(volume)).any():
+            return raw
+    elif volume.dtype.kind not in "iu":
+        return raw
+    raw["volume"] = volume.astype(np.int64)
+    return raw
+
+
+def _can_resample_with_numpy(raw: pd.DataFrame) -> bool:
+    """Indica si los datos admiten el resampleo rápido con NumPy.
+
+    Requiere un índice temporal creciente en UTC (o sin zona horaria), sin
+    valores nulos y con todas las columnas OHLCV. En cualquier otro caso se
+    usa el resampleo de pandas, que cubre zonas horarias locales y huecos.
+    """
+    index = raw.index
+    if not isinstance(index, pd.DatetimeIndex):
+        return False
+    if index.tz is not None and str(index.tz) != "UTC":
+        return False
+    if not index.is_monotonic_increasing:
+        return False
+    if any(col not in raw.columns for col in _OHLCV_COLUMNS):
+        return False
+    return not raw[list(_OHLCV_COLUMNS)].isna().to_numpy().any()
+
+
+@njit(cache=True)
+def _bucket_ids(index_ns: np.ndarray, tf_code: int) -> np.ndarray:
+    """Devuelve el número de periodo (desde el epoch) de cada vela."""
+    return index_ns // _PERIOD_NS[tf_code]
+
+
+def _reduce_ohlcv(
+    index_ns: np.ndarray, columns: Mapping[str, np.ndarray], tf_code: int
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Agrupa columnas OHLCV en periodos del timeframe tf_code alineados con el epoch.
+
+    Args:
+        index_ns: Inicio de cada vela en nanosegundos (creciente).
+        columns: Arrays open/high/low/close/volume alineados con index_ns.
+        tf_code: Timeframe destino como entero (Timeframe).
+
+    Returns:
+        Tupla (inicio de cada periodo en ns, columnas agregadas).
+    """
+    bucket = _bucket_ids(index_ns, tf_code)
+    # Primera fila de cada periodo: donde cambia el identificador de bucket
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:] - 1, len(bucket) - 1]
+    reduced = {
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+    }
+    return bucket[starts] * _PERIOD_NS[tf_code], reduced
+
+
+def _cascade_resample(
+    index_ns: np.ndarray, columns: Mapping[str, np.ndarray], targets: tuple[str, ...]
+) -> dict[str, tuple[np.ndarray, dict[str, np.ndarray]]]:
+    """Genera todos los timeframes pedidos en cascada a partir de los datos base.
+
+    Solo el timeframe más fino se calcula sobre las velas originales; cada
+    timeframe siguiente se agrega a partir del anterior ya reducido (una vela
+    H1 es la unión de cuatro M15), así que los datos base se recorren una sola
+    vez. Si un periodo no es múltiplo del anterior se parte de nuevo de la base.
+
+    Args:
+        index_ns: Inicio de cada vela base en nanosegundos (creciente).
+        columns: Arrays OHLCV de las velas base.
+        targets: Timeframes a generar, ordenados de menor a mayor periodo.
+
+    Returns:
+        Diccionario timeframe -> (inicio de cada periodo en ns, columnas).
+    """
+    result: dict[str, tuple[np.ndarray, dict[str, np.ndarray]]] = {}
+    source_ns, source, source_period = index_ns, columns, 0
+    for tf in targets:
+        tf_code = Timeframe[tf]
+        period_ns = int(_PERIOD_NS[tf_code])
+        if source_period and period_ns % source_period:
+            source_ns, source = index_ns, columns
+        source_ns, source = _reduce_ohlcv(source_ns, source, int(tf_code))
+        source_period = period_ns
+        result[tf] = (source_ns, source)
+    return result
+
+
+def _resample_block(block: OHLCVBlock, targets: tuple[str, ...]) -> dict[str, OHLCVBlock]:
+    """Agrupa un bloque de velas en todos los timeframes pedidos sin pasar por pandas.
+
+    Args:
+        block: Velas del timeframe base con índice creciente y sin nulos.
+        targets: Timeframes destino, ordenados de menor a mayor periodo.
+
+    Returns:
+        Diccionario timeframe -> OHLCVBlock con las velas agregadas.
+    """
+    index_ns = block.index.view(np.int64)
+    return {
+        tf: OHLCVBlock(bucket_ns.view("datetime64[ns]"), **data, symbol=block.symbol, tz=block.tz)
+        for tf, (bucket_ns, data) in _cascade_resample(index_ns, block.columns(), targets).items()
+    }
+
+
+def _resample_ohlcv_numpy(raw: pd.DataFrame, targets: tuple[str, ...]) -> dict[str, pd.DataFrame]:
+    """Agrupa velas OHLCV en todos los timeframes pedidos con NumPy.
+
+    Equivale a raw.resample(freq).agg(first/max/min/last/sum).dropna() para
+    índices crecientes en UTC: los periodos se alinean con el epoch Unix y los
+    periodos sin datos no aparecen en el resultado.
+
+    Args:
+        raw: Velas del timeframe base con índice temporal creciente.
+        targets: Timeframes destino, ordenados de menor a mayor periodo.
+
+    Returns:
+        Diccionario timeframe -> DataFrame con las velas agregadas.
+    """
+    # El bloque toma las columnas como vistas; solo se construyen los DataFrames finales
+    block = OHLCVBlock.from_frame(raw, raw.attrs.get("symbol", ""))
+    frames: dict[str, pd.DataFrame] = {}
+    for tf, resampled in _resample_block(block, targets).items():
+        frame = resampled.to_frame()
+        frame.index.name = raw.index.name
+        frames[tf] = frame
+    return frames
+
+
 class MarketDataService:
     """Servicio encargado de obtener y resamplear datos OHLCV.
 
     Trabaja con el BrokerClient para descargar el timeframe mínimo disponible y
     generar las series agregadas solicitadas por las estrategias.
+
+    Attributes:
+        broker_client: Cliente del broker del que se descargan las velas.
+        max_workers: Hilos del pool temporal de get_resampled_data_batch cuando
+            no se le pasa un executor.
     """
 
-    def __init__(self, broker_client: BrokerClient) -> None:
+    def __init__(
+        self, broker_client: BrokerClient, max_workers: int = _DEFAULT_BATCH_WORKERS
+    ) -> None:
         self.broker_client = broker_client
+        self.max_workers = max_workers
 
     def get_resampled_data(
         self,
@@ -38,7 +337,7 @@ class MarketDataService:
         target_timeframes: Iterable[str],
         start: datetime,
         end: datetime,
-    ) -> dict[str, pd.DataFrame]:
+    ) -> MarketSnapshot:
         """Descarga y resamplea datos al conjunto de timeframes deseado.
 
         Args:
@@ -48,7 +347,8 @@ class MarketDataService:
             end: Fecha de fin de los datos.
 
         Returns:
-            Diccionario {timeframe: DataFrame} con las velas resampleadas.
+            MarketSnapshot (diccionario {timeframe: DataFrame} con el símbolo
+            como atributo) con las velas resampleadas.
             
         Raises:
             ValueError: Si el timeframe no está soportado.
@@ -61,57 +361,51 @@ class MarketDataService:
             end,
             symbol.min_timeframe,
         )
-        frequencies = set(target_timeframes)
-        frequencies.add(symbol.min_timeframe)
-
-        # Validar timeframes soportados
-        base_freq = _TIMEFRAME_MAP.get(symbol.min_timeframe)
-        if base_freq is None:
-            raise ValueError(f"Timeframe base no soportado: {symbol.min_timeframe}")
-        
-        for tf in frequencies:
-            if tf not in _TIMEFRAME_MAP:
-                raise ValueError(f"Timeframe solicitado no soportado: {tf}")
-            # Validar que el timeframe solicitado sea >= al timeframe base
-            if not self._is_timeframe_compatible(symbol.min_timeframe, tf):
-                raise ValueError(
-                    f"Timeframe {tf} no es compatible con timeframe base {symbol.min_timeframe}. "
-                    f"No se puede resamplear a un timeframe menor que el disponible."
-                )
+        # Validación memoizada; devuelve los timeframes a generar sin el base
+        targets = _validated_targets(symbol.min_timeframe, frozenset(target_timeframes))
 
+        # Si el broker ofrece la capacidad opcional SupportsOHLCVBlock, el
+        # DataFrame base envuelve sus arrays sin copia
+        get_block = getattr(self.broker_client, "get_ohlcv_block", None)
         try:
-            raw = self.broker_client.get_ohlcv(symbol.name, symbol.min_timeframe, start, end)
+            if get_block is not None:
+                raw = get_block(symbol.name, symbol.min_timeframe, start, end).to_frame()
+            else:
+                raw = self.broker_client.get_ohlcv(symbol.name, symbol.min_timeframe, start, end)
         except Exception as e:
             logger.error("Error descargando datos desde broker: %s", e)
             raise RuntimeError(f"No se pudieron obtener datos para {symbol.name}") from e
         
+        # Copia superficial (sin copiar los datos): el DataFrame puede ser del
+        # broker o de su caché y no debe verse afectado por las asignaciones
+        # de columnas y attrs que siguen
+        raw = raw.copy(deep=False)
+        # Ordenar y deduplicar una sola vez; los resampleos posteriores lo asumen
+        raw = _compact_volume(_sorted_unique(raw))
+        raw.attrs["sorted"] = True
         # Asegurar que el símbolo esté en attrs
         raw.attrs["symbol"] = symbol.name
         
         if raw.empty:
             logger.warning("No se recibieron datos para %s", symbol.name)
-            return {symbol.min_timeframe: raw}
+            return MarketSnapshot(symbol.name, {symbol.min_timeframe: raw})
         
-        result: dict[str, pd.DataFrame] = {symbol.min_timeframe: raw}
+        result = MarketSnapshot(symbol.name, {symbol.min_timeframe: raw})
+        resampled_by_tf: dict[str, pd.DataFrame] = {}
+        if targets and _can_resample_with_numpy(raw):
+            try:
+                # Un único recorrido de los datos base para todos los timeframes
+                resampled_by_tf = _resample_ohlcv_numpy(raw, targets)
+            except Exception as e:
+                logger.error("Error en el resampleo con NumPy, se usa pandas: %s", e)
 
-        for tf in frequencies:
-            if tf == symbol.min_timeframe:
-                continue
-            freq = _TIMEFRAME_MAP.get(tf)
-            if freq is None:
-                continue  # Ya validado anteriormente
-            
+        for tf in targets:
+            freq, _, agg = _TF_SPEC[tf]
             try:
-                logger.debug("Resampleando %s a frecuencia %s", tf, freq)
-                resampled = raw.resample(freq).agg(
-                    {
-                        "open": "first",
-                        "high": "max",
-                        "low": "min",
-                        "close": "last",
-                        "volume": "sum",
-                    }
-                ).dropna()
+                resampled = resampled_by_tf.get(tf)
+                if resampled is None:
+                    logger.debug("Resampleando %s a frecuencia %s", tf, freq)
+                    resampled = raw.resample(freq).agg(agg).dropna()
                 # Preservar attrs después del resampleo
                 resampled.attrs["symbol"] = symbol.name
                 result[tf] = resampled
@@ -122,21 +416,68 @@ class MarketDataService:
 
         return result
 
-    def _is_timeframe_compatible(self, base_tf: str, target_tf: str) -> bool:
-        """Verifica si un timeframe objetivo es compatible con el timeframe base.
-        
+    def get_resampled_data_batch(
+        self,
+        symbols: Iterable[SymbolConfig],
+        target_timeframes: Iterable[str] | Mapping[str, Iterable[str]],
+        start: datetime | Mapping[str, datetime],
+        end: datetime,
+        executor: Executor | None = None,
+    ) -> dict[str, dict[str, pd.DataFrame]]:
+        """Descarga y resamplea los datos de varios símbolos en una sola llamada.
+
+        El broker no ofrece un endpoint de descarga múltiple, así que las
+        descargas de cada símbolo se reparten en un pool de hilos y se solapan.
+
         Args:
-            base_tf: Timeframe base disponible.
-            target_tf: Timeframe objetivo a generar.
-            
+            symbols: Configuraciones de los símbolos a descargar.
+            target_timeframes: Timeframes a generar, comunes a todos los símbolos
+                o un diccionario {símbolo: timeframes}.
+            start: Fecha de inicio común o un diccionario {símbolo: fecha}.
+            end: Fecha de fin de los datos.
+            executor: Pool donde lanzar las descargas. Si es None se crea uno
+                temporal de hasta max_workers hilos que se cierra al terminar.
+
         Returns:
-            True si target_tf >= base_tf (puede resamplearse).
+            Diccionario {símbolo: {timeframe: DataFrame}}. Los símbolos cuya
+            descarga falla se registran en el log y no aparecen en el resultado.
         """
-        tf_order = ["M1", "M5", "M15", "M30", "H1", "H4", "D1"]
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(
+                max_workers=max(1, min(len(symbols), self.max_workers)),
+                thread_name_prefix="market-data",
+            )
         try:
-            base_idx = tf_order.index(base_tf)
-            target_idx = tf_order.index(target_tf)
-            return target_idx >= base_idx
-        except ValueError:
-            # Si alguno no está en la lista, asumir compatible
-            return True
+            futures = []
+            for symbol in symbols:
+                timeframes = (
+                    target_timeframes[symbol.name]
+                    if isinstance(target_timeframes, Mapping)
+                    else target_timeframes
+                )
+                symbol_start = start[symbol.name] if isinstance(start, Mapping) else start
+                futures.append(
+                    (
+                        symbol,
+                        executor.submit(
+                            self.get_resampled_data, symbol, timeframes, symbol_start, end
+                        ),
+                    )
+                )
+            logger.debug("Descargando datos de %d símbolos en lote", len(futures))
+
+            result: dict[str, dict[str, pd.DataFrame]] = {}
+            for symbol, future in futures:
+                try:
+                    result[symbol.name] = future.result()
+                except Exception as e:
+                    logger.error("Error obteniendo datos para %s: %s", symbol.name, e)
+            return result
+        finally:
+            if own_executor:
+                executor.shutdown(wait=True)
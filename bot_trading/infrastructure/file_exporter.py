@@ -1,19 +1,66 @@
-"""Utilidades para exportar información a archivos Excel."""
+"""Utilidades para exportar información a archivos Excel y Parquet."""
 from __future__ import annotations
 
+from importlib.util import find_spec
 import logging
 from pathlib import Path
 from typing import Iterable
 
+import numpy as np
 import pandas as pd
 
-from bot_trading.domain.entities import TradeRecord
+from bot_trading.domain.entities import TRADE_RECORD_FIELDS, TradeRecord
 
 logger = logging.getLogger(__name__)
 
+# xlsxwriter es opcional: escribe en streaming y es mucho más rápido que openpyxl
+_HAS_XLSXWRITER = find_spec("xlsxwriter") is not None
+
+# Tipo de cada columna de TradeRecord que no es float64
+_TEXT_FIELDS = frozenset({"symbol", "strategy_name"})
+_TIME_FIELDS = frozenset({"entry_time", "exit_time"})
+
+
+def trades_to_frame(trades: Iterable[TradeRecord]) -> pd.DataFrame:
+    """Construye un DataFrame columnar a partir de una colección de trades.
+
+    Args:
+        trades: Registros a convertir.
+
+    Returns:
+        DataFrame con una columna por campo de TradeRecord, en el orden de
+        TRADE_RECORD_FIELDS. Los stop loss y take profit ausentes se
+        representan como NaN.
+    """
+    rows = [trade.as_tuple() for trade in trades]
+    # Transponer filas a columnas; sin trades, cada columna queda vacía
+    columns = list(zip(*rows)) or [()] * len(TRADE_RECORD_FIELDS)
+
+    data = {}
+    for name, column in zip(TRADE_RECORD_FIELDS, columns):
+        if name in _TEXT_FIELDS:
+            data[name] = list(column)
+        elif name in _TIME_FIELDS:
+            data[name] = pd.to_datetime(list(column))
+        else:
+            # None (SL/TP ausentes) pasa a NaN al construir el array float64
+            data[name] = np.array(column, dtype=np.float64)
+    return pd.DataFrame(data)
+
+# Los trades se recorren una sola vez como tuplas (TradeRecord.as_tuple) y se
+# transponen a columnas (paso de "array de estructuras" a "estructura de
+# arrays"). Así pandas recibe columnas ya tipadas y no tiene que inferir el
+# esquema fila a fila, y las columnas numéricas quedan como float64 contiguos
+# listas para Excel o Parquet. Nombres y orden de columnas salen de
+# TRADE_RECORD_FIELDS, la única definición del esquema de TradeRecord.
+
 
 class ExcelExporter:
-    """Exporta registros de trades y métricas a archivos .xlsx."""
+    """Exporta registros de trades y métricas a archivos .xlsx o Parquet.
+
+    Para volcados grandes (backtests) se recomienda export_trades_parquet;
+    el formato Excel queda para los informes finales.
+    """
 
     def export_trades(self, trades: Iterable[TradeRecord], file_path: Path) -> None:
         """Exporta una colección de TradeRecord a un archivo Excel.
@@ -22,7 +69,35 @@ class ExcelExporter:
             trades: Registros a exportar.
             file_path: Ruta del archivo destino.
         """
-        df = pd.DataFrame([trade.__dict__ for trade in trades])
+        df = trades_to_frame(trades)
         file_path.parent.mkdir(parents=True, exist_ok=True)
         logger.info("Exportando %d trades a %s", len(df), file_path)
-        df.to_excel(file_path, index=False)
+        if not _HAS_XLSXWRITER:
+            df.to_excel(file_path, index=False)
+            return
+        # Modo constant_memory: cada fila se escribe a disco en cuanto se completa
+        with pd.ExcelWriter(
+            file_path,
+            engine="xlsxwriter",
+            engine_kwargs={"options": {"constant_memory": True}},
+        ) as writer:
+            df.to_excel(writer, index=False)
+
+    def export_trades_parquet(self, trades: Iterable[TradeRecord], file_path: Path) -> None:
+        """Exporta una colección de TradeRecord a un archivo Parquet comprimido con ZSTD.
+
+        Args:
+            trades: Registros a exportar.
+            file_path: Ruta del archivo destino.
+
+        Raises:
+            ImportError: Si no hay un motor Parquet instalado (pyarrow).
+        """
+        df = trades_to_frame(trades)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        logger.info("Exportando %d trades a %s (Parquet)", len(df), file_path)
+        df.to_parquet(file_path, index=False, compression="zstd")
+
+    # Parquet guarda cada columna como un buffer tipado, así que escribir miles
+    # de trades es un volcado por columna en lugar de serializar celda a celda
+    # como hace Excel. Las columnas ya llegan tipadas desde trades_to_frame.
@@ -15,15 +15,26 @@ Esta implementación incluye:
 """
 from __future__ import annotations
 
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import random
+import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional, Protocol
 
 import MetaTrader5 as mt5
+import numpy as np
 import pandas as pd
 
 from bot_trading.domain.entities import OrderRequest, OrderResult, Position, TradeRecord
+from bot_trading.infrastructure.ohlcv_block import OHLCVBlock
+from bot_trading.infrastructure.ohlcv_cache import OHLCVCache
 
 # Configuración de logging
 logger = logging.getLogger(__name__)
@@ -74,14 +85,48 @@ class BrokerClient(Protocol):
     ) -> pd.DataFrame:
         """Obtiene datos OHLCV para un símbolo y timeframe."""
 
-    def send_market_order(self, order_request: OrderRequest) -> OrderResult:
-        """Envía una orden a mercado y devuelve el resultado."""
+    def send_market_order(
+        self, order_request: OrderRequest, now: Optional[datetime] = None
+    ) -> OrderResult:
+        """Envía una orden a mercado y devuelve el resultado.
+
+        now es el instante del ciclo; un broker simulado lo usa para fechar
+        aperturas y cierres en lugar de leer el reloj en cada orden.
+        """
 
     def get_open_positions(self) -> list[Position]:
         """Recupera las posiciones abiertas."""
 
-    def get_closed_trades(self) -> list[TradeRecord]:
-        """Recupera trades cerrados recientes."""
+    def get_closed_trades(
+        self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None
+    ) -> list[TradeRecord]:
+        """Recupera trades cerrados en un rango (por defecto, recientes)."""
+
+
+class SupportsBatchOrders(Protocol):
+    """Capacidad opcional de un broker: enviar un lote de órdenes en una llamada.
+
+    OrderExecutor la detecta con getattr y, si el broker no la ofrece, envía
+    las órdenes de una en una con send_market_order.
+    """
+
+    def send_market_orders(
+        self, order_requests: list[OrderRequest], now: Optional[datetime] = None
+    ) -> list[OrderResult]:
+        """Envía un lote de órdenes y devuelve sus resultados en el mismo orden."""
+
+
+class SupportsOHLCVBlock(Protocol):
+    """Capacidad opcional de un broker: entregar velas como bloque de arrays.
+
+    MarketDataService la detecta con getattr y, si el broker no la ofrece,
+    usa get_ohlcv de BrokerClient.
+    """
+
+    def get_ohlcv_block(
+        self, symbol: str, timeframe: str, start: datetime, end: datetime
+    ) -> OHLCVBlock:
+        """Como get_ohlcv, pero devuelve las velas como OHLCVBlock."""
 
 
 # =============================================================================
@@ -101,6 +146,44 @@ TIMEFRAME_MAP = {
     "MN1": mt5.TIMEFRAME_MN1,
 }
 
+# Precalculados para validar timeframes y componer el mensaje de error
+_VALID_TIMEFRAMES = frozenset(TIMEFRAME_MAP)
+_TIMEFRAME_KEYS_STR = ", ".join(TIMEFRAME_MAP)
+
+# Ventana por defecto de get_closed_trades (móvil, no desde medianoche)
+_DEFAULT_HISTORY_WINDOW = timedelta(hours=24)
+
+# Tipos de orden aceptados por send_market_order (tupla para mensajes, set para validar)
+_ORDER_TYPES = ("BUY", "SELL", "CLOSE")
+_VALID_ORDER_TYPES = frozenset(_ORDER_TYPES)
+
+
+@lru_cache(maxsize=64)
+def _step_decimals(step: float) -> int:
+    """Devuelve el número de decimales de un step de volumen (0.01 -> 2).
+
+    Args:
+        step: volume_step del símbolo.
+
+    Returns:
+        Decimales significativos del step en su representación decimal.
+    """
+    return max(0, -Decimal(repr(step)).normalize().as_tuple().exponent)
+
+
+# Resultado de get_ohlcv cuando MT5 no devuelve velas (fines de semana,
+# festivos); se construye una vez con los dtypes definitivos y se devuelve copia
+_EMPTY_OHLCV = pd.DataFrame(
+    {
+        "open": pd.Series(dtype="f8"),
+        "high": pd.Series(dtype="f8"),
+        "low": pd.Series(dtype="f8"),
+        "close": pd.Series(dtype="f8"),
+        "volume": pd.Series(dtype="i8"),
+    },
+    index=pd.DatetimeIndex([], name="datetime"),
+)
+
 
 # =============================================================================
 # CLIENTE METATRADER 5
@@ -118,20 +201,52 @@ class MetaTrader5Client:
         connected: Estado de la conexión con MT5.
         max_retries: Número máximo de reintentos para operaciones críticas.
         retry_delay: Delay en segundos entre reintentos (con exponential backoff).
-        _symbol_info_cache: Cache de información de símbolos para optimizar consultas.
+        _symbol_info_cache: Cache LRU de información de símbolos con caducidad
+            (símbolo -> [instante de expiración monotónico, SymbolInfo,
+            filling mode resuelto o None si aún no se ha calculado]).
     """
 
-    def __init__(self, max_retries: int = 3, retry_delay: float = 1.0) -> None:
+    # Segundos que se reutiliza la información de un símbolo antes de reconsultarla
+    SYMBOL_INFO_TTL: float = 60.0
+    # Máximo de símbolos en cache; se descarta el usado hace más tiempo
+    SYMBOL_INFO_CACHE_SIZE: int = 256
+    # Tope en segundos de la espera entre reintentos de conexión
+    MAX_RETRY_DELAY: float = 30.0
+    # Segundos durante los que se da por vivo el terminal tras comprobarlo
+    LIVENESS_TTL: float = 1.0
+    # Hilos máximos de get_ohlcv_multi
+    OHLCV_MAX_WORKERS: int = 8
+
+    def __init__(
+        self, max_retries: int = 3, retry_delay: float = 1.0, cache_dir: Optional[Path] = None
+    ) -> None:
         """Inicializa el cliente MT5.
 
         Args:
             max_retries: Número máximo de reintentos para operaciones.
             retry_delay: Delay base entre reintentos en segundos.
+            cache_dir: Directorio de la cache Parquet de OHLCV. None la desactiva.
         """
         self.connected: bool = False
         self.max_retries: int = max_retries
         self.retry_delay: float = retry_delay
-        self._symbol_info_cache: dict = {}
+        self._symbol_info_cache: OrderedDict[str, list] = OrderedDict()
+        self._symbol_cache_lock = threading.Lock()
+        # Instante monotónico de la última comprobación de terminal_info() correcta
+        self._last_alive_check: float = 0.0
+        # Campos comunes a toda orden de mercado; se rellena en connect()
+        self._order_base: dict = {}
+        self._ohlcv_cache: Optional[OHLCVCache] = (
+            OHLCVCache(cache_dir) if cache_dir is not None else None
+        )
+        # Foto de posiciones mantenida por start_position_poller (None = inactiva)
+        self._positions_snapshot: Optional[list[Position]] = None
+        self._positions_lock = threading.Lock()
+        self._poller_stop = threading.Event()
+        self._poller_thread: Optional[threading.Thread] = None
+        # Pool de descargas OHLCV en paralelo; se crea con la primera descarga en lote
+        self._ohlcv_pool: Optional[ThreadPoolExecutor] = None
+        self._ohlcv_pool_lock = threading.Lock()
         
         logger.info("MetaTrader5Client inicializado con max_retries=%d, retry_delay=%.2f", 
                     max_retries, retry_delay)
@@ -156,6 +271,11 @@ class MetaTrader5Client:
             )
         
         self.connected = True
+        self._order_base = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "deviation": 20,  # Desviación máxima de precio en puntos
+            "type_time": mt5.ORDER_TIME_GTC,
+        }
         
         # Obtener información del terminal para logs
         terminal_info = mt5.terminal_info()
@@ -169,6 +289,32 @@ class MetaTrader5Client:
             
         logger.debug("Estado de conexión actualizado: connected=True")
 
+    def warm_up(self, symbols: list[str]) -> None:
+        """Prepara el cliente para operar antes de entrar en el bucle de trading.
+
+        Verifica la conexión y, para cada símbolo, deja en cache SymbolInfo y
+        el filling mode y pide un tick, de modo que la primera orden no pague
+        esas consultas al terminal.
+
+        Args:
+            symbols: Símbolos que se van a operar.
+
+        Raises:
+            MT5ConnectionError: Si no hay conexión y no se puede reconectar.
+        """
+        self._ensure_connected()
+        for symbol in symbols:
+            try:
+                self._get_filling_mode(symbol)
+                mt5.symbol_info_tick(symbol)
+            except Exception as e:
+                logger.warning("No se pudo precalentar %s: %s", symbol, e)
+        logger.info("Cliente MT5 precalentado para %d símbolos", len(symbols))
+
+    # La plantilla de orden se crea al conectar (y no como atributo de clase)
+    # para leer las constantes del módulo mt5 activo en ese momento; cada
+    # orden la expande con ** y añade solo los campos que cambian.
+
     def _ensure_connected(self) -> None:
         """Verifica que existe conexión activa, si no intenta reconectar.
 
@@ -177,13 +323,64 @@ class MetaTrader5Client:
         """
         if not self.connected:
             logger.warning("No hay conexión activa. Intentando reconectar...")
-            self.connect()
+            self._connect_with_backoff()
+            return
+        
+        # El terminal respondió hace menos de LIVENESS_TTL: no repetir la consulta
+        now = time.monotonic()
+        if now - self._last_alive_check < self.LIVENESS_TTL:
+            return
         
         # Verificar que MT5 realmente está disponible
-        if not mt5.terminal_info():
-            logger.warning("Terminal MT5 no responde. Intentando reinicializar...")
+        if mt5.terminal_info():
+            self._last_alive_check = now
+            return
+        logger.warning("Terminal MT5 no responde. Intentando reinicializar...")
+        self.connected = False
+        self._connect_with_backoff()
+
+    def _connect_with_backoff(self) -> None:
+        """Conecta con MT5 reintentando con espera exponencial y jitter.
+
+        Hace hasta max_retries intentos. Antes del intento n (n >= 1) espera
+        min(MAX_RETRY_DELAY, retry_delay * 2**(n-1)) más un jitter aleatorio de
+        hasta el 25% de esa espera. Un intento solo cuenta como exitoso si,
+        además de inicializar, el terminal responde a terminal_info().
+
+        Raises:
+            MT5ConnectionError: Si se agotan los intentos sin conexión.
+        """
+        attempts = max(1, self.max_retries)
+        last_error: MT5ConnectionError | None = None
+        for attempt in range(attempts):
+            if attempt:
+                delay = min(self.MAX_RETRY_DELAY, self.retry_delay * 2 ** (attempt - 1))
+                delay += random.uniform(0, 0.25 * delay)
+                logger.warning("Reintento de conexión %d/%d en %.2f segundos",
+                               attempt + 1, attempts, delay)
+                time.sleep(delay)
+            try:
+                self.connect()
+            except MT5ConnectionError as e:
+                last_error = e
+                continue
+            if mt5.terminal_info():
+                self._last_alive_check = time.monotonic()
+                return
             self.connected = False
-            self.connect()
+            last_error = MT5ConnectionError("El terminal MT5 no responde tras inicializar")
+            logger.error("Terminal MT5 inicializado pero sin respuesta (intento %d/%d)",
+                         attempt + 1, attempts)
+
+        logger.error("No se pudo conectar con MT5 tras %d intentos", attempts)
+        raise last_error
+
+    # El jitter reparte en el tiempo los reintentos de varios procesos que
+    # pierden la conexión a la vez (por ejemplo, en el mantenimiento del
+    # broker) y el tope evita esperas desmesuradas con max_retries altos.
+    # terminal_info() es una llamada entre procesos, así que _ensure_connected
+    # solo la repite cuando ha pasado LIVENESS_TTL desde la última respuesta
+    # correcta; un order_send sin respuesta invalida esa marca.
 
     def _get_symbol_info(self, symbol: str) -> mt5.SymbolInfo:
         """Obtiene información del símbolo con cache.
@@ -197,13 +394,13 @@ class MetaTrader5Client:
         Raises:
             MT5DataError: Si el símbolo no existe o no está disponible.
         """
-        # Verificar cache
-        if symbol in self._symbol_info_cache:
-            cache_time, cached_info = self._symbol_info_cache[symbol]
-            # Cache válido por 60 segundos
-            if time.time() - cache_time < 60:
-                logger.debug("Usando información cacheada para símbolo: %s", symbol)
-                return cached_info
+        # Verificar cache (reloj monotónico: inmune a cambios de hora del sistema)
+        now = time.monotonic()
+        with self._symbol_cache_lock:
+            cached = self._symbol_info_cache.get(symbol)
+            if cached is not None and now < cached[0]:
+                self._symbol_info_cache.move_to_end(symbol)
+                return cached[1]
         
         # Consultar a MT5
         logger.debug("Consultando información de símbolo: %s", symbol)
@@ -224,13 +421,22 @@ class MetaTrader5Client:
                            symbol, error_code, error_msg)
                 raise MT5DataError(f"No se pudo hacer visible el símbolo '{symbol}'")
         
-        # Cachear
-        self._symbol_info_cache[symbol] = (time.time(), symbol_info)
+        # Cachear con expiración y descartar el símbolo menos usado si se llena
+        with self._symbol_cache_lock:
+            self._symbol_info_cache[symbol] = [now + self.SYMBOL_INFO_TTL, symbol_info, None]
+            self._symbol_info_cache.move_to_end(symbol)
+            if len(self._symbol_info_cache) > self.SYMBOL_INFO_CACHE_SIZE:
+                self._symbol_info_cache.popitem(last=False)
         logger.debug("Información de símbolo %s cacheada. Spread: %d, Lot min: %.2f",
                     symbol, symbol_info.spread, symbol_info.volume_min)
         
         return symbol_info
 
+    # En un acierto de cache solo se compara la expiración y se marca el
+    # símbolo como usado recientemente; la comprobación de visibilidad y
+    # symbol_select solo se hacen al consultar MT5. El lock protege el
+    # OrderedDict cuando las órdenes se envían desde varios hilos.
+
     def _get_filling_mode(self, symbol: str) -> int:
         """Obtiene el filling mode compatible con el símbolo.
         
@@ -246,13 +452,32 @@ class MetaTrader5Client:
             Constante de filling mode de MT5 compatible con el símbolo.
         """
         symbol_info = self._get_symbol_info(symbol)
-        
-        # Verificar qué modos de llenado soporta el símbolo
-        # filling_mode es un bitmask donde cada bit representa un modo
-        filling_modes = symbol_info.filling_mode
-        
-        logger.info("Filling modes para %s: %d (binario: %s)", 
-                   symbol, filling_modes, bin(filling_modes))
+        with self._symbol_cache_lock:
+            entry = self._symbol_info_cache.get(symbol)
+            if entry is not None and entry[1] is symbol_info and entry[2] is not None:
+                return entry[2]
+
+        filling_mode = self._resolve_filling_mode(symbol, symbol_info.filling_mode)
+        with self._symbol_cache_lock:
+            entry = self._symbol_info_cache.get(symbol)
+            if entry is not None and entry[1] is symbol_info:
+                entry[2] = filling_mode
+        return filling_mode
+
+    @staticmethod
+    def _resolve_filling_mode(symbol: str, filling_modes: int) -> int:
+        """Elige el filling mode a partir del bitmask de modos soportados.
+
+        Args:
+            symbol: Nombre del símbolo (solo para logs).
+            filling_modes: Bitmask filling_mode de SymbolInfo.
+
+        Returns:
+            Constante de filling mode de MT5.
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Filling modes para %s: %d (binario: %s)",
+                         symbol, filling_modes, bin(filling_modes))
         
         # Prioridad: FOK > IOC > RETURN
         # FOK es el más común para Forex
@@ -260,19 +485,25 @@ class MetaTrader5Client:
         # Bit 1 (valor 2) = ORDER_FILLING_IOC
         # Bit 2 (valor 4) = ORDER_FILLING_RETURN
         if filling_modes & 1:  # Bit 0: ORDER_FILLING_FOK
-            logger.info("Usando ORDER_FILLING_FOK para %s", symbol)
+            logger.debug("Usando ORDER_FILLING_FOK para %s", symbol)
             return mt5.ORDER_FILLING_FOK
         elif filling_modes & 2:  # Bit 1: ORDER_FILLING_IOC
-            logger.info("Usando ORDER_FILLING_IOC para %s", symbol)
+            logger.debug("Usando ORDER_FILLING_IOC para %s", symbol)
             return mt5.ORDER_FILLING_IOC
         elif filling_modes & 4:  # Bit 2: ORDER_FILLING_RETURN
-            logger.info("Usando ORDER_FILLING_RETURN para %s", symbol)
+            logger.debug("Usando ORDER_FILLING_RETURN para %s", symbol)
             return mt5.ORDER_FILLING_RETURN
         else:
             # Fallback: usar FOK por defecto
             logger.warning("No se detectó filling mode para %s, usando FOK por defecto", symbol)
             return mt5.ORDER_FILLING_FOK
 
+    # El filling mode depende solo de SymbolInfo, así que se calcula una vez y
+    # se guarda en la misma entrada de cache; caduca con ella. Se rellena la
+    # primera vez que se pide (no al descargar SymbolInfo) porque las consultas
+    # de datos no lo necesitan. La comprobación "entry[1] is symbol_info" evita
+    # guardar el modo en una entrada que se haya renovado entretanto.
+
     def get_ohlcv(
         self, symbol: str, timeframe: str, start: datetime, end: datetime
     ) -> pd.DataFrame:
@@ -295,30 +526,227 @@ class MetaTrader5Client:
         logger.info("Descargando OHLCV para %s, timeframe=%s, desde %s hasta %s",
                    symbol, timeframe, start, end)
         
-        # Verificar conexión
+        self._validate_ohlcv_request(timeframe, start, end)
+        
+        # Un rango ya cacheado en disco no necesita conexión con MT5
+        if self._ohlcv_cache is not None:
+            cached = self._ohlcv_cache.get(symbol, timeframe, start, end)
+            if cached is not None:
+                logger.info("OHLCV de %s %s servido desde cache", symbol, timeframe)
+                return cached
+        
+        # Verificar conexión (tras las validaciones locales, que no necesitan MT5)
         self._ensure_connected()
         
+        return self._download_ohlcv(symbol, timeframe, start, end)
+
+    def get_ohlcv_block(
+        self, symbol: str, timeframe: str, start: datetime, end: datetime
+    ) -> OHLCVBlock:
+        """Descarga datos OHLCV desde MetaTrader5 como bloque de arrays.
+
+        Args:
+            symbol: Símbolo a consultar (ej: "EURUSD").
+            timeframe: Timeframe solicitado (M1, M5, M15, M30, H1, H4, D1, W1, MN1).
+            start: Fecha y hora de inicio del rango.
+            end: Fecha y hora de fin del rango.
+
+        Returns:
+            OHLCVBlock con las mismas velas que get_ohlcv.
+
+        Raises:
+            MT5ConnectionError: Si no hay conexión activa.
+            MT5DataError: Si hay error al descargar los datos.
+            ValueError: Si los parámetros no son válidos.
+        """
+        # Pasa por get_ohlcv para compartir validación y cache en disco; las
+        # columnas del DataFrame se toman como vistas, sin copiarlas
+        return OHLCVBlock.from_frame(self.get_ohlcv(symbol, timeframe, start, end), symbol)
+
+    def get_ohlcv_multi(
+        self, symbols: list[str], timeframe: str, start: datetime, end: datetime
+    ) -> dict[str, pd.DataFrame]:
+        """Descarga datos OHLCV de varios símbolos en paralelo.
+
+        Args:
+            symbols: Símbolos a consultar.
+            timeframe: Timeframe solicitado, común a todos los símbolos.
+            start: Fecha y hora de inicio del rango.
+            end: Fecha y hora de fin del rango.
+
+        Returns:
+            Diccionario símbolo -> DataFrame con el mismo formato que get_ohlcv.
+            Los símbolos cuya descarga falla se registran en el log y se omiten.
+
+        Raises:
+            MT5ConnectionError: Si no hay conexión activa.
+            ValueError: Si el timeframe o el rango de fechas no son válidos.
+        """
+        logger.info("Descargando OHLCV de %d símbolos, timeframe=%s, desde %s hasta %s",
+                   len(symbols), timeframe, start, end)
+        
+        self._validate_ohlcv_request(timeframe, start, end)
+        
+        result: dict[str, pd.DataFrame] = {}
+        pending = symbols
+        if self._ohlcv_cache is not None:
+            pending = []
+            for symbol in symbols:
+                cached = self._ohlcv_cache.get(symbol, timeframe, start, end)
+                if cached is None:
+                    pending.append(symbol)
+                else:
+                    result[symbol] = cached
+        if not pending:
+            return result
+        self._ensure_connected()
+        
+        executor = self._ohlcv_executor()
+        futures = [
+            (symbol, executor.submit(self._download_ohlcv, symbol, timeframe, start, end))
+            for symbol in pending
+        ]
+        for symbol, future in futures:
+            try:
+                result[symbol] = future.result()
+            except Exception as e:
+                logger.error("Error obteniendo datos para %s: %s", symbol, e)
+        return result
+
+    async def get_ohlcv_many(
+        self, requests: list[tuple[str, str, datetime, datetime]]
+    ) -> dict[str, pd.DataFrame]:
+        """Versión asíncrona de la descarga en lote, con timeframe y rango por símbolo.
+
+        Cada descarga se ejecuta en el pool de hilos del cliente y se esperan
+        todas a la vez, así que el tiempo total es el de la más lenta.
+
+        Args:
+            requests: Tuplas (símbolo, timeframe, start, end), como mucho una
+                por símbolo.
+
+        Returns:
+            Diccionario símbolo -> DataFrame con el mismo formato que get_ohlcv.
+            Los símbolos cuya descarga falla se registran en el log y se omiten.
+
+        Raises:
+            MT5ConnectionError: Si no hay conexión activa.
+            ValueError: Si algún timeframe o rango de fechas no es válido, o si
+                un símbolo aparece en más de una petición.
+        """
+        seen: set[str] = set()
+        duplicated: set[str] = set()
+        for symbol, *_ in requests:
+            if symbol in seen:
+                duplicated.add(symbol)
+            seen.add(symbol)
+        if duplicated:
+            logger.error("Símbolos repetidos en get_ohlcv_many: %s", sorted(duplicated))
+            raise ValueError(
+                f"Cada símbolo solo puede pedirse una vez por lote: {sorted(duplicated)}"
+            )
+        for _, timeframe, start, end in requests:
+            self._validate_ohlcv_request(timeframe, start, end)
+        
+        result: dict[str, pd.DataFrame] = {}
+        pending = []
+        for request in requests:
+            cached = (
+                self._ohlcv_cache.get(*request) if self._ohlcv_cache is not None else None
+            )
+            if cached is None:
+                pending.append(request)
+            else:
+                result[request[0]] = cached
+        if not pending:
+            return result
+        self._ensure_connected()
+        
+        loop = asyncio.get_running_loop()
+        executor = self._ohlcv_executor()
+        frames = await asyncio.gather(
+            *(loop.run_in_executor(executor, self._download_ohlcv, *request)
+              for request in pending),
+            return_exceptions=True,
+        )
+        for (symbol, *_), frame in zip(pending, frames):
+            if isinstance(frame, BaseException):
+                logger.error("Error obteniendo datos para %s: %s", symbol, frame)
+            else:
+                result[symbol] = frame
+        return result
+
+    def _ohlcv_executor(self) -> ThreadPoolExecutor:
+        """Devuelve el pool de descargas OHLCV, creándolo la primera vez."""
+        pool = self._ohlcv_pool
+        if pool is not None:
+            return pool
+        with self._ohlcv_pool_lock:
+            # Otro hilo pudo crearlo mientras se esperaba el cerrojo
+            if self._ohlcv_pool is None:
+                self._ohlcv_pool = ThreadPoolExecutor(
+                    max_workers=self.OHLCV_MAX_WORKERS, thread_name_prefix="mt5-ohlcv"
+                )
+                logger.debug("Pool de descargas OHLCV creado (%d hilos)", self.OHLCV_MAX_WORKERS)
+            return self._ohlcv_pool
+
+    # La librería MetaTrader5 libera el GIL mientras espera al terminal en
+    # copy_rates_range, así que un pool de hilos solapa las esperas de varios
+    # símbolos. Timeframe, fechas y conexión se validan una sola vez para todo
+    # el lote; cada hilo solo consulta SymbolInfo (cacheado) y descarga. El
+    # pool vive con el cliente (se cierra en close()) para no crear hilos en
+    # cada ciclo; get_ohlcv_many lo reutiliza desde asyncio con run_in_executor.
+    # Se crea bajo _ohlcv_pool_lock (con lectura previa sin cerrojo para el
+    # caso habitual, ya creado): dos descargas en lote simultáneas no pueden
+    # crear cada una su pool y dejar uno huérfano que close() no cerraría.
+    # El resultado se indexa por símbolo, así que get_ohlcv_many rechaza antes
+    # de descargar nada un lote con dos peticiones del mismo símbolo (distinto
+    # timeframe o rango): una sobrescribiría a la otra sin dejar rastro.
+
+    def _validate_ohlcv_request(self, timeframe: str, start: datetime, end: datetime) -> None:
+        """Valida timeframe y rango de fechas de una descarga OHLCV.
+
+        Raises:
+            ValueError: Si el timeframe no existe o start no es anterior a end.
+        """
         # Validar timeframe
-        if timeframe not in TIMEFRAME_MAP:
-            logger.error("Timeframe inválido: %s. Válidos: %s", 
-                        timeframe, list(TIMEFRAME_MAP.keys()))
+        if timeframe not in _VALID_TIMEFRAMES:
+            logger.error("Timeframe inválido: %s. Válidos: %s",
+                        timeframe, _TIMEFRAME_KEYS_STR)
             raise ValueError(
                 f"Timeframe '{timeframe}' no es válido. "
-                f"Debe ser uno de: {', '.join(TIMEFRAME_MAP.keys())}"
+                f"Debe ser uno de: {_TIMEFRAME_KEYS_STR}"
             )
         
         # Validar fechas
         if start >= end:
             logger.error("Rango de fechas inválido: start=%s >= end=%s", start, end)
             raise ValueError("La fecha de inicio debe ser anterior a la fecha de fin")
-        
+
+    def _download_ohlcv(
+        self, symbol: str, timeframe: str, start: datetime, end: datetime
+    ) -> pd.DataFrame:
+        """Descarga y convierte las velas de un símbolo (sin validar argumentos).
+
+        Si la cache en disco está activa, guarda el resultado no vacío.
+
+        Args:
+            symbol: Símbolo a consultar.
+            timeframe: Timeframe ya validado (clave de TIMEFRAME_MAP).
+            start: Fecha y hora de inicio del rango.
+            end: Fecha y hora de fin del rango.
+
+        Returns:
+            DataFrame con índice datetime y columnas open, high, low, close, volume.
+
+        Raises:
+            MT5DataError: Si el símbolo no es válido o falla la descarga.
+        """
         # Validar símbolo
         self._get_symbol_info(symbol)
         
-        # Mapear timeframe
-        mt5_timeframe = TIMEFRAME_MAP[timeframe]
-        
         # Descargar datos
+        mt5_timeframe = TIMEFRAME_MAP[timeframe]
         logger.debug("Llamando a mt5.copy_rates_range con timeframe=%d", mt5_timeframe)
         rates = mt5.copy_rates_range(symbol, mt5_timeframe, start, end)
         
@@ -333,34 +761,47 @@ class MetaTrader5Client:
         
         if len(rates) == 0:
             logger.warning("No hay datos disponibles para el rango solicitado")
-            # Retornar DataFrame vacío con columnas correctas y DatetimeIndex
-            df_empty = pd.DataFrame(columns=['datetime', 'open', 'high', 'low', 'close', 'volume'])
-            df_empty['datetime'] = pd.to_datetime(df_empty['datetime'])
-            df_empty.set_index('datetime', inplace=True)
-            return df_empty
-        
-        # Convertir a DataFrame
-        df = pd.DataFrame(rates)
-        
-        # Renombrar y seleccionar columnas
-        df['datetime'] = pd.to_datetime(df['time'], unit='s')
-        df = df[['datetime', 'open', 'high', 'low', 'close', 'tick_volume']]
-        df.rename(columns={'tick_volume': 'volume'}, inplace=True)
-        
-        # Configurar datetime como índice para compatibilidad con resample
-        df.set_index('datetime', inplace=True)
+            # Copia superficial de la plantilla: columnas tipadas y DatetimeIndex
+            return _EMPTY_OHLCV.copy(deep=False)
+        
+        # MT5 devuelve un array estructurado de NumPy; otras fuentes (mocks,
+        # datos serializados) pueden devolver una lista de registros
+        if getattr(getattr(rates, "dtype", None), "names", None) is None:
+            rates = pd.DataFrame.from_records(list(rates)).to_records(index=False)
+        
+        # Índice datetime vectorizado: los segundos epoch se reinterpretan como
+        # datetime64[s] y se pasan a ns sin pasar por el parser de pd.to_datetime;
+        # las columnas se toman directamente del array, sin DataFrame intermedio
+        times = rates['time'].astype('datetime64[s]').astype('datetime64[ns]')
+        index = pd.DatetimeIndex(times, name='datetime', copy=False)
+        df = pd.DataFrame(
+            {
+                'open': rates['open'],
+                'high': rates['high'],
+                'low': rates['low'],
+                'close': rates['close'],
+                'volume': rates['tick_volume'],
+            },
+            index=index,
+        )
         
         logger.info("Descargados %d registros OHLCV para %s", len(df), symbol)
         logger.debug("Primer registro: %s | Último registro: %s",
                     df.index[0], df.index[-1])
         
+        if self._ohlcv_cache is not None:
+            self._ohlcv_cache.put(symbol, timeframe, start, end, df)
+        
         return df
 
-    def send_market_order(self, order_request: OrderRequest) -> OrderResult:
+    def send_market_order(
+        self, order_request: OrderRequest, now: Optional[datetime] = None
+    ) -> OrderResult:
         """Envía una orden de mercado a MetaTrader5.
 
         Args:
             order_request: Objeto con los detalles de la orden.
+            now: Instante del ciclo. Se ignora: MT5 fecha la orden en el servidor.
 
         Returns:
             OrderResult con el resultado de la operación.
@@ -374,17 +815,13 @@ class MetaTrader5Client:
                    order_request.stop_loss, order_request.take_profit,
                    order_request.magic_number, order_request.comment)
         
-        # Verificar conexión
-        self._ensure_connected()
-        
         # Validar tipo de orden
-        valid_types = ["BUY", "SELL", "CLOSE"]
-        if order_request.order_type not in valid_types:
+        if order_request.order_type not in _VALID_ORDER_TYPES:
             logger.error("Tipo de orden inválido: %s. Válidos: %s",
-                        order_request.order_type, valid_types)
+                        order_request.order_type, _ORDER_TYPES)
             raise ValueError(
                 f"Tipo de orden '{order_request.order_type}' no válido. "
-                f"Debe ser: {', '.join(valid_types)}"
+                f"Debe ser: {', '.join(_ORDER_TYPES)}"
             )
         
         # Validar volumen
@@ -392,6 +829,9 @@ class MetaTrader5Client:
             logger.error("Volumen inválido: %.4f. Debe ser > 0", order_request.volume)
             raise ValueError(f"El volumen debe ser mayor que 0, recibido: {order_request.volume}")
         
+        # Verificar conexión (tras las validaciones locales, que no necesitan MT5)
+        self._ensure_connected()
+        
         # Obtener información del símbolo
         symbol_info = self._get_symbol_info(order_request.symbol)
         
@@ -412,10 +852,12 @@ class MetaTrader5Client:
                 f"{symbol_info.volume_max} para {order_request.symbol}"
             )
         
-        # Redondear volumen al step correcto
+        # Redondear volumen al step correcto: número entero de steps y
+        # redondeo final a los decimales del step para no arrastrar error FP
         volume_step = symbol_info.volume_step
-        rounded_volume = round(order_request.volume / volume_step) * volume_step
-        if abs(rounded_volume - order_request.volume) > 0.0001:
+        steps = int(round(order_request.volume / volume_step))
+        rounded_volume = round(steps * volume_step, _step_decimals(volume_step))
+        if rounded_volume != order_request.volume:
             logger.warning("Volumen ajustado de %.4f a %.4f según step %.4f",
                           order_request.volume, rounded_volume, volume_step)
             order_request.volume = rounded_volume
@@ -424,78 +866,61 @@ class MetaTrader5Client:
         if order_request.order_type == "CLOSE":
             return self._close_position(order_request)
         
-        # Preparar orden BUY o SELL
-        # Obtener precio actual
-        tick = mt5.symbol_info_tick(order_request.symbol)
-        if tick is None:
-            error_code, error_msg = mt5.last_error()
-            logger.error("No se pudo obtener precio actual. Error %d: %s",
-                        error_code, error_msg)
-            return OrderResult(
-                success=False,
-                error_message=f"No se pudo obtener precio para {order_request.symbol}"
-            )
+        # Preparar orden BUY o SELL al precio actual
+        price = self._current_price(order_request.symbol, order_request.order_type)
+        if price is None:
+            return self._failure(f"No se pudo obtener precio para {order_request.symbol}")
         
-        # Determinar tipo de orden y precio
         if order_request.order_type == "BUY":
             order_type = mt5.ORDER_TYPE_BUY
-            price = tick.ask
-            logger.debug("Orden BUY a precio ASK: %.5f", price)
         else:  # SELL
             order_type = mt5.ORDER_TYPE_SELL
-            price = tick.bid
-            logger.debug("Orden SELL a precio BID: %.5f", price)
         
         # Detectar filling mode compatible con el símbolo
         filling_mode = self._get_filling_mode(order_request.symbol)
         
         # Construir request de MT5
         request = {
-            "action": mt5.TRADE_ACTION_DEAL,
+            **self._order_base,
             "symbol": order_request.symbol,
             "volume": order_request.volume,
             "type": order_type,
             "price": price,
-            "deviation": 20,  # Desviación máxima de precio en puntos
             "magic": order_request.magic_number or 0,
             "comment": order_request.comment or "",
-            "type_time": mt5.ORDER_TIME_GTC,
             "type_filling": filling_mode,  # Usar filling mode detectado automáticamente
         }
         
         # Añadir SL/TP si están presentes
         if order_request.stop_loss is not None:
             request["sl"] = order_request.stop_loss
-            logger.debug("Stop Loss configurado: %.5f", order_request.stop_loss)
         
         if order_request.take_profit is not None:
             request["tp"] = order_request.take_profit
-            logger.debug("Take Profit configurado: %.5f", order_request.take_profit)
         
-        # Enviar orden
-        logger.debug("Enviando orden a MT5: %s", request)
+        # Enviar orden (el request ya incluye precio, SL y TP)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Orden %s a precio %.5f. Enviando a MT5: %s",
+                         order_request.order_type, price, request)
         result = mt5.order_send(request)
         
         if result is None:
+            # Forzar la comprobación del terminal en la siguiente llamada
+            self._last_alive_check = 0.0
             error_code, error_msg = mt5.last_error()
             logger.error("Error al enviar orden. Código: %d, Mensaje: %s",
                         error_code, error_msg)
-            return OrderResult(
-                success=False,
-                error_message=f"Error al enviar orden: {error_code} - {error_msg}"
-            )
+            return self._failure(f"Error al enviar orden: {error_code} - {error_msg}")
         
         # Procesar resultado
         if result.retcode != mt5.TRADE_RETCODE_DONE:
             logger.error("Orden rechazada. RetCode: %d, Comentario: %s",
                         result.retcode, result.comment)
-            return OrderResult(
-                success=False,
-                error_message=f"Orden rechazada: {result.comment} (código {result.retcode})"
-            )
+            return self._failure(f"Orden rechazada: {result.comment} (código {result.retcode})")
         
         logger.info("Orden ejecutada exitosamente. Order ID: %d, Volume: %.2f, Price: %.5f",
                    result.order, result.volume, result.price)
+        self._invalidate_positions()
         
         return OrderResult(
             success=True,
@@ -503,6 +928,83 @@ class MetaTrader5Client:
             error_message=None
         )
 
+    # Las validaciones que solo miran la petición (tipo, volumen > 0) van
+    # antes de _ensure_connected: una orden mal formada se rechaza sin tocar
+    # el terminal. Los límites de volumen sí dependen de SymbolInfo.
+    # En la ruta de envío los logs de depuración se agrupan en un único
+    # mensaje protegido por isEnabledFor: sin DEBUG activo no se construye
+    # la tupla de argumentos ni se evalúan atributos solo para el log. Los
+    # f-strings que quedan están en ramas de error y se usan como mensaje.
+
+    @staticmethod
+    def _failure(message: str) -> OrderResult:
+        """Construye el OrderResult de una orden fallida.
+
+        Args:
+            message: Detalle del fallo.
+
+        Returns:
+            OrderResult con success=False y sin order_id.
+        """
+        return OrderResult(False, None, message)
+
+    def send_market_orders(
+        self, order_requests: list[OrderRequest], now: Optional[datetime] = None
+    ) -> list[OrderResult]:
+        """Envía un lote de órdenes de mercado en el orden recibido.
+
+        Args:
+            order_requests: Órdenes a enviar.
+            now: Instante del ciclo. Se ignora: MT5 fecha las órdenes en el servidor.
+
+        Returns:
+            Lista de OrderResult en el mismo orden. Una orden inválida o con
+            error produce un resultado fallido sin interrumpir el resto.
+
+        Raises:
+            MT5ConnectionError: Si no hay conexión y no se puede reconectar.
+        """
+        if not order_requests:
+            return []
+        # Una sola verificación de conexión para todo el lote
+        self._ensure_connected()
+        results = []
+        for order_request in order_requests:
+            try:
+                results.append(self.send_market_order(order_request))
+            except Exception as e:
+                logger.error("Error enviando orden %s para %s: %s",
+                            order_request.order_type, order_request.symbol, e)
+                results.append(self._failure(str(e)))
+        return results
+
+    # MetaTrader5 no ofrece envío de órdenes en lote: order_send es una
+    # llamada síncrona por orden sobre el canal ya abierto con el terminal.
+    # El lote ahorra las llamadas sueltas desde OrderExecutor y comparte la
+    # verificación de conexión; dentro de LIVENESS_TTL el resto no consulta.
+
+    def _current_price(self, symbol: str, side: str) -> Optional[float]:
+        """Obtiene el precio al que se ejecutaría ahora una orden de mercado.
+
+        Args:
+            symbol: Nombre del símbolo.
+            side: "BUY" (se ejecuta al ask) o "SELL" (se ejecuta al bid).
+
+        Returns:
+            Precio actual, o None si MT5 no devuelve el tick.
+        """
+        tick = mt5.symbol_info_tick(symbol)
+        if tick is None:
+            error_code, error_msg = mt5.last_error()
+            logger.error("No se pudo obtener precio actual. Error %d: %s",
+                        error_code, error_msg)
+            return None
+        return tick.ask if side == "BUY" else tick.bid
+
+    # Un único symbol_info_tick por orden, compartido por envío y cierre; si
+    # el terminal no devuelve tick, el llamador responde con un OrderResult
+    # fallido en lugar de romper con AttributeError sobre None.
+
     def _close_position(self, order_request: OrderRequest) -> OrderResult:
         """Cierra una posición existente.
 
@@ -520,10 +1022,7 @@ class MetaTrader5Client:
         
         if positions is None or len(positions) == 0:
             logger.warning("No hay posiciones abiertas para %s", order_request.symbol)
-            return OrderResult(
-                success=False,
-                error_message=f"No hay posiciones abiertas para {order_request.symbol}"
-            )
+            return self._failure(f"No hay posiciones abiertas para {order_request.symbol}")
         
         # Filtrar por magic number si está presente
         if order_request.magic_number is not None:
@@ -531,64 +1030,57 @@ class MetaTrader5Client:
             if len(positions) == 0:
                 logger.warning("No hay posiciones con magic=%s para %s",
                              order_request.magic_number, order_request.symbol)
-                return OrderResult(
-                    success=False,
-                    error_message=f"No hay posiciones con magic {order_request.magic_number}"
-                )
+                return self._failure(f"No hay posiciones con magic {order_request.magic_number}")
         
         # Cerrar la primera posición encontrada
         position = positions[0]
-        logger.debug("Cerrando posición ticket=%d, volumen=%.2f, tipo=%d",
-                    position.ticket, position.volume, position.type)
         
         # Determinar tipo de orden de cierre (opuesto a la posición)
         if position.type == mt5.POSITION_TYPE_BUY:
-            close_type = mt5.ORDER_TYPE_SELL
-            price = mt5.symbol_info_tick(order_request.symbol).bid
+            close_type, close_side = mt5.ORDER_TYPE_SELL, "SELL"
         else:
-            close_type = mt5.ORDER_TYPE_BUY
-            price = mt5.symbol_info_tick(order_request.symbol).ask
+            close_type, close_side = mt5.ORDER_TYPE_BUY, "BUY"
+        price = self._current_price(order_request.symbol, close_side)
+        if price is None:
+            return self._failure(f"No se pudo obtener precio para {order_request.symbol}")
         
         # Detectar filling mode compatible con el símbolo
         filling_mode = self._get_filling_mode(order_request.symbol)
         
         # Construir request de cierre
         request = {
-            "action": mt5.TRADE_ACTION_DEAL,
+            **self._order_base,
             "symbol": order_request.symbol,
             "volume": position.volume,
             "type": close_type,
             "position": position.ticket,
             "price": price,
-            "deviation": 20,
             "magic": order_request.magic_number or 0,
             "comment": order_request.comment or "Close position",
-            "type_time": mt5.ORDER_TIME_GTC,
             "type_filling": filling_mode,  # Usar filling mode detectado automáticamente
         }
         
-        # Enviar orden de cierre
-        logger.debug("Enviando orden de cierre: %s", request)
+        # Enviar orden de cierre (el request ya incluye ticket y volumen)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Enviando orden de cierre (tipo de posición %d): %s",
+                         position.type, request)
         result = mt5.order_send(request)
         
         if result is None:
+            # Forzar la comprobación del terminal en la siguiente llamada
+            self._last_alive_check = 0.0
             error_code, error_msg = mt5.last_error()
             logger.error("Error al cerrar posición. Código: %d, Mensaje: %s",
                         error_code, error_msg)
-            return OrderResult(
-                success=False,
-                error_message=f"Error al cerrar: {error_code} - {error_msg}"
-            )
+            return self._failure(f"Error al cerrar: {error_code} - {error_msg}")
         
         if result.retcode != mt5.TRADE_RETCODE_DONE:
             logger.error("Cierre rechazado. RetCode: %d, Comentario: %s",
                         result.retcode, result.comment)
-            return OrderResult(
-                success=False,
-                error_message=f"Cierre rechazado: {result.comment} (código {result.retcode})"
-            )
+            return self._failure(f"Cierre rechazado: {result.comment} (código {result.retcode})")
         
         logger.info("Posición cerrada exitosamente. Order ID: %d", result.order)
+        self._invalidate_positions()
         
         return OrderResult(
             success=True,
@@ -605,57 +1097,148 @@ class MetaTrader5Client:
         Raises:
             MT5ConnectionError: Si no hay conexión activa.
         """
+        # Con el poller activo se sirve la última foto sin ir a MT5
+        with self._positions_lock:
+            snapshot = self._positions_snapshot
+        if snapshot is not None:
+            return list(snapshot)
+        
         logger.info("Consultando posiciones abiertas...")
         
         # Verificar conexión
         self._ensure_connected()
         
-        # Obtener posiciones
+        result = self._fetch_positions()
+        if result is None:
+            # Retornar lista vacía en lugar de lanzar error
+            return []
+        
+        if result:
+            logger.info("Encontradas %d posiciones abiertas", len(result))
+        else:
+            logger.info("No hay posiciones abiertas")
+        return result
+
+    def _fetch_positions(self) -> Optional[list[Position]]:
+        """Consulta positions_get() y convierte el resultado a Position.
+
+        Returns:
+            Lista de posiciones, o None si MT5 devuelve error.
+        """
         positions = mt5.positions_get()
         
         if positions is None:
             error_code, error_msg = mt5.last_error()
             logger.error("Error al consultar posiciones. Código: %d, Mensaje: %s",
                         error_code, error_msg)
-            # Retornar lista vacía en lugar de lanzar error
-            return []
+            return None
         
-        if len(positions) == 0:
-            logger.info("No hay posiciones abiertas")
-            return []
-        
-        logger.info("Encontradas %d posiciones abiertas", len(positions))
-        
-        # Convertir a objetos Position
-        result = []
-        for pos in positions:
-            # Extraer strategy_name del comentario o usar default
-            strategy_name = pos.comment if pos.comment else "Unknown"
-            
-            position = Position(
+        # Convertir a objetos Position (MT5 usa 0 para SL/TP/magic ausentes)
+        fromtimestamp = datetime.fromtimestamp
+        result = [
+            Position(
                 symbol=pos.symbol,
                 volume=pos.volume,
                 entry_price=pos.price_open,
-                stop_loss=pos.sl if pos.sl != 0 else None,
-                take_profit=pos.tp if pos.tp != 0 else None,
-                strategy_name=strategy_name,
-                open_time=datetime.fromtimestamp(pos.time),
-                magic_number=pos.magic if pos.magic != 0 else None
+                stop_loss=pos.sl or None,
+                take_profit=pos.tp or None,
+                # Extraer strategy_name del comentario o usar default
+                strategy_name=pos.comment or "Unknown",
+                open_time=fromtimestamp(pos.time),
+                magic_number=pos.magic or None,
             )
-            
-            result.append(position)
-            
-            logger.debug("Posición: %s, volumen=%.2f, entry=%.5f, SL=%s, TP=%s, magic=%s",
-                        pos.symbol, pos.volume, pos.price_open,
-                        position.stop_loss, position.take_profit, pos.magic)
+            for pos in positions
+        ]
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Posiciones (símbolo, volumen, entry, SL, TP, magic): %s",
+                         [(p.symbol, p.volume, p.entry_price, p.stop_loss,
+                           p.take_profit, p.magic_number) for p in result])
         
         return result
 
-    def get_closed_trades(self) -> list[TradeRecord]:
-        """Recupera los trades cerrados recientes.
+    # La conversión es una única comprensión de lista: cada atributo del
+    # namedtuple de MT5 se lee una vez y "x or None" traduce el 0 que usa MT5
+    # para SL, TP y magic ausentes. En lugar de un log por posición se emite
+    # un único resumen, y solo se construye con DEBUG activo.
+
+    def start_position_poller(self, interval: float = 0.2) -> None:
+        """Arranca un hilo que refresca las posiciones abiertas en segundo plano.
+
+        Mientras está activo, get_open_positions devuelve la última foto sin
+        hacer una llamada a MT5.
+
+        Args:
+            interval: Segundos entre consultas a positions_get().
+
+        Raises:
+            MT5ConnectionError: Si no hay conexión y no se puede reconectar.
+        """
+        if self._poller_thread is not None and self._poller_thread.is_alive():
+            return
+        
+        self._ensure_connected()
+        # Primera foto síncrona: los lectores no esperan al primer intervalo
+        positions = self._fetch_positions()
+        with self._positions_lock:
+            self._positions_snapshot = positions
+        
+        self._poller_stop.clear()
+        self._poller_thread = threading.Thread(
+            target=self._poll_positions, args=(interval,),
+            name="mt5-positions", daemon=True,
+        )
+        self._poller_thread.start()
+        logger.info("Poller de posiciones iniciado (intervalo=%.3fs)", interval)
+
+    def stop_position_poller(self) -> None:
+        """Detiene el hilo de posiciones y vuelve a la consulta bajo demanda."""
+        thread = self._poller_thread
+        if thread is None:
+            return
+        self._poller_stop.set()
+        thread.join(timeout=5.0)
+        self._poller_thread = None
+        with self._positions_lock:
+            self._positions_snapshot = None
+        logger.info("Poller de posiciones detenido")
+
+    def _poll_positions(self, interval: float) -> None:
+        """Bucle del hilo de posiciones."""
+        while not self._poller_stop.wait(interval):
+            try:
+                positions = self._fetch_positions()
+            except Exception as e:
+                logger.error("Error en el poller de posiciones: %s", e)
+                positions = None
+            # Si la consulta falla se descarta la foto: los lectores vuelven a
+            # la ruta síncrona, que verifica (y recupera) la conexión
+            with self._positions_lock:
+                self._positions_snapshot = positions
+
+    def _invalidate_positions(self) -> None:
+        """Descarta la foto de posiciones tras una orden ejecutada."""
+        with self._positions_lock:
+            self._positions_snapshot = None
+
+    # El hilo solo consulta y convierte; no reconecta para no competir con el
+    # hilo principal por _ensure_connected. Una orden ejecutada invalida la
+    # foto, de modo que la siguiente lectura ya ve la posición nueva (vía
+    # consulta síncrona) hasta que el poller vuelve a refrescarla.
+
+    def get_closed_trades(
+        self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None
+    ) -> list[TradeRecord]:
+        """Recupera los trades cerrados en un rango de fechas.
 
         Consulta el historial de deals para construir trades completos
-        (entrada + salida) y calcular el PnL.
+        (entrada + salida) y calcular el PnL. Quien necesite un resumen de
+        sesión o de día completo debe pasar la ventana entera en una sola
+        llamada en lugar de hacer varias consultas pequeñas.
+
+        Args:
+            from_date: Inicio del rango. Por defecto, 24 horas antes de to_date.
+            to_date: Fin del rango. Por defecto, el instante actual.
 
         Returns:
             Lista de objetos TradeRecord con los trades cerrados.
@@ -669,8 +1252,10 @@ class MetaTrader5Client:
         self._ensure_connected()
         
         # Obtener historial de deals (últimas 24 horas por defecto)
-        from_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        to_date = datetime.now()
+        if to_date is None:
+            to_date = datetime.now()
+        if from_date is None:
+            from_date = to_date - _DEFAULT_HISTORY_WINDOW
         
         logger.debug("Consultando deals desde %s hasta %s", from_date, to_date)
         
@@ -688,79 +1273,119 @@ class MetaTrader5Client:
         
         logger.info("Encontrados %d deals en el historial", len(deals))
         
-        # Agrupar deals por posición para construir trades completos
-        trades_dict = {}
-        
+        # Una sola pasada: emparejar entrada y salida por posición
+        deal_in, deal_out = mt5.DEAL_ENTRY_IN, mt5.DEAL_ENTRY_OUT
+        entry_by_pid = {}
+        exit_by_pid = {}
         for deal in deals:
             # Ignorar deals de balance, comisiones, etc.
-            if deal.entry not in [mt5.DEAL_ENTRY_IN, mt5.DEAL_ENTRY_OUT]:
-                continue
-            
-            position_id = deal.position_id
-            
-            if position_id not in trades_dict:
-                trades_dict[position_id] = {
-                    'entry': None,
-                    'exit': None,
-                    'symbol': deal.symbol,
-                    'magic': deal.magic
-                }
-            
-            if deal.entry == mt5.DEAL_ENTRY_IN:
-                trades_dict[position_id]['entry'] = deal
-            elif deal.entry == mt5.DEAL_ENTRY_OUT:
-                trades_dict[position_id]['exit'] = deal
-        
-        # Construir TradeRecords
+            kind = deal.entry
+            if kind == deal_in:
+                entry_by_pid[deal.position_id] = deal
+            elif kind == deal_out:
+                exit_by_pid[deal.position_id] = deal
+
+        # Solo procesar trades completos (con entrada y salida)
+        pairs = [
+            (entry_by_pid[position_id], exit_deal)
+            for position_id, exit_deal in exit_by_pid.items()
+            if position_id in entry_by_pid
+        ]
+        incomplete = len(entry_by_pid.keys() | exit_by_pid.keys()) - len(pairs)
+        if incomplete:
+            logger.debug("Omitidos %d trades incompletos", incomplete)
+        if not pairs:
+            logger.info("Procesados 0 trades completos")
+            return []
+
+        # Ordenar por fecha de cierre (más reciente primero) sobre los enteros
+        exit_times = np.fromiter((exit_deal.time for _, exit_deal in pairs), np.int64, len(pairs))
+        order = np.argsort(-exit_times, kind="stable")
+
+        # Convertir cada timestamp distinto una sola vez (hora local, como antes)
+        stamps = {entry_deal.time for entry_deal, _ in pairs}
+        stamps.update(exit_times.tolist())
+        to_datetime = {ts: datetime.fromtimestamp(ts) for ts in stamps}
+
         result = []
-        
-        for position_id, trade_data in trades_dict.items():
-            entry_deal = trade_data['entry']
-            exit_deal = trade_data['exit']
-            
-            # Solo procesar trades completos (con entrada y salida)
-            if entry_deal is None or exit_deal is None:
-                logger.debug("Trade incompleto para posición %d, omitiendo", position_id)
-                continue
-            
-            # Extraer strategy_name del comentario
-            strategy_name = entry_deal.comment if entry_deal.comment else "Unknown"
-            
-            # Calcular PnL (MT5 ya lo calcula)
-            pnl = exit_deal.profit
-            
-            trade_record = TradeRecord(
-                symbol=trade_data['symbol'],
-                strategy_name=strategy_name,
-                entry_time=datetime.fromtimestamp(entry_deal.time),
-                exit_time=datetime.fromtimestamp(exit_deal.time),
-                entry_price=entry_deal.price,
-                exit_price=exit_deal.price,
-                size=entry_deal.volume,
-                pnl=pnl,
-                stop_loss=None,  # No disponible en deals
-                take_profit=None  # No disponible en deals
+        for i in order.tolist():
+            entry_deal, exit_deal = pairs[i]
+            result.append(
+                TradeRecord(
+                    symbol=entry_deal.symbol,
+                    # Extraer strategy_name del comentario
+                    strategy_name=entry_deal.comment or "Unknown",
+                    entry_time=to_datetime[entry_deal.time],
+                    exit_time=to_datetime[exit_deal.time],
+                    entry_price=entry_deal.price,
+                    exit_price=exit_deal.price,
+                    size=entry_deal.volume,
+                    # MT5 ya calcula el PnL en el deal de salida
+                    pnl=exit_deal.profit,
+                    stop_loss=None,  # No disponible en deals
+                    take_profit=None  # No disponible en deals
+                )
             )
-            
-            result.append(trade_record)
-            
-            logger.debug("Trade: %s, entrada=%s, salida=%s, PnL=%.2f",
-                        trade_data['symbol'],
-                        trade_record.entry_time,
-                        trade_record.exit_time,
-                        pnl)
-        
-        # Ordenar por fecha de cierre (más reciente primero)
-        result.sort(key=lambda x: x.exit_time, reverse=True)
-        
+
         logger.info("Procesados %d trades completos", len(result))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Trades (símbolo, entrada, salida, PnL): %s",
+                         [(t.symbol, t.entry_time, t.exit_time, t.pnl) for t in result])
         
         return result
 
-    def __del__(self) -> None:
-        """Cierra la conexión con MT5 al destruir el objeto."""
-        if self.connected:
+    # Los deals se recorren una única vez repartiéndolos en dos diccionarios
+    # (entrada y salida) por position_id; la posición que aparece en ambos es
+    # un trade completo. El orden se calcula con argsort estable sobre los
+    # timestamps enteros de salida, y cada timestamp distinto se convierte a
+    # datetime local una sola vez aunque lo compartan varios deals.
+
+    def close(self) -> None:
+        """Cierra la conexión con MetaTrader5 si está abierta.
+
+        Es idempotente: llamarlo varias veces solo cierra una vez.
+        """
+        self.stop_position_poller()
+        with self._ohlcv_pool_lock:
+            pool, self._ohlcv_pool = self._ohlcv_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        if self.connected and mt5 is not None:
             logger.info("Cerrando conexión con MetaTrader5...")
             mt5.shutdown()
             self.connected = False
             logger.info("Conexión cerrada")
+
+    def __enter__(self) -> "MetaTrader5Client":
+        """Permite usar el cliente con ``with``; la conexión se abre aparte."""
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        """Cierra la conexión al salir del bloque ``with``."""
+        self.close()
+
+    def __del__(self, _mt5=mt5) -> None:
+        """Red de seguridad: cierra la conexión con MT5 si nadie llamó a close().
+
+        Solo llama a mt5.shutdown(); el hilo de sondeo y el pool de descargas
+        se detienen únicamente desde close().
+
+        Args:
+            _mt5: Módulo MetaTrader5 capturado al definir la clase.
+        """
+        try:
+            if getattr(self, "connected", False) and _mt5 is not None:
+                _mt5.shutdown()
+                self.connected = False
+        except Exception:
+            # En el cierre del intérprete el módulo mt5 puede estar a medio destruir
+            pass
+
+    # El cierre explícito (close() o un bloque with) es la vía recomendada:
+    # durante el apagado del intérprete los globales del módulo pueden valer
+    # None y un __del__ que falle deja el terminal enganchado sin avisar. Por
+    # eso el finalizador usa el módulo mt5 capturado como argumento por
+    # defecto (no el global) y no hace trabajo bloqueante: unir el hilo de
+    # sondeo o esperar al pool con shutdown(wait=True) dentro de un
+    # finalizador puede colgar el apagado. Tampoco registra logs, porque
+    # logging puede no estar disponible en ese momento.
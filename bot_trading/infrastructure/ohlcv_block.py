@@ -0,0 +1,143 @@
+"""Velas OHLCV como estructura de arrays NumPy."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+_PRICE_COLUMNS = ("open", "high", "low", "close")
+
+
+def _utc_ns(moment: datetime) -> np.datetime64:
+    """Convierte una fecha a datetime64[ns] en UTC (sin zona = ya en UTC)."""
+    ts = pd.Timestamp(moment)
+    if ts.tz is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.as_unit("ns").to_datetime64()
+
+
+@dataclass(frozen=True, slots=True)
+class OHLCVBlock:
+    """Velas OHLCV de un símbolo como un array NumPy por columna.
+
+    Attributes:
+        index: Inicio de cada vela en datetime64[ns] UTC, creciente.
+        open: Precios de apertura alineados con index.
+        high: Máximos alineados con index.
+        low: Mínimos alineados con index.
+        close: Cierres alineados con index.
+        volume: Volúmenes alineados con index.
+        symbol: Símbolo de las velas.
+        tz: Zona horaria con la que se presenta el índice en to_frame
+            (None = índice sin zona horaria).
+    """
+
+    index: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    symbol: str
+    tz: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """Devuelve las columnas OHLCV por nombre (los mismos arrays, sin copia)."""
+        return {
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume,
+        }
+
+    def astype(self, dtype: np.dtype | type) -> OHLCVBlock:
+        """Devuelve el bloque con los precios en otro tipo (sin copia si ya lo tienen).
+
+        Args:
+            dtype: Tipo de las columnas open, high, low y close (p. ej. np.float64).
+
+        Returns:
+            OHLCVBlock con los precios convertidos; índice y volumen se comparten.
+        """
+        if self.close.dtype == dtype:
+            return self
+        return OHLCVBlock(
+            self.index,
+            self.open.astype(dtype),
+            self.high.astype(dtype),
+            self.low.astype(dtype),
+            self.close.astype(dtype),
+            self.volume,
+            self.symbol,
+            self.tz,
+        )
+
+    def slice(self, start: datetime, end: datetime) -> OHLCVBlock:
+        """Devuelve las velas con inicio en [start, end] como vistas de este bloque.
+
+        Args:
+            start: Inicio del rango (incluido).
+            end: Fin del rango (incluido).
+
+        Returns:
+            Nuevo OHLCVBlock cuyos arrays comparten memoria con este.
+        """
+        lo = int(self.index.searchsorted(_utc_ns(start), side="left"))
+        hi = int(self.index.searchsorted(_utc_ns(end), side="right"))
+        return OHLCVBlock(
+            self.index[lo:hi],
+            self.open[lo:hi],
+            self.high[lo:hi],
+            self.low[lo:hi],
+            self.close[lo:hi],
+            self.volume[lo:hi],
+            self.symbol,
+            self.tz,
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Envuelve las columnas en un DataFrame sin copiarlas.
+
+        Returns:
+            DataFrame con índice 'datetime' y columnas open, high, low, close,
+            volume; el símbolo viaja en attrs["symbol"].
+        """
+        index = pd.DatetimeIndex(self.index, name="datetime", copy=False)
+        if self.tz is not None:
+            index = index.tz_localize("UTC").tz_convert(self.tz)
+        df = pd.DataFrame(self.columns(), index=index, copy=False)
+        df.attrs["symbol"] = self.symbol
+        return df
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, symbol: str) -> OHLCVBlock:
+        """Crea un bloque a partir de un DataFrame OHLCV con índice temporal.
+
+        Las columnas se toman como vistas cuando el DataFrame lo permite.
+
+        Args:
+            df: Velas con índice DatetimeIndex y columnas OHLCV.
+            symbol: Símbolo de las velas.
+
+        Returns:
+            OHLCVBlock equivalente al DataFrame.
+        """
+        index = df.index
+        tz = None if index.tz is None else str(index.tz)
+        # asi8 ya está en UTC para índices con zona horaria
+        index_ns = index.as_unit("ns").asi8.view("datetime64[ns]")
+        prices = [df[col].to_numpy(copy=False) for col in _PRICE_COLUMNS]
+        return cls(index_ns, *prices, df["volume"].to_numpy(copy=False), symbol, tz)
+
+    # El bloque es la representación de trabajo entre broker y servicio de
+    # datos: el resampleo opera directamente sobre sus arrays y el DataFrame
+    # solo se construye en la frontera con las estrategias. to_frame no copia,
+    # así que el DataFrame y el bloque comparten memoria; quien necesite
+    # modificar las velas debe copiar antes.
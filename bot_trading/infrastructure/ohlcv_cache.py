@@ -0,0 +1,182 @@
+"""Cache en disco (Parquet) de descargas OHLCV."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from importlib.util import find_spec
+import logging
+import os
+from pathlib import Path
+import time
+from typing import Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Motor Parquet disponible (pandas usa pyarrow o fastparquet)
+_HAS_PARQUET = find_spec("pyarrow") is not None or find_spec("fastparquet") is not None
+
+# Vigencia de un rango que aún puede cambiar: una vela del timeframe
+_TIMEFRAME_TTL: dict[str, timedelta] = {
+    "M1": timedelta(minutes=1),
+    "M5": timedelta(minutes=5),
+    "M15": timedelta(minutes=15),
+    "M30": timedelta(minutes=30),
+    "H1": timedelta(hours=1),
+    "H4": timedelta(hours=4),
+    "D1": timedelta(days=1),
+    "W1": timedelta(weeks=1),
+    "MN1": timedelta(days=31),
+}
+
+# Clave de archivo con microsegundos; las fechas con zona horaria se pasan a
+# UTC y llevan el sufijo "Z", así nunca comparten archivo con las que no la tienen
+_KEY_FORMAT = "%Y%m%dT%H%M%S%f"
+# Prefijo de los rangos recientes, que aún pueden cambiar (ver put)
+_LIVE_PREFIX = "live_"
+
+
+def _key(moment: datetime) -> str:
+    """Parte de la clave de archivo correspondiente a una fecha."""
+    if moment.tzinfo is None:
+        return moment.strftime(_KEY_FORMAT)
+    return moment.astimezone(timezone.utc).strftime(_KEY_FORMAT) + "Z"
+
+
+class OHLCVCache:
+    """Cache persistente de velas en archivos Parquet.
+
+    Cada descarga se guarda en ``<root>/<símbolo>/<timeframe>/<inicio>_<fin>.parquet``.
+    Un rango que termina antes de ``ahora - TTL(timeframe)`` ya no puede
+    cambiar y no caduca; uno más reciente caduca tras una vela del timeframe.
+
+    La cache está pensada para rangos fijos (backtests): los rangos
+    históricos se conservan indefinidamente. De los rangos recientes, que en
+    directo cambian en cada ciclo, solo se guarda el último por símbolo y
+    timeframe, de modo que el uso de disco no crece con los ciclos.
+    """
+
+    def __init__(self, root: Path) -> None:
+        """Inicializa la cache.
+
+        Args:
+            root: Directorio raíz de la cache; se crea si no existe.
+
+        Raises:
+            ImportError: Si no hay un motor Parquet instalado (pyarrow).
+        """
+        if not _HAS_PARQUET:
+            raise ImportError("La cache OHLCV necesita pyarrow o fastparquet instalado")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(
+        self, symbol: str, timeframe: str, start: datetime, end: datetime, live: bool
+    ) -> Path:
+        """Ruta del archivo asociado a una descarga.
+
+        Raises:
+            ValueError: Si solo una de las dos fechas tiene zona horaria.
+        """
+        if (start.tzinfo is None) != (end.tzinfo is None):
+            raise ValueError(
+                "La cache OHLCV necesita start y end ambos con zona horaria o ambos sin ella"
+            )
+        name = f"{_key(start)}_{_key(end)}.parquet"
+        if live:
+            name = _LIVE_PREFIX + name
+        return self.root / symbol / timeframe / name
+
+    @staticmethod
+    def _is_historical(timeframe: str, end: datetime) -> bool:
+        """Indica si un rango ya no puede cambiar (termina antes de ahora - TTL)."""
+        return end <= datetime.now(end.tzinfo) - _TIMEFRAME_TTL[timeframe]
+
+    def get(
+        self, symbol: str, timeframe: str, start: datetime, end: datetime
+    ) -> Optional[pd.DataFrame]:
+        """Devuelve las velas cacheadas si existen y siguen vigentes.
+
+        Args:
+            symbol: Símbolo consultado.
+            timeframe: Timeframe consultado.
+            start: Inicio del rango.
+            end: Fin del rango.
+
+        Returns:
+            DataFrame leído de disco, o None si no hay entrada vigente.
+        """
+        historical = self._is_historical(timeframe, end)
+        path = self._path(symbol, timeframe, start, end, live=not historical)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+        ttl = _TIMEFRAME_TTL[timeframe]
+        if not historical and time.time() - mtime > ttl.total_seconds():
+            logger.debug("Cache OHLCV caducada para %s %s", symbol, timeframe)
+            return None
+
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            logger.warning("No se pudo leer la cache OHLCV %s: %s", path, e)
+            return None
+
+    def put(
+        self, symbol: str, timeframe: str, start: datetime, end: datetime, df: pd.DataFrame
+    ) -> None:
+        """Guarda una descarga en disco.
+
+        Args:
+            symbol: Símbolo consultado.
+            timeframe: Timeframe consultado.
+            start: Inicio del rango.
+            end: Fin del rango.
+            df: Velas a guardar.
+        """
+        live = not self._is_historical(timeframe, end)
+        path = self._path(symbol, timeframe, start, end, live=live)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            df.to_parquet(tmp_path, compression="zstd")
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning("No se pudo escribir la cache OHLCV %s: %s", path, e)
+            tmp_path.unlink(missing_ok=True)
+            return
+        if live:
+            self._remove_stale_live(path)
+
+    def _remove_stale_live(self, keep: Path) -> None:
+        """Borra los rangos recientes anteriores del mismo símbolo y timeframe.
+
+        Args:
+            keep: Archivo recién escrito, que se conserva.
+        """
+        removed = 0
+        for stale in keep.parent.glob(f"{_LIVE_PREFIX}*.parquet"):
+            if stale == keep:
+                continue
+            try:
+                stale.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass  # Otro proceso lo borró antes
+            except OSError as e:
+                logger.warning("No se pudo borrar la cache OHLCV %s: %s", stale, e)
+        if removed:
+            logger.debug("Borrados %d rangos recientes obsoletos en %s", removed, keep.parent)
+
+    # La escritura va a un archivo temporal que se renombra con os.replace,
+    # así un lector concurrente ve el Parquet anterior o el nuevo completo,
+    # nunca uno a medias. Los errores de disco solo se registran: la cache es
+    # una optimización y una descarga directa de MT5 siempre es válida.
+    # En directo (run_forever) el fin del rango es "ahora" y cambia en cada
+    # ciclo, así que cada ciclo escribe una clave nueva. Esos rangos llevan el
+    # prefijo live_ y al escribir uno se borran los anteriores del mismo
+    # directorio: nunca se volverían a leer y harían crecer el disco sin
+    # límite. Un rango guardado como reciente tampoco se sirve después como
+    # histórico, porque su última vela pudo estar aún en formación.
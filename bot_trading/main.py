@@ -3,9 +3,10 @@ from __future__ import annotations
 
 import logging
 import sys
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 # Permite ejecutar este archivo directamente (Run File) asegurando que el paquete este en sys.path.
@@ -18,8 +19,10 @@ from bot_trading.application.engine.order_executor import OrderExecutor
 from bot_trading.application.risk_management import RiskManager
 from bot_trading.application.strategies.simple_example_strategy import SimpleExampleStrategy
 from bot_trading.domain.entities import RiskLimits, SymbolConfig
+from bot_trading.infrastructure._fake_ohlcv import fill_prices
 from bot_trading.infrastructure.data_fetcher import MarketDataService
 from bot_trading.infrastructure.mt5_client import MetaTrader5Client, MT5ConnectionError
+from bot_trading.infrastructure.ohlcv_block import OHLCVBlock
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,6 +35,19 @@ logger = logging.getLogger(__name__)
 # =============================================================================
 USE_REAL_BROKER = True  # True = MetaTrader5, False = FakeBroker
 
+# Margen extra de la plantilla OHLCV del FakeBroker para no reconstruirla cada minuto
+_FAKE_TEMPLATE_PADDING = timedelta(days=1)
+# Tramo máximo que la plantilla acumula al ampliarse; por encima se regenera
+# solo para el rango pedido, así la memoria no crece sin límite en run_forever
+_FAKE_TEMPLATE_MAX_SPAN = timedelta(days=30)
+# Origen del cierre sintético (close = minutos UTC desde esta fecha). Reciente
+# para que los cierres sigan siendo enteros exactos incluso en float32
+_FAKE_CLOSE_EPOCH = np.datetime64("2020-01-01T00:00", "m")
+
+# Tipos de las velas sintéticas: los mismos que entrega MetaTrader5Client
+_FAKE_PRICE_DTYPE = np.float64
+_FAKE_VOLUME_DTYPE = np.int64
+
 
 class FakeBroker:
     """Broker simulado para ejecutar el ejemplo sin conexiones reales.
@@ -44,30 +60,87 @@ class FakeBroker:
         self.orders_sent: list = []
         self.open_positions: list = []
         self.closed_trades: list = []
+        # Foto inmutable de open_positions; se reconstruye solo si hubo aperturas o cierres
+        self._open_positions_tuple: tuple = ()
+        self._positions_dirty = False
+        # Foto inmutable de closed_trades; se reconstruye solo si hubo cierres
+        self._closed_trades_tuple: tuple = ()
+        self._closed_dirty = False
+        # Símbolo -> (inicio, fin, velas M1 sintéticas) que cubren todos los rangos pedidos
+        self._template: dict[str, tuple[datetime, datetime, OHLCVBlock]] = {}
 
     def connect(self) -> None:
         logger.info("Simulando conexión a broker")
 
-    def get_ohlcv(self, symbol: str, timeframe: str, start: datetime, end: datetime) -> pd.DataFrame:
-        index = pd.date_range(start=start, end=end, freq="1min")
-        data = {
-            "open": [1.0] * len(index),
-            "high": [1.0] * len(index),
-            "low": [1.0] * len(index),
-            "close": [float(i) for i in range(len(index))],
-            "volume": [1] * len(index),
-        }
-        df = pd.DataFrame(data, index=index)
-        df.attrs["symbol"] = symbol
-        return df
-
-    def send_market_order(self, order_request):
+    def get_ohlcv(
+        self, symbol: str, timeframe: str, start: datetime, end: datetime, dtype=None
+    ) -> pd.DataFrame:
+        return self.get_ohlcv_block(symbol, timeframe, start, end, dtype).to_frame()
+
+    def get_ohlcv_block(
+        self, symbol: str, timeframe: str, start: datetime, end: datetime, dtype=None
+    ) -> OHLCVBlock:
+        """Devuelve velas M1 sintéticas como vistas de solo lectura de la plantilla.
+
+        Los precios son float64, como en MT5, salvo que dtype pida otro tipo
+        (p. ej. np.float32 en backtests), en cuyo caso se copian convertidos.
+        """
+        cached = self._template.get(symbol)
+        if cached is None or start < cached[0] or end > cached[1]:
+            start_tpl, end_tpl = start, end + _FAKE_TEMPLATE_PADDING
+            if cached is not None:
+                union = min(start_tpl, cached[0]), max(end_tpl, cached[1])
+                if union[1] - union[0] <= _FAKE_TEMPLATE_MAX_SPAN:
+                    start_tpl, end_tpl = union
+            cached = (start_tpl, end_tpl, self._build_template(symbol, start_tpl, end_tpl))
+            self._template[symbol] = cached
+        # Búsqueda binaria sobre el índice ordenado, sin reconstruir velas
+        block = cached[2].slice(start, end)
+        return block if dtype is None else block.astype(dtype)
+
+    @staticmethod
+    def _build_template(symbol: str, start: datetime, end: datetime) -> OHLCVBlock:
+        """Genera velas M1 sintéticas: OHLC constantes salvo close creciente.
+
+        close es el número de minutos UTC desde _FAKE_CLOSE_EPOCH, así que una
+        misma vela tiene siempre el mismo cierre aunque la plantilla se regenere.
+        """
+        # Índice con un único np.arange sobre datetime64[ns] (UTC si hay zona horaria)
+        start_ts = pd.Timestamp(start).as_unit("ns")
+        end_ts = pd.Timestamp(end).as_unit("ns")
+        index = np.arange(
+            start_ts.to_datetime64(),
+            end_ts.to_datetime64() + np.timedelta64(1, "ns"),  # end incluido
+            np.timedelta64(1, "m"),
+        )
+        n = index.size
+        # OHLC en un único bloque float64: open/high/low constantes y close creciente
+        prices = np.empty((n, 4), dtype=_FAKE_PRICE_DTYPE)
+        first_minute = 0
+        if n:
+            first_minute = int((index[0].astype("datetime64[m]") - _FAKE_CLOSE_EPOCH).astype(np.int64))
+        fill_prices(prices, first_minute)
+        # Una fila contigua por columna; la plantilla se comparte y no debe mutarse
+        columns = np.ascontiguousarray(prices.T)
+        volume = np.ones(n, dtype=_FAKE_VOLUME_DTYPE)
+        for arr in (index, columns, volume):
+            arr.flags.writeable = False
+        tz = None if start_ts.tz is None else str(start_ts.tz)
+        return OHLCVBlock(index, *columns, volume, symbol, tz)
+
+    def send_market_order(self, order_request, now=None):
+        """Simula una orden; now fecha las aperturas y cierres (por defecto, la hora actual)."""
         from bot_trading.domain.entities import OrderResult, Position, TradeRecord
         
+        if now is None:
+            now = datetime.now(timezone.utc)
         self.orders_sent.append(order_request)
         order_id = len(self.orders_sent)
-        logger.info("Orden simulada enviada: %s (ID: %d, Magic: %s)", 
-                   order_request, order_id, order_request.magic_number)
+        # Un único chequeo de nivel por orden: sin INFO no se prepara ningún log
+        info_enabled = logger.isEnabledFor(logging.INFO)
+        if info_enabled:
+            logger.info("Orden simulada enviada: %s (ID: %d, Magic: %s)", 
+                       order_request, order_id, order_request.magic_number)
         
         # Simular apertura o cierre de posiciones
         if order_request.order_type in {"BUY", "SELL"}:
@@ -79,41 +152,49 @@ class FakeBroker:
                 stop_loss=order_request.stop_loss,
                 take_profit=order_request.take_profit,
                 strategy_name=order_request.comment or "unknown",
-                open_time=datetime.now(timezone.utc),
+                open_time=now,
                 magic_number=order_request.magic_number
             )
             self.open_positions.append(position)
-            logger.info("Posición simulada abierta: %s %s (Magic: %s)", 
-                       order_request.order_type, order_request.symbol, order_request.magic_number)
+            self._positions_dirty = True
+            if info_enabled:
+                logger.info("Posición simulada abierta: %s %s (Magic: %s)", 
+                           order_request.order_type, order_request.symbol, order_request.magic_number)
         
         elif order_request.order_type == "CLOSE":
             # Cerrar posiciones del símbolo y magic number especificados
             # Si tiene magic_number, solo cerrar las de esa estrategia (método robusto)
-            if order_request.magic_number is not None:
-                positions_to_close = [
-                    p for p in self.open_positions 
-                    if p.symbol == order_request.symbol and p.magic_number == order_request.magic_number
-                ]
-                if not positions_to_close:
-                    logger.warning(
-                        "No se encontraron posiciones abiertas para cerrar: %s (Magic: %s)",
-                        order_request.symbol, order_request.magic_number
-                    )
-            else:
-                # Fallback: cerrar todas las posiciones del símbolo
-                positions_to_close = [p for p in self.open_positions if p.symbol == order_request.symbol]
-                logger.debug("Cerrando todas las posiciones de %s (sin Magic Number especificado)", order_request.symbol)
+            # Sin magic_number (fallback) se cierran todas las posiciones del símbolo
+            symbol = order_request.symbol
+            magic = order_request.magic_number
+            positions_to_close = []
+            remaining = []
+            # Una sola pasada reparte las posiciones entre las que se cierran y
+            # las que siguen abiertas, sin list.remove por cada cierre
+            for p in self.open_positions:
+                if p.symbol == symbol and (magic is None or p.magic_number == magic):
+                    positions_to_close.append(p)
+                else:
+                    remaining.append(p)
+            if positions_to_close:
+                self.open_positions[:] = remaining
+                self._positions_dirty = True
+            elif magic is not None:
+                logger.warning(
+                    "No se encontraron posiciones abiertas para cerrar: %s (Magic: %s)",
+                    symbol, magic
+                )
+            if magic is None:
+                logger.debug("Cerrando todas las posiciones de %s (sin Magic Number especificado)", symbol)
             
-            # Cerrar posiciones y crear registros de trades cerrados
+            # Crear registros de trades cerrados
             for pos in positions_to_close:
-                self.open_positions.remove(pos)
-                
                 # Crear registro de trade cerrado
                 trade_record = TradeRecord(
                     symbol=pos.symbol,
                     strategy_name=pos.strategy_name,
                     entry_time=pos.open_time,
-                    exit_time=datetime.now(timezone.utc),
+                    exit_time=now,
                     entry_price=pos.entry_price,
                     exit_price=1.0,  # Precio de cierre simulado
                     size=pos.volume,
@@ -122,19 +203,42 @@ class FakeBroker:
                     take_profit=pos.take_profit
                 )
                 self.closed_trades.append(trade_record)
+                self._closed_dirty = True
                 
-                logger.info("Posición simulada cerrada: %s (Magic: %s, Strategy: %s)", 
-                           pos.symbol, pos.magic_number, pos.strategy_name)
+                if info_enabled:
+                    logger.info("Posición simulada cerrada: %s (Magic: %s, Strategy: %s)", 
+                               pos.symbol, pos.magic_number, pos.strategy_name)
 
         return OrderResult(success=True, order_id=order_id)
 
+    def send_market_orders(self, order_requests, now=None):
+        """Envía un lote de órdenes simuladas en el orden recibido.
+
+        Todas las órdenes del lote comparten el mismo instante now.
+        """
+        if now is None:
+            now = datetime.now(timezone.utc)
+        return [self.send_market_order(order_request, now) for order_request in order_requests]
+
     def get_open_positions(self):
-        """Devuelve las posiciones abiertas simuladas."""
-        return self.open_positions.copy()
+        """Devuelve las posiciones abiertas simuladas (tupla de solo lectura).
 
-    def get_closed_trades(self):
-        """Devuelve los trades cerrados simulados."""
-        return self.closed_trades.copy()
+        La tupla se comparte entre llamadas mientras no se abran ni cierren posiciones.
+        """
+        if self._positions_dirty:
+            self._open_positions_tuple = tuple(self.open_positions)
+            self._positions_dirty = False
+        return self._open_positions_tuple
+
+    def get_closed_trades(self, from_date=None, to_date=None):
+        """Devuelve los trades cerrados simulados (el rango se ignora).
+
+        La tupla se comparte entre llamadas mientras no se cierren posiciones.
+        """
+        if self._closed_dirty:
+            self._closed_trades_tuple = tuple(self.closed_trades)
+            self._closed_dirty = False
+        return self._closed_trades_tuple
 
 
 def main() -> None:
@@ -249,6 +353,10 @@ def main() -> None:
     logger.info("  - GBPUSD: Timeframe mínimo M1, Lot size 0.01")
     logger.info("  - USDJPY: Timeframe mínimo M5, Lot size 0.01")
     logger.info(" Símbolos configurados")
+    
+    if USE_REAL_BROKER:
+        # SymbolInfo, filling mode y primer tick antes del primer ciclo
+        broker.warm_up([symbol.name for symbol in symbols])
 
     ############################################################################
     #
@@ -314,8 +422,9 @@ def main() -> None:
                                pos.symbol, pos.volume, pos.entry_price,
                                pos.strategy_name, pos.magic_number)
                 
-                # Obtener trades cerrados
-                trades = broker.get_closed_trades()
+                # Obtener trades cerrados de la sesión de hoy en una sola consulta
+                session_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                trades = broker.get_closed_trades(from_date=session_start)
                 logger.info("📊 Trades cerrados hoy: %d", len(trades))
                 if trades:
                     total_pnl = sum(t.pnl for t in trades)
@@ -337,8 +446,8 @@ def main() -> None:
         
         # Cerrar conexión con MT5 si es necesario
         if USE_REAL_BROKER:
-            logger.info("Cerrando conexión con MetaTrader5...")
-            # El destructor del cliente se encarga del cierre
+            # Cierre explícito: no depender del destructor al apagar el intérprete
+            broker.close()
             logger.info("✅ Conexión cerrada")
         
         logger.info("="*80)
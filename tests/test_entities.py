@@ -1,7 +1,7 @@
 """Tests de entidades de dominio."""
 from datetime import datetime
 
-from bot_trading.domain.entities import Position, SymbolConfig
+from bot_trading.domain.entities import TRADE_RECORD_FIELDS, Position, SymbolConfig, TradeRecord
 
 
 def test_symbol_config_attributes_definidos() -> None:
@@ -28,3 +28,71 @@ def test_position_crea_instancia_completa() -> None:
 
     assert position.symbol == "EURUSD"
     assert position.strategy_name == "demo"
+
+
+def test_signal_es_inmutable_y_hashable() -> None:
+    """Las señales no pueden modificarse y se pueden deduplicar con un set."""
+    import dataclasses
+
+    import pytest
+
+    from bot_trading.application.engine.signals import Signal, SignalType
+
+    signal = Signal(
+        symbol="EURUSD",
+        strategy_name="dummy",
+        timeframe="M1",
+        signal_type=SignalType.BUY,
+        size=0.01,
+        stop_loss=None,
+        take_profit=None,
+    )
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        signal.size = 1.0  # type: ignore[misc]
+    assert len({signal, dataclasses.replace(signal)}) == 1
+    assert not hasattr(signal, "__dict__")
+
+
+def test_trade_record_as_tuple_sigue_el_orden_de_campos() -> None:
+    """as_tuple devuelve los campos en el orden de TRADE_RECORD_FIELDS."""
+    now = datetime(2024, 1, 1, 12, 0)
+    trade = TradeRecord(
+        symbol="EURUSD",
+        strategy_name="demo",
+        entry_time=now,
+        exit_time=now,
+        entry_price=1.1,
+        exit_price=1.2,
+        size=0.1,
+        pnl=10.0,
+        stop_loss=None,
+        take_profit=1.3,
+    )
+
+    assert trade.as_tuple() == tuple(getattr(trade, name) for name in TRADE_RECORD_FIELDS)
+    assert not hasattr(trade, "__dict__")
+
+
+def test_trade_record_from_columns_construye_registros() -> None:
+    """from_columns crea un TradeRecord por fila con objetos Python."""
+    import numpy as np
+
+    entry = np.array(["2024-01-01T10:00", "2024-01-01T11:00"], dtype="datetime64[ns]")
+    trades = TradeRecord.from_columns(
+        symbol=["EURUSD", "GBPUSD"],
+        strategy_name=["a", "b"],
+        entry_time=entry,
+        exit_time=entry + np.timedelta64(5, "m"),
+        entry_price=np.array([1.1, 1.2]),
+        exit_price=np.array([1.2, 1.1]),
+        size=np.array([0.1, 0.2]),
+        pnl=np.array([10.0, -5.0]),
+        stop_loss=[None, 1.0],
+        take_profit=[None, None],
+    )
+
+    assert [t.symbol for t in trades] == ["EURUSD", "GBPUSD"]
+    assert trades[1].exit_time == datetime(2024, 1, 1, 11, 5)
+    assert type(trades[0].pnl) is float
+    assert trades[1].as_tuple().stop_loss == 1.0
@@ -0,0 +1,54 @@
+"""Tests del relleno de velas sintéticas."""
+import numpy as np
+
+from bot_trading.infrastructure._fake_ohlcv import _fill_prices_kernel, fill_prices
+
+
+def test_kernel_y_version_numpy_dan_los_mismos_precios() -> None:
+    """El kernel (compilado o no) coincide con el relleno vectorizado."""
+    expected = np.empty((5, 4), dtype=np.float64)
+    fill_prices(expected)
+    out = np.empty((5, 4), dtype=np.float64)
+    _fill_prices_kernel(out, 0)
+
+    np.testing.assert_array_equal(out, expected)
+    assert expected[:, :3].tolist() == [[1.0, 1.0, 1.0]] * 5
+    assert expected[:, 3].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_broker_simulado_usa_tipos_de_mt5_salvo_que_se_pida_otro() -> None:
+    """Las velas simuladas son float64/int64 como en MT5; dtype permite float32."""
+    from datetime import datetime
+
+    from bot_trading.main import FakeBroker
+
+    broker = FakeBroker()
+    start, end = datetime(2020, 1, 1), datetime(2020, 1, 1, 0, 4)
+
+    df = broker.get_ohlcv("EURUSD", "M1", start, end)
+    compact = broker.get_ohlcv("EURUSD", "M1", start, end, dtype=np.float32)
+
+    assert df["close"].dtype == np.float64 and df["volume"].dtype == np.int64
+    assert compact["close"].dtype == np.float32
+    assert compact["close"].tolist() == df["close"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_broker_simulado_cierre_depende_solo_del_instante() -> None:
+    """La misma vela conserva su cierre aunque la plantilla se regenere."""
+    from datetime import datetime, timedelta
+
+    from bot_trading.main import _FAKE_TEMPLATE_MAX_SPAN, FakeBroker
+
+    broker = FakeBroker()
+    moment = datetime(2024, 3, 1, 12, 0)
+    before = broker.get_ohlcv("EURUSD", "M1", moment, moment)["close"].iloc[0]
+
+    # Un rango anterior y lejano obliga a regenerar la plantilla sin acumular el hueco
+    far = moment - 2 * _FAKE_TEMPLATE_MAX_SPAN
+    broker.get_ohlcv("EURUSD", "M1", far, far + timedelta(minutes=5))
+    start_tpl, end_tpl, _ = broker._template["EURUSD"]
+    assert end_tpl - start_tpl <= _FAKE_TEMPLATE_MAX_SPAN
+
+    after = broker.get_ohlcv("EURUSD", "M1", moment - timedelta(minutes=1), moment)["close"]
+    assert after.iloc[-1] == before
+    assert after.iloc[-1] - after.iloc[0] == 1.0
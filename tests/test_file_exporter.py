@@ -0,0 +1,58 @@
+"""Tests de la exportación de trades."""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bot_trading.domain.entities import TRADE_RECORD_FIELDS, TradeRecord
+from bot_trading.infrastructure.file_exporter import ExcelExporter, trades_to_frame
+
+
+def _build_trade(pnl: float, stop_loss: float | None) -> TradeRecord:
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return TradeRecord(
+        symbol="EURUSD",
+        strategy_name="demo",
+        entry_time=now,
+        exit_time=now + timedelta(minutes=5),
+        entry_price=1.1,
+        exit_price=1.2,
+        size=0.1,
+        pnl=pnl,
+        stop_loss=stop_loss,
+        take_profit=None,
+    )
+
+
+def test_trades_to_frame_construye_columnas_tipadas() -> None:
+    """El DataFrame tiene una columna por campo y tipos numéricos nativos."""
+    trades = [_build_trade(10.0, 1.0), _build_trade(-5.0, None)]
+
+    df = trades_to_frame(iter(trades))
+
+    assert list(df.columns) == list(TRADE_RECORD_FIELDS)
+    assert df["pnl"].tolist() == [10.0, -5.0]
+    assert df["pnl"].dtype == np.float64
+    assert np.isnan(df["stop_loss"].iloc[1])
+    assert df["take_profit"].isna().all()
+    assert pd.api.types.is_datetime64_any_dtype(df["exit_time"])
+
+
+def test_trades_to_frame_sin_trades() -> None:
+    """Sin trades se obtiene un DataFrame vacío con todas las columnas."""
+    df = trades_to_frame([])
+
+    assert df.empty
+    assert list(df.columns) == list(TRADE_RECORD_FIELDS)
+
+
+def test_export_trades_parquet_conserva_los_datos(tmp_path) -> None:
+    """Los trades exportados a Parquet se leen con los mismos valores."""
+    pytest.importorskip("pyarrow")
+    trades = [_build_trade(10.0, 1.0), _build_trade(-5.0, None)]
+    file_path = tmp_path / "out" / "trades.parquet"
+
+    ExcelExporter().export_trades_parquet(trades, file_path)
+
+    pd.testing.assert_frame_equal(pd.read_parquet(file_path), trades_to_frame(trades))
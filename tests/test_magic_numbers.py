@@ -6,6 +6,7 @@ from bot_trading.main import FakeBroker
 from bot_trading.application.engine.bot_engine import TradingBot
 from bot_trading.application.engine.order_executor import OrderExecutor
 from bot_trading.application.risk_management import RiskManager
+from bot_trading.application.strategy_registry import StrategyRegistry
 from bot_trading.application.strategies.simple_example_strategy import SimpleExampleStrategy
 from bot_trading.domain.entities import RiskLimits, SymbolConfig
 from bot_trading.infrastructure.data_fetcher import MarketDataService
@@ -87,6 +88,126 @@ def test_multiple_strategies_same_symbol():
     assert len(set(magic_numbers)) == 2, f"Magic Numbers duplicados: {magic_numbers}"
     logger.info("✓ Magic Numbers únicos: %s", magic_numbers)
 
+
+def test_magic_number_determinista_entre_registros():
+    """El Magic Number depende solo del nombre y queda en rango int32 positivo."""
+    first = StrategyRegistry().register_strategy("strategy_1")
+    second = StrategyRegistry().register_strategy("strategy_1")
+
+    assert first == second
+    assert 0 <= first < 2**31
+    assert StrategyRegistry().register_strategy("strategy_2") != first
+
+
+def test_colision_de_magic_number_se_resuelve_incrementando():
+    """Si el número ya está ocupado se asigna el siguiente libre."""
+    import zlib
+
+    registry = StrategyRegistry()
+    magic = zlib.crc32(b"strategy_1") & 0x7FFFFFFF
+    # Ocupar el número y el siguiente con estrategias ficticias
+    for offset, name in enumerate(("ocupada_1", "ocupada_2")):
+        registry._magic_to_strategy[magic + offset] = name
+        slot = (magic + offset) & ((1 << 20) - 1)
+        registry._occupied[slot >> 3] |= 1 << (slot & 7)
+
+    assert registry.register_strategy("strategy_1") == magic + 2
+    # Un slot compartido por otro número no se considera colisión
+    assert registry._is_taken(magic + (1 << 20)) is False
+
+
+
+def _legacy_bot(broker, strategy_name="legacy_strategy"):
+    """Bot con una única estrategia sobre EURUSD y el broker indicado."""
+    strategy = SimpleExampleStrategy(name=strategy_name, timeframes=["M1"])
+    return TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits(dd_global=1000)),
+        order_executor=OrderExecutor(broker),
+        strategies=[strategy],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+
+
+def test_posicion_con_magic_legado_no_se_duplica_y_se_cierra_con_su_numero():
+    """Una posición abierta con el Magic Number MD5 se asocia a su estrategia."""
+    from bot_trading.application.engine.signals import Signal, SignalType
+    from bot_trading.application.strategy_registry import legacy_magic_number
+    from bot_trading.domain.entities import OrderRequest
+
+    broker = FakeBroker()
+    legacy = legacy_magic_number("legacy_strategy")
+    broker.send_market_order(
+        OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=legacy)
+    )
+    bot = _legacy_bot(broker)
+    current = bot.strategy_registry.get_magic_number("legacy_strategy")
+    assert current != legacy
+    assert bot.strategy_registry.resolve_magic_number(legacy) == current
+
+    bot.run_once(now=datetime.now(timezone.utc))
+    # La señal de apertura no duplica la posición legada
+    assert len(broker.orders_sent) == 1
+
+    open_positions = bot._resolve_open_positions(
+        bot.order_executor.get_open_positions_snapshot()
+    )
+    close = Signal("EURUSD", "legacy_strategy", "M1", SignalType.CLOSE, 0.01, None, None)
+    pending = []
+    bot._collect_orders(bot.strategies[0], [close], open_positions, pending)
+    assert [order.magic_number for order in pending] == [legacy]
+
+
+def test_magic_desconocido_en_simbolo_operado_se_avisa_una_vez(caplog):
+    """Un Magic Number que no es de ninguna estrategia se avisa una sola vez."""
+    from bot_trading.domain.entities import OrderRequest
+
+    broker = FakeBroker()
+    broker.send_market_order(
+        OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=12345)
+    )
+    bot = _legacy_bot(broker)
+
+    with caplog.at_level(logging.WARNING):
+        bot.run_once(now=datetime.now(timezone.utc))
+        bot.run_once(now=datetime.now(timezone.utc))
+
+    assert sum("12345 desconocido" in r.getMessage() for r in caplog.records) == 1
+
+
+def test_magic_numbers_cacheados_coinciden_con_el_registro():
+    """La caché del bot refleja el registro, también tras cambiar las estrategias."""
+    bot = _legacy_bot(FakeBroker(), "cacheada")
+    registry = bot.strategy_registry
+
+    assert bot._magic_by_strategy == {"cacheada": registry.get_magic_number("cacheada")}
+
+    bot.strategies.append(SimpleExampleStrategy(name="nueva", timeframes=["M1"]))
+    bot.run_once(now=datetime.now(timezone.utc))
+    assert bot._magic_by_strategy == {
+        name: registry.get_magic_number(name) for name in ("cacheada", "nueva")
+    }
+
+
+def test_fake_broker_open_positions_sigue_siendo_lista():
+    """open_positions es la lista pública; get_open_positions cachea una tupla."""
+    from bot_trading.domain.entities import OrderRequest
+
+    broker = FakeBroker()
+    buy = OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=1)
+    broker.send_market_order(buy)
+    broker.send_market_order(OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=2))
+    snapshot = broker.get_open_positions()
+
+    assert isinstance(broker.open_positions, list)
+    assert broker.get_open_positions() is snapshot and len(snapshot) == 2
+
+    broker.send_market_order(OrderRequest(symbol="EURUSD", volume=0.01, order_type="CLOSE", magic_number=1))
+    assert [p.magic_number for p in broker.get_open_positions()] == [2]
+    broker.open_positions.clear()
+    assert broker.open_positions == []
+
 if __name__ == "__main__":
     logger.info("=" * 60)
     logger.info("TEST 1: Prevención de posiciones duplicadas")
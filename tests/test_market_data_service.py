@@ -2,9 +2,18 @@
 from datetime import datetime, timedelta
 
 import pandas as pd
+import pytest
 
 from bot_trading.domain.entities import SymbolConfig
-from bot_trading.infrastructure.data_fetcher import MarketDataService
+from bot_trading.infrastructure.data_fetcher import (
+    _PERIOD_NS,
+    _TIMEFRAME_MAP,
+    MarketDataService,
+    Timeframe,
+    _compact_volume,
+    _timeframe_rank_delta,
+    _validated_targets,
+)
 
 
 class FakeBroker:
@@ -33,6 +42,185 @@ def test_market_data_service_resamplea_timeframes_correctamente() -> None:
     result = service.get_resampled_data(symbol, ["M1", "M5"], start, end)
 
     assert set(result.keys()) == {"M1", "M5"}
+    assert result.symbol == "EURUSD"
     assert len(result["M1"]) == 10
     # 10 minutos deben agruparse en 2 velas de 5 minutos
     assert len(result["M5"]) == 2
+
+
+class PartiallyFailingBroker(FakeBroker):
+    """Broker que falla para un símbolo concreto."""
+
+    def get_ohlcv(self, symbol: str, timeframe: str, start: datetime, end: datetime) -> pd.DataFrame:
+        if symbol == "BROKEN":
+            raise ConnectionError("sin conexión")
+        return super().get_ohlcv(symbol, timeframe, start, end)
+
+
+def test_market_data_service_batch_omite_simbolos_con_error() -> None:
+    """El lote debe devolver los símbolos correctos y omitir los que fallan."""
+    start = datetime(2023, 1, 1, 0, 0)
+    end = start + timedelta(minutes=9)
+    service = MarketDataService(PartiallyFailingBroker())
+    symbols = [
+        SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01),
+        SymbolConfig(name="BROKEN", min_timeframe="M1", lot_size=0.01),
+        SymbolConfig(name="GBPUSD", min_timeframe="M1", lot_size=0.01),
+    ]
+
+    result = service.get_resampled_data_batch(
+        symbols,
+        target_timeframes={"EURUSD": ["M5"], "BROKEN": ["M1"], "GBPUSD": ["M1"]},
+        start=start,
+        end=end,
+    )
+
+    assert set(result) == {"EURUSD", "GBPUSD"}
+    assert set(result["EURUSD"]) == {"M1", "M5"}
+    assert set(result["GBPUSD"]) == {"M1"}
+
+
+def test_resampleo_numpy_coincide_con_pandas_con_huecos() -> None:
+    """El resampleo con NumPy debe dar el mismo resultado que pandas."""
+    from bot_trading.infrastructure.data_fetcher import _resample_ohlcv_numpy
+
+    index = pd.date_range("2023-01-01 00:00", periods=600, freq="1min", tz="UTC")
+    # Quitar un tramo completo para generar periodos sin datos
+    index = index[(index.hour != 3)]
+    n = len(index)
+    raw = pd.DataFrame(
+        {
+            "open": [float(i % 17) for i in range(n)],
+            "high": [float(i % 23) + 1 for i in range(n)],
+            "low": [float(i % 13) - 1 for i in range(n)],
+            "close": [float(i % 11) for i in range(n)],
+            "volume": [i % 7 for i in range(n)],
+        },
+        index=index,
+    )
+
+    # Los timeframes se generan en cascada (M5 -> M15 -> H1 -> H4) en una sola llamada
+    result = _resample_ohlcv_numpy(raw, ("M5", "M15", "H1", "H4"))
+    for tf, freq in (("M5", "5min"), ("M15", "15min"), ("H1", "1h"), ("H4", "4h")):
+        expected = raw.resample(freq).agg(
+            {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+        ).dropna()
+        pd.testing.assert_frame_equal(result[tf], expected, check_freq=False)
+
+
+def test_validacion_de_timeframes_memoizada_y_sin_base() -> None:
+    """Los timeframes a generar excluyen el base, van ordenados y se validan una vez."""
+    _validated_targets.cache_clear()
+    assert _validated_targets("M1", frozenset({"H1", "M1", "M5"})) == ("M5", "H1")
+    _validated_targets("M1", frozenset({"H1", "M1", "M5"}))
+    assert _validated_targets.cache_info().hits == 1
+
+    with pytest.raises(ValueError):
+        _validated_targets("H1", frozenset({"M5"}))
+
+
+def test_datos_desordenados_se_ordenan_y_deduplican() -> None:
+    """Las velas del broker se ordenan y los duplicados conservan la última."""
+
+    class UnsortedBroker:
+        def get_ohlcv(self, symbol, timeframe, start, end):
+            index = pd.to_datetime(
+                ["2024-01-01 00:02", "2024-01-01 00:00", "2024-01-01 00:01", "2024-01-01 00:01"]
+            )
+            return pd.DataFrame(
+                {
+                    "open": [3.0, 1.0, 2.0, 2.5],
+                    "high": [3.0, 1.0, 2.0, 2.5],
+                    "low": [3.0, 1.0, 2.0, 2.5],
+                    "close": [3.0, 1.0, 2.0, 2.5],
+                    "volume": [1, 1, 1, 1],
+                },
+                index=index,
+            )
+
+    service = MarketDataService(UnsortedBroker())
+    symbol = SymbolConfig(name="EURUSD", min_timeframe="M1")
+
+    raw = service.get_resampled_data(symbol, ["M1"], datetime(2024, 1, 1), datetime(2024, 1, 2))["M1"]
+
+    assert raw.index.is_monotonic_increasing and raw.index.is_unique
+    assert raw["close"].tolist() == [1.0, 2.5, 3.0]
+    assert raw.attrs["sorted"] is True
+
+
+def test_volumen_entero_se_normaliza_a_int64() -> None:
+    """El volumen float con valores enteros se guarda como int64; con decimales no."""
+    index = pd.date_range("2024-01-01", periods=3, freq="1min")
+    integral = pd.DataFrame({"volume": [1.0, 2.0, 3.0]}, index=index)
+    fractional = pd.DataFrame({"volume": [1.5, 2.0, 3.0]}, index=index)
+
+    assert _compact_volume(integral)["volume"].dtype == "int64"
+    assert _compact_volume(fractional)["volume"].dtype == "float64"
+
+
+def test_no_modifica_el_dataframe_devuelto_por_el_broker() -> None:
+    """Las columnas y attrs del DataFrame del broker (o de su caché) no cambian."""
+
+    class CachingBroker:
+        def __init__(self) -> None:
+            index = pd.date_range("2024-01-01", periods=3, freq="1min")
+            self.frame = pd.DataFrame(
+                {
+                    "open": [1.0, 2.0, 3.0],
+                    "high": [1.0, 2.0, 3.0],
+                    "low": [1.0, 2.0, 3.0],
+                    "close": [1.0, 2.0, 3.0],
+                    "volume": [1.0, 2.0, 3.0],
+                },
+                index=index,
+            )
+
+        def get_ohlcv(self, symbol, timeframe, start, end):
+            return self.frame
+
+    broker = CachingBroker()
+    service = MarketDataService(broker)
+    symbol = SymbolConfig(name="EURUSD", min_timeframe="M1")
+
+    raw = service.get_resampled_data(symbol, ["M1"], datetime(2024, 1, 1), datetime(2024, 1, 2))["M1"]
+
+    assert raw["volume"].dtype == "int64"
+    assert raw.attrs["symbol"] == "EURUSD"
+    assert broker.frame["volume"].dtype == "float64"
+    assert broker.frame.attrs == {}
+
+
+def test_tabla_de_periodos_cubre_todos_los_timeframes() -> None:
+    """Cada timeframe soportado tiene código entero y periodo creciente."""
+    assert [tf.name for tf in Timeframe] == list(_TIMEFRAME_MAP)
+    assert _PERIOD_NS.dtype == "int64"
+    assert (_PERIOD_NS[1:] > _PERIOD_NS[:-1]).all()
+    assert _PERIOD_NS[Timeframe.H1] == pd.Timedelta(hours=1).value
+
+
+def test_batch_respeta_max_workers_del_servicio() -> None:
+    """El pool temporal del lote no supera max_workers hilos."""
+    import threading
+
+    threads: set[str] = set()
+
+    class RecordingBroker(FakeBroker):
+        def get_ohlcv(self, symbol, timeframe, start, end):
+            threads.add(threading.current_thread().name)
+            return super().get_ohlcv(symbol, timeframe, start, end)
+
+    start = datetime(2023, 1, 1, 0, 0)
+    service = MarketDataService(RecordingBroker(), max_workers=1)
+    symbols = [SymbolConfig(name=f"SYM{i}", min_timeframe="M1") for i in range(4)]
+
+    result = service.get_resampled_data_batch(symbols, ["M1"], start, start + timedelta(minutes=4))
+
+    assert len(result) == 4
+    assert len(threads) == 1
+
+
+def test_diferencia_de_rango_entre_timeframes() -> None:
+    """La diferencia de rango es positiva hacia timeframes mayores y negativa al revés."""
+    assert _timeframe_rank_delta("M1", "M1") == 0
+    assert _timeframe_rank_delta("M1", "H1") == 3
+    assert _timeframe_rank_delta("H4", "M15") < 0
@@ -95,6 +95,53 @@ def test_ensure_connected_reconecta_si_es_necesario(mock_mt5, client):
     mock_mt5.initialize.assert_called_once()
 
 
+
+def test_ensure_connected_reintenta_con_backoff(mock_mt5, client):
+    """Si la inicialización falla se reintenta con esperas crecientes."""
+    mock_mt5.initialize.side_effect = [False, False, True]
+    mock_mt5.last_error.return_value = (1, "Terminal not found")
+    mock_mt5.terminal_info.return_value = Mock(name="MT5 Terminal")
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+
+    with patch('bot_trading.infrastructure.mt5_client.time.sleep') as sleep, \
+            patch('bot_trading.infrastructure.mt5_client.random.uniform', return_value=0.0):
+        client._ensure_connected()
+
+    assert client.connected is True
+    assert [c.args[0] for c in sleep.call_args_list] == [0.1, 0.2]
+
+
+def test_ensure_connected_agota_reintentos(mock_mt5, client):
+    """Tras max_retries intentos fallidos se propaga MT5ConnectionError."""
+    mock_mt5.initialize.return_value = False
+    mock_mt5.last_error.return_value = (1, "Terminal not found")
+
+    with patch('bot_trading.infrastructure.mt5_client.time.sleep'):
+        with pytest.raises(MT5ConnectionError):
+            client._ensure_connected()
+
+    assert mock_mt5.initialize.call_count == client.max_retries
+
+
+
+def test_ensure_connected_limita_comprobaciones_de_terminal(mock_mt5, client):
+    """terminal_info() solo se repite cuando ha pasado LIVENESS_TTL."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock(name="MT5 Terminal")
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+
+    with patch('bot_trading.infrastructure.mt5_client.time.monotonic') as monotonic:
+        monotonic.return_value = 1000.0
+        client._ensure_connected()  # Conecta y marca el terminal como vivo
+        calls = mock_mt5.terminal_info.call_count
+        client._ensure_connected()
+        assert mock_mt5.terminal_info.call_count == calls
+
+        monotonic.return_value = 1000.0 + client.LIVENESS_TTL
+        client._ensure_connected()
+        assert mock_mt5.terminal_info.call_count == calls + 1
+
+
 # =============================================================================
 # TESTS DE DESCARGA DE DATOS OHLCV
 # =============================================================================
@@ -203,6 +250,160 @@ def test_get_ohlcv_retorna_dataframe_con_columnas_correctas(mock_mt5, client):
     assert df.iloc[0]['volume'] == 100
 
 
+def test_get_ohlcv_acepta_array_estructurado_de_mt5(mock_mt5, client):
+    """El array estructurado que devuelve MT5 se convierte sin DataFrame intermedio."""
+    import numpy as np
+
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.symbol_info.return_value = Mock(visible=True)
+    mock_mt5.copy_rates_range.return_value = np.array(
+        [(1704067200, 1.1, 1.2, 1.0, 1.15, 100, 1, 0), (1704067260, 1.15, 1.3, 1.1, 1.2, 80, 1, 0)],
+        dtype=[
+            ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'),
+            ('close', '<f8'), ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+        ],
+    )
+    client.connect()
+
+    df = client.get_ohlcv("EURUSD", "M1", datetime(2024, 1, 1), datetime(2024, 1, 2))
+
+    assert list(df.columns) == ['open', 'high', 'low', 'close', 'volume']
+    assert df.index[1] == pd.Timestamp("2024-01-01 00:01:00")
+    assert df.index.name == "datetime"
+    assert df['volume'].tolist() == [100, 80]
+
+
+
+def test_get_ohlcv_block_devuelve_las_mismas_velas(mock_mt5, client):
+    """get_ohlcv_block entrega las velas de get_ohlcv como arrays por columna."""
+    import numpy as np
+
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.symbol_info.return_value = Mock(visible=True)
+    mock_mt5.copy_rates_range.return_value = np.array(
+        [(1704067200, 1.1, 1.2, 1.0, 1.15, 100, 1, 0), (1704067260, 1.15, 1.3, 1.1, 1.2, 80, 1, 0)],
+        dtype=[
+            ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'),
+            ('close', '<f8'), ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+        ],
+    )
+    client.connect()
+
+    block = client.get_ohlcv_block("EURUSD", "M1", datetime(2024, 1, 1), datetime(2024, 1, 2))
+
+    assert block.symbol == "EURUSD" and block.tz is None
+    assert block.close.tolist() == [1.15, 1.2]
+    assert block.index[1] == np.datetime64("2024-01-01T00:01:00")
+    assert block.to_frame()['volume'].tolist() == [100, 80]
+
+def test_get_ohlcv_multi_descarga_varios_y_omite_fallidos(mock_mt5, client):
+    """El lote devuelve un DataFrame por símbolo y salta los que fallan."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.symbol_info.return_value = Mock(visible=True)
+    mock_mt5.last_error.return_value = (1, "sin datos")
+    
+    def copy_rates_range(symbol, timeframe, start, end):
+        if symbol == "BROKEN":
+            return None
+        return [{'time': 1704067200, 'open': 1.0, 'high': 1.1, 'low': 0.9,
+                 'close': 1.05, 'tick_volume': 10, 'spread': 1, 'real_volume': 0}]
+    
+    mock_mt5.copy_rates_range.side_effect = copy_rates_range
+    client.connect()
+    
+    result = client.get_ohlcv_multi(
+        ["EURUSD", "BROKEN", "GBPUSD"], "M1", datetime(2024, 1, 1), datetime(2024, 1, 2)
+    )
+    
+    assert set(result) == {"EURUSD", "GBPUSD"}
+    assert result["GBPUSD"]["close"].tolist() == [1.05]
+    with pytest.raises(ValueError):
+        client.get_ohlcv_multi(["EURUSD"], "X9", datetime(2024, 1, 1), datetime(2024, 1, 2))
+
+
+def test_get_ohlcv_many_asincrono_descarga_cada_peticion(mock_mt5, client):
+    """La versión asíncrona acepta timeframe por símbolo y omite los fallidos."""
+    import asyncio
+    
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.symbol_info.return_value = Mock(visible=True)
+    mock_mt5.last_error.return_value = (1, "sin datos")
+    mock_mt5.copy_rates_range.side_effect = lambda symbol, *args: None if symbol == "BROKEN" else [
+        {'time': 1704067200, 'open': 1.0, 'high': 1.1, 'low': 0.9,
+         'close': 1.05, 'tick_volume': 10, 'spread': 1, 'real_volume': 0}
+    ]
+    client.connect()
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    
+    try:
+        result = asyncio.run(client.get_ohlcv_many(
+            [("EURUSD", "M1", start, end), ("BROKEN", "M5", start, end), ("NVDA", "H1", start, end)]
+        ))
+    finally:
+        client.close()
+    
+    assert set(result) == {"EURUSD", "NVDA"}
+    assert client._ohlcv_pool is None
+
+
+def test_get_ohlcv_many_rechaza_simbolos_repetidos(mock_mt5, client):
+    """Dos peticiones del mismo símbolo se rechazan antes de descargar nada."""
+    import asyncio
+    
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    
+    with pytest.raises(ValueError, match="EURUSD"):
+        asyncio.run(client.get_ohlcv_many(
+            [("EURUSD", "M1", start, end), ("EURUSD", "H1", start, end)]
+        ))
+    mock_mt5.copy_rates_range.assert_not_called()
+
+
+def test_pool_ohlcv_se_crea_una_sola_vez_entre_hilos(client):
+    """Llamadas simultáneas a _ohlcv_executor comparten un único pool."""
+    import threading
+    import time
+    
+    from bot_trading.infrastructure import mt5_client
+    
+    created = []
+    real_pool = mt5_client.ThreadPoolExecutor
+    
+    def slow_pool(*args, **kwargs):
+        time.sleep(0.01)  # Ensanchar la ventana entre la comprobación y la asignación
+        pool = real_pool(*args, **kwargs)
+        created.append(pool)
+        return pool
+    
+    start = threading.Event()
+    pools = []
+    
+    def worker():
+        start.wait()
+        pools.append(client._ohlcv_executor())
+    
+    with patch.object(mt5_client, "ThreadPoolExecutor", side_effect=slow_pool):
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+    client.close()
+    
+    assert len(created) == 1
+    assert all(pool is created[0] for pool in pools)
+    assert client._ohlcv_pool is None
+
+
 def test_get_ohlcv_sin_datos_retorna_dataframe_vacio(mock_mt5, client):
     """Si no hay datos, debe retornar DataFrame vacío con columnas correctas."""
     mock_mt5.initialize.return_value = True
@@ -228,6 +429,8 @@ def test_get_ohlcv_sin_datos_retorna_dataframe_vacio(mock_mt5, client):
     # datetime ahora es el índice, no una columna
     assert list(df.columns) == ['open', 'high', 'low', 'close', 'volume']
     assert isinstance(df.index, pd.DatetimeIndex)
+    assert df['close'].dtype == 'float64'
+    assert df['volume'].dtype == 'int64'
 
 
 # =============================================================================
@@ -286,6 +489,56 @@ def test_send_market_order_buy_exitosa(mock_mt5, client):
     assert result.order_id == 12345
     assert result.error_message is None
     mock_mt5.order_send.assert_called_once()
+    request = mock_mt5.order_send.call_args[0][0]
+    assert request["action"] is mock_mt5.TRADE_ACTION_DEAL
+    assert request["deviation"] == 20
+    assert request["sl"] == 1.0950 and request["tp"] == 1.1100
+
+
+@pytest.mark.parametrize(
+    "volume, step, expected",
+    [(0.3, 0.1, 0.3), (0.7, 0.1, 0.7), (0.123, 0.01, 0.12), (2.6, 1.0, 3.0)],
+)
+def test_send_market_order_redondea_volumen_al_step_exacto(mock_mt5, client,
+                                                           volume, step, expected):
+    """El volumen enviado es un múltiplo exacto del step, sin error de coma flotante."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.symbol_info.return_value = Mock(
+        visible=True, volume_min=0.01, volume_max=100.0, volume_step=step, filling_mode=1
+    )
+    mock_mt5.symbol_info_tick.return_value = Mock(ask=1.1, bid=1.0)
+    mock_mt5.order_send.return_value = Mock(retcode=10009, order=1, volume=volume, price=1.1)
+    mock_mt5.TRADE_RETCODE_DONE = 10009
+    
+    client.connect()
+    client.send_market_order(OrderRequest(symbol="EURUSD", volume=volume, order_type="BUY"))
+    
+    assert mock_mt5.order_send.call_args[0][0]["volume"] == expected
+
+
+def test_close_sin_tick_retorna_error_sin_enviar(mock_mt5, client):
+    """Si MT5 no devuelve tick, el cierre falla limpiamente y no envía orden."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.symbol_info.return_value = Mock(
+        visible=True, volume_min=0.01, volume_max=100.0, volume_step=0.01
+    )
+    mock_mt5.POSITION_TYPE_BUY = 0
+    mock_mt5.positions_get.return_value = [Mock(ticket=1, volume=0.1, type=0, magic=7)]
+    mock_mt5.symbol_info_tick.return_value = None
+    mock_mt5.last_error.return_value = (1, "sin tick")
+    
+    client.connect()
+    result = client.send_market_order(
+        OrderRequest(symbol="EURUSD", volume=0.1, order_type="CLOSE", magic_number=7)
+    )
+    
+    assert result.success is False
+    assert mock_mt5.symbol_info_tick.call_count == 1
+    mock_mt5.order_send.assert_not_called()
 
 
 def test_send_market_order_volumen_invalido_lanza_error(mock_mt5, client):
@@ -330,6 +583,41 @@ def test_send_market_order_tipo_invalido_lanza_error(mock_mt5, client):
     assert "no válido" in str(exc_info.value)
 
 
+def test_send_market_order_invalida_no_consulta_el_terminal(mock_mt5, client):
+    """Una orden mal formada se rechaza sin conectar ni consultar MT5."""
+    order_request = OrderRequest(symbol="EURUSD", volume=0.0, order_type="BUY")
+    
+    with pytest.raises(ValueError):
+        client.send_market_order(order_request)
+    
+    mock_mt5.initialize.assert_not_called()
+    mock_mt5.terminal_info.assert_not_called()
+
+
+def test_send_market_orders_lote_conserva_orden_y_aisla_errores(mock_mt5, client):
+    """Una orden inválida del lote da un resultado fallido sin frenar las demás."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.symbol_info.return_value = Mock(
+        visible=True, volume_min=0.01, volume_max=100.0, volume_step=0.01, filling_mode=1
+    )
+    mock_mt5.symbol_info_tick.return_value = Mock(ask=1.1, bid=1.0)
+    mock_mt5.order_send.return_value = Mock(retcode=10009, order=7, volume=0.1, price=1.1)
+    mock_mt5.TRADE_RETCODE_DONE = 10009
+    client.connect()
+    
+    results = client.send_market_orders([
+        OrderRequest(symbol="EURUSD", volume=0.1, order_type="BUY"),
+        OrderRequest(symbol="EURUSD", volume=0.1, order_type="INVALID"),
+        OrderRequest(symbol="GBPUSD", volume=0.1, order_type="SELL"),
+    ])
+    
+    assert [r.success for r in results] == [True, False, True]
+    assert "no válido" in results[1].error_message
+    assert mock_mt5.order_send.call_count == 2
+
+
 def test_send_market_order_rechazada_retorna_error(mock_mt5, client):
     """Una orden rechazada debe retornar OrderResult con success=False."""
     # Configurar mocks
@@ -439,6 +727,33 @@ def test_get_open_positions_retorna_lista_con_posiciones(mock_mt5, client):
 # =============================================================================
 
 
+def test_poller_de_posiciones_sirve_la_foto_sin_llamar_a_mt5(mock_mt5, client):
+    """Con el poller activo get_open_positions no consulta MT5; al pararlo sí."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.positions_get.return_value = [
+        Mock(symbol="EURUSD", volume=0.1, price_open=1.1, sl=0.0, tp=0.0,
+             comment="", time=1704067200, magic=0)
+    ]
+    client.connect()
+    
+    client.start_position_poller(interval=60.0)
+    try:
+        calls = mock_mt5.positions_get.call_count
+        positions = client.get_open_positions()
+        assert [p.symbol for p in positions] == ["EURUSD"]
+        assert positions[0].stop_loss is None
+        assert mock_mt5.positions_get.call_count == calls
+    finally:
+        client.close()
+    
+    assert client._poller_thread is None
+    client.connected = True
+    client.get_open_positions()
+    assert mock_mt5.positions_get.call_count == calls + 1
+
+
 def test_get_closed_trades_retorna_lista_vacia_sin_trades(mock_mt5, client):
     """Sin trades, debe retornar lista vacía."""
     mock_mt5.initialize.return_value = True
@@ -453,6 +768,22 @@ def test_get_closed_trades_retorna_lista_vacia_sin_trades(mock_mt5, client):
     assert trades == []
 
 
+def test_get_closed_trades_usa_rango_recibido_o_ultimas_24h(mock_mt5, client):
+    """El rango explícito se pasa tal cual; sin rango se consultan las últimas 24 horas."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.history_deals_get.return_value = []
+    client.connect()
+    
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 8)
+    client.get_closed_trades(start, end)
+    assert mock_mt5.history_deals_get.call_args[0] == (start, end)
+    
+    client.get_closed_trades(to_date=end)
+    assert mock_mt5.history_deals_get.call_args[0] == (datetime(2024, 1, 7), end)
+
+
 def test_get_closed_trades_construye_trades_completos(mock_mt5, client):
     """Debe agrupar deals de entrada y salida en trades completos."""
     mock_mt5.initialize.return_value = True
@@ -496,11 +827,57 @@ def test_get_closed_trades_construye_trades_completos(mock_mt5, client):
     assert trades[0].size == 0.1
 
 
+def test_get_closed_trades_ordena_por_cierre_y_omite_incompletos(mock_mt5, client):
+    """Los trades salen del más reciente al más antiguo y sin posiciones abiertas."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.DEAL_ENTRY_IN = 0
+    mock_mt5.DEAL_ENTRY_OUT = 1
+
+    def deal(position_id, entry, time, price):
+        return Mock(position_id=position_id, entry=entry, symbol="EURUSD", magic=1,
+                    comment="", time=time, price=price, volume=0.1, profit=1.0)
+
+    mock_mt5.history_deals_get.return_value = [
+        deal(1, 0, 1704067200, 1.10),
+        deal(2, 0, 1704067260, 1.20),
+        deal(3, 0, 1704067320, 1.30),  # Sigue abierta
+        deal(1, 1, 1704153600, 1.11),
+        deal(2, 1, 1704067800, 1.21),
+        deal(9, 2, 1704067900, 0.0),  # Deal de balance
+    ]
+
+    client.connect()
+    trades = client.get_closed_trades()
+
+    assert [t.entry_price for t in trades] == [1.10, 1.20]
+    assert trades[0].strategy_name == "Unknown"
+    assert trades[0].exit_time == datetime.fromtimestamp(1704153600)
+
+
 # =============================================================================
 # TESTS DE CACHE DE SYMBOL INFO
 # =============================================================================
 
 
+def test_warm_up_deja_en_cache_symbol_info_y_filling_mode(mock_mt5, client):
+    """Tras warm_up, la consulta de filling mode no vuelve a pedir SymbolInfo."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
+    mock_mt5.symbol_info.return_value = Mock(visible=True, filling_mode=1)
+    client.connect()
+    
+    client.warm_up(["EURUSD", "GBPUSD"])
+    calls = mock_mt5.symbol_info.call_count
+    client._get_filling_mode("EURUSD")
+    
+    assert calls == 2
+    assert mock_mt5.symbol_info.call_count == calls
+    assert mock_mt5.symbol_info_tick.call_count == 2
+
+
 def test_get_symbol_info_cachea_informacion(mock_mt5, client):
     """Debe cachear la información de símbolos para optimizar consultas."""
     mock_mt5.initialize.return_value = True
@@ -526,24 +903,82 @@ def test_get_symbol_info_cachea_informacion(mock_mt5, client):
     assert info1 == info2
 
 
+
+def test_get_symbol_info_expira_y_limita_tamano(mock_mt5, client):
+    """La cache caduca según SYMBOL_INFO_TTL y descarta el símbolo menos usado."""
+    mock_mt5.symbol_info.return_value = Mock(visible=True, spread=10, volume_min=0.01)
+    client.SYMBOL_INFO_CACHE_SIZE = 2
+
+    with patch('bot_trading.infrastructure.mt5_client.time.monotonic') as monotonic:
+        monotonic.return_value = 100.0
+        client._get_symbol_info("EURUSD")
+        client._get_symbol_info("GBPUSD")
+        client._get_symbol_info("EURUSD")  # Acierto: EURUSD pasa a ser el más reciente
+        client._get_symbol_info("USDJPY")  # Expulsa GBPUSD
+        assert list(client._symbol_info_cache) == ["EURUSD", "USDJPY"]
+        assert mock_mt5.symbol_info.call_count == 3
+
+        # Pasado el TTL se vuelve a consultar a MT5
+        monotonic.return_value = 100.0 + client.SYMBOL_INFO_TTL
+        client._get_symbol_info("EURUSD")
+        assert mock_mt5.symbol_info.call_count == 4
+
+
+
+def test_filling_mode_se_calcula_una_vez_por_simbolo(mock_mt5, client):
+    """El filling mode se guarda junto a SymbolInfo y no se recalcula."""
+    mock_mt5.symbol_info.return_value = Mock(
+        visible=True, spread=10, volume_min=0.01, filling_mode=2
+    )
+    resolve_real = client._resolve_filling_mode
+
+    with patch.object(client, "_resolve_filling_mode", wraps=resolve_real) as resolve:
+        first = client._get_filling_mode("EURUSD")
+        second = client._get_filling_mode("EURUSD")
+
+    assert first == second == mock_mt5.ORDER_FILLING_IOC
+    assert resolve.call_count == 1
+
+
 # =============================================================================
 # TESTS DE DESTRUCTOR
 # =============================================================================
 
 
 def test_destructor_cierra_conexion(mock_mt5, client):
-    """El destructor debe cerrar la conexión con MT5."""
+    """El destructor solo llama a mt5.shutdown(), con el módulo capturado."""
     mock_mt5.initialize.return_value = True
     mock_mt5.terminal_info.return_value = Mock()
     mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
     
     client.connect()
     assert client.connected is True
+    pool = client._ohlcv_executor()
+    
+    # Llamar destructor con el módulo mockeado en lugar del capturado
+    try:
+        client.__del__(mock_mt5)
+        
+        # Verificar que se cerró sin tocar el pool de descargas
+        mock_mt5.shutdown.assert_called_once()
+        assert client.connected is False
+        assert client._ohlcv_pool is pool
+    finally:
+        client.close()
+    mock_mt5.shutdown.assert_called_once()
+
+
+def test_context_manager_cierra_una_sola_vez(mock_mt5, client):
+    """Salir del bloque with cierra la conexión y close() posterior no repite."""
+    mock_mt5.initialize.return_value = True
+    mock_mt5.terminal_info.return_value = Mock()
+    mock_mt5.account_info.return_value = Mock(login=12345, balance=10000.0)
     
-    # Llamar destructor
-    client.__del__()
+    with client as ctx:
+        ctx.connect()
+        assert ctx.connected is True
     
-    # Verificar que se cerró
+    client.close()
     mock_mt5.shutdown.assert_called_once()
     assert client.connected is False
 
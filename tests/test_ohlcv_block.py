@@ -0,0 +1,43 @@
+"""Tests del bloque OHLCV en estructura de arrays."""
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from bot_trading.infrastructure.ohlcv_block import OHLCVBlock
+
+
+def _frame() -> pd.DataFrame:
+    index = pd.date_range("2024-01-01", periods=5, freq="1min", tz="UTC", name="datetime")
+    return pd.DataFrame(
+        {"open": np.arange(5.0), "high": np.arange(5.0) + 1, "low": np.arange(5.0) - 1,
+         "close": np.arange(5.0), "volume": np.arange(5, dtype=np.int64)},
+        index=index,
+    )
+
+
+def test_bloque_ida_y_vuelta_con_dataframe_sin_copias() -> None:
+    """from_frame y to_frame conservan velas, zona horaria y memoria."""
+    df = _frame()
+    block = OHLCVBlock.from_frame(df, "EURUSD")
+
+    assert block.tz == "UTC"
+    assert block.index.dtype == np.dtype("datetime64[ns]")
+    frame = block.to_frame()
+    pd.testing.assert_frame_equal(frame, df, check_freq=False)
+    assert frame.attrs["symbol"] == "EURUSD"
+    assert np.shares_memory(frame["close"].to_numpy(), block.close)
+
+
+def test_slice_devuelve_vistas_del_rango_incluido() -> None:
+    """slice selecciona [start, end] por búsqueda binaria sin copiar columnas."""
+    block = OHLCVBlock.from_frame(_frame(), "EURUSD")
+
+    part = block.slice(
+        datetime(2024, 1, 1, 0, 1, tzinfo=timezone.utc),
+        datetime(2024, 1, 1, 0, 3, tzinfo=timezone.utc),
+    )
+
+    assert len(part) == 3
+    assert part.close.tolist() == [1.0, 2.0, 3.0]
+    assert np.shares_memory(part.close, block.close)
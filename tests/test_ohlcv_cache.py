@@ -0,0 +1,101 @@
+"""Tests de la cache Parquet de OHLCV."""
+import os
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from bot_trading.infrastructure import ohlcv_cache
+from bot_trading.infrastructure.ohlcv_cache import OHLCVCache
+
+
+def _frame() -> pd.DataFrame:
+    index = pd.DatetimeIndex(pd.date_range("2024-01-01", periods=3, freq="1min"), name="datetime")
+    return pd.DataFrame(
+        {"open": [1.0, 2.0, 3.0], "high": [1.0, 2.0, 3.0], "low": [1.0, 2.0, 3.0],
+         "close": [1.0, 2.0, 3.0], "volume": [1, 2, 3]},
+        index=index,
+    )
+
+
+def test_cache_sin_motor_parquet_lanza_import_error(tmp_path, monkeypatch) -> None:
+    """Sin pyarrow ni fastparquet la cache no puede crearse."""
+    monkeypatch.setattr(ohlcv_cache, "_HAS_PARQUET", False)
+
+    with pytest.raises(ImportError):
+        OHLCVCache(tmp_path)
+
+
+def test_cache_rango_historico_no_caduca_y_reciente_si(tmp_path) -> None:
+    """Un rango pasado se sirve siempre; uno reciente caduca tras una vela."""
+    pytest.importorskip("pyarrow")
+    cache = OHLCVCache(tmp_path)
+    df = _frame()
+
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    cache.put("EURUSD", "M1", start, end, df)
+    path = tmp_path / "EURUSD" / "M1" / "20240101T000000000000_20240102T000000000000.parquet"
+    os.utime(path, (0, 0))
+    pd.testing.assert_frame_equal(cache.get("EURUSD", "M1", start, end), df)
+
+    recent_end = datetime.now()
+    recent_start = recent_end - timedelta(hours=1)
+    cache.put("EURUSD", "M1", recent_start, recent_end, df)
+    assert cache.get("EURUSD", "M1", recent_start, recent_end) is not None
+    for stale in (tmp_path / "EURUSD" / "M1").iterdir():
+        os.utime(stale, (0, 0))
+    assert cache.get("EURUSD", "M1", recent_start, recent_end) is None
+
+
+class _BytesFrame:
+    """Sustituto mínimo de DataFrame para probar put sin motor Parquet."""
+
+    def to_parquet(self, path, compression=None) -> None:
+        with open(path, "wb") as handle:
+            handle.write(b"velas")
+
+
+def test_clave_de_cache_en_utc_y_distinta_para_fechas_sin_zona(tmp_path, monkeypatch) -> None:
+    """Misma hora en distinta zona comparte archivo; con y sin zona, no."""
+    monkeypatch.setattr(ohlcv_cache, "_HAS_PARQUET", True)
+    cache = OHLCVCache(tmp_path)
+    plus_two = timezone(timedelta(hours=2))
+
+    aware = cache._path(
+        "EURUSD", "M1",
+        datetime(2024, 1, 1, 10, tzinfo=plus_two), datetime(2024, 1, 1, 11, tzinfo=plus_two),
+        live=False,
+    )
+    utc = cache._path(
+        "EURUSD", "M1",
+        datetime(2024, 1, 1, 8, tzinfo=timezone.utc), datetime(2024, 1, 1, 9, tzinfo=timezone.utc),
+        live=False,
+    )
+    naive = cache._path(
+        "EURUSD", "M1", datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 9), live=False
+    )
+
+    assert aware == utc
+    assert naive != utc
+    assert cache._path(
+        "EURUSD", "M1", datetime(2024, 1, 1, 8, 0, 0, 1), datetime(2024, 1, 1, 9), live=False
+    ) != naive
+    with pytest.raises(ValueError):
+        cache._path("EURUSD", "M1", datetime(2024, 1, 1), datetime(2024, 1, 2, tzinfo=timezone.utc), live=False)
+
+
+def test_rangos_recientes_conservan_solo_el_ultimo(tmp_path, monkeypatch) -> None:
+    """Cada ciclo en directo sustituye el rango reciente anterior; los históricos se conservan."""
+    monkeypatch.setattr(ohlcv_cache, "_HAS_PARQUET", True)
+    cache = OHLCVCache(tmp_path)
+    now = datetime.now(timezone.utc)
+
+    cache.put("EURUSD", "M1", datetime(2024, 1, 1), datetime(2024, 1, 2), _BytesFrame())
+    for cycle in range(3):
+        end = now + timedelta(seconds=cycle)
+        cache.put("EURUSD", "M1", end - timedelta(hours=1), end, _BytesFrame())
+
+    names = sorted(path.name for path in (tmp_path / "EURUSD" / "M1").iterdir())
+    assert len(names) == 2
+    assert names[0].startswith("20240101")
+    assert names[1].startswith("live_")
@@ -1,6 +1,11 @@
 """Tests del ejecutor de órdenes."""
+from datetime import datetime, timezone
+
+import pytest
+
 from bot_trading.application.engine.order_executor import OrderExecutor
 from bot_trading.domain.entities import OrderRequest, OrderResult
+from bot_trading.main import FakeBroker as SimulatedBroker
 
 
 class FakeBroker:
@@ -28,3 +33,202 @@ def test_order_executor_envia_orden_y_interpreta_respuesta() -> None:
     assert broker.last_order == request
     assert result.success is True
     assert result.order_id == 1
+
+
+class FlakyBroker(FakeBroker):
+    """Broker simulado que falla con las órdenes de un símbolo concreto."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.sent: list[OrderRequest] = []
+
+    def send_market_order(self, order_request: OrderRequest) -> OrderResult:
+        if order_request.symbol == "BADSYM":
+            raise ValueError("Símbolo inválido")
+        self.sent.append(order_request)
+        return OrderResult(success=True, order_id=len(self.sent))
+
+
+def test_order_executor_execute_orders_continua_tras_error() -> None:
+    """Un error en una orden del lote no debe impedir enviar las siguientes."""
+    broker = FlakyBroker()
+    executor = OrderExecutor(broker)
+    requests = [
+        OrderRequest(symbol="BADSYM", volume=0.01, order_type="BUY", magic_number=1),
+        OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=1),
+    ]
+
+    results = executor.execute_orders(requests)
+
+    assert [r.success for r in results] == [False, True]
+    assert broker.sent == [requests[1]]
+    assert executor.has_open_position("EURUSD", magic_number=1)
+    assert not executor.has_open_position("BADSYM", magic_number=1)
+
+
+def test_order_executor_snapshot_refleja_posiciones_registradas() -> None:
+    """La instantánea debe contener (símbolo, magic_number) de cada posición abierta."""
+    executor = OrderExecutor(FakeBroker())
+    executor.execute_order(
+        OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=7)
+    )
+
+    snapshot = executor.get_open_positions_snapshot()
+
+    assert snapshot == frozenset({("EURUSD", 7)})
+
+
+def test_order_executor_indice_por_simbolo_se_mantiene_sincronizado() -> None:
+    """El índice por símbolo debe seguir a las altas y bajas de posiciones."""
+    executor = OrderExecutor(FakeBroker())
+    executor.execute_order(OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=1))
+    executor.execute_order(OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=2))
+    executor.execute_order(OrderRequest(symbol="GBPUSD", volume=0.01, order_type="SELL", magic_number=1))
+
+    assert executor.has_open_position("EURUSD") is True
+
+    executor.execute_order(OrderRequest(symbol="EURUSD", volume=0.01, order_type="CLOSE", magic_number=1))
+    assert executor._by_symbol["EURUSD"] == {"EURUSD_2"}
+
+    executor._remove_position("EURUSD")
+    assert executor.has_open_position("EURUSD") is False
+    assert "EURUSD" not in executor._by_symbol
+    assert executor.has_open_position("GBPUSD", magic_number=1) is True
+
+
+def test_order_executor_usa_open_time_del_ciclo() -> None:
+    """La posición registrada debe usar el instante del ciclo recibido."""
+    from datetime import datetime, timezone
+
+    executor = OrderExecutor(FakeBroker())
+    cycle_time = datetime(2023, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+    executor.execute_orders(
+        [OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=7)],
+        open_time=cycle_time,
+    )
+
+    assert executor.open_positions["EURUSD_7"].open_time == cycle_time
+
+
+class ConcurrentBroker(FakeBroker):
+    """Broker que exige envíos simultáneos de dos órdenes para responder."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        import threading
+
+        self.barrier = threading.Barrier(2, timeout=2)
+        self.lock = threading.Lock()
+        self.sent: list[tuple[str, str]] = []
+
+    def send_market_order(self, order_request: OrderRequest) -> OrderResult:
+        if order_request.order_type != "CLOSE":
+            self.barrier.wait()
+        with self.lock:
+            self.sent.append((order_request.symbol, order_request.order_type))
+        return OrderResult(success=True, order_id=len(self.sent))
+
+
+def test_order_executor_envio_paralelo_respeta_orden_por_posicion() -> None:
+    """En paralelo, el CLOSE de una posición se envía después de su BUY."""
+    broker = ConcurrentBroker()
+    executor = OrderExecutor(broker, max_parallel_orders=2)
+    orders = [
+        OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=1),
+        OrderRequest(symbol="EURUSD", volume=0.01, order_type="CLOSE", magic_number=1),
+        OrderRequest(symbol="GBPUSD", volume=0.01, order_type="SELL", magic_number=1),
+    ]
+
+    results = executor.execute_orders(orders)
+
+    # Los dos envíos de la primera ola solo terminan si se solapan (barrera)
+    assert [r.success for r in results] == [True, True, True]
+    assert broker.sent[-1] == ("EURUSD", "CLOSE")
+    assert executor.has_open_position("GBPUSD", magic_number=1)
+    assert not executor.has_open_position("EURUSD", magic_number=1)
+
+
+def test_order_executor_lote_usa_el_instante_del_ciclo() -> None:
+    """El lote entrega open_time al broker, que fecha aperturas y cierres con él."""
+    broker = SimulatedBroker()
+    executor = OrderExecutor(broker)
+    now = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+    executor.execute_orders(
+        [
+            OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=1),
+            OrderRequest(symbol="GBPUSD", volume=0.01, order_type="BUY", magic_number=1),
+            OrderRequest(symbol="EURUSD", volume=0.01, order_type="CLOSE", magic_number=1),
+        ],
+        now,
+    )
+
+    assert [p.open_time for p in broker.get_open_positions()] == [now]
+    assert [(t.entry_time, t.exit_time) for t in broker.get_closed_trades()] == [(now, now)]
+    assert [p.open_time for p in executor.open_positions.values()] == [now]
+
+
+def test_has_open_position_con_strategy_name_avisa_y_filtra_por_estrategia() -> None:
+    """strategy_name sin magic_number emite DeprecationWarning y conserva su filtro."""
+    executor = OrderExecutor(FakeBroker())
+    executor.execute_order(
+        OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=7, comment="trend-M1")
+    )
+
+    assert executor.has_open_position("EURUSD", "otra", 7)
+    assert not executor.has_open_position("EURUSD", "otra", 8)
+    with pytest.warns(DeprecationWarning):
+        assert executor.has_open_position("EURUSD", strategy_name="trend")
+    with pytest.warns(DeprecationWarning):
+        assert not executor.has_open_position("EURUSD", strategy_name="scalp")
+    with pytest.warns(DeprecationWarning):
+        assert not executor.has_open_position("GBPUSD", strategy_name="trend")
+
+    executor._remove_position("EURUSD", 7)
+    assert executor._by_strategy_prefix == {}
+
+
+class BatchBroker(FakeBroker):
+    """Broker con envío en lote configurable para simular fallos."""
+
+    def __init__(self, error: Exception | None = None, drop_last: bool = False) -> None:
+        super().__init__()
+        self.error = error
+        self.drop_last = drop_last
+
+    def send_market_orders(self, order_requests, now=None):
+        if self.error is not None:
+            raise self.error
+        results = [self.send_market_order(r) for r in order_requests]
+        return results[:-1] if self.drop_last else results
+
+
+def test_order_executor_lote_convierte_excepcion_en_resultados_fallidos() -> None:
+    """Un error del broker en el lote produce un resultado fallido por orden."""
+    executor = OrderExecutor(BatchBroker(error=ConnectionError("sin conexión")))
+    orders = [
+        OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=1),
+        OrderRequest(symbol="GBPUSD", volume=0.01, order_type="BUY", magic_number=1),
+    ]
+
+    results = executor.execute_orders(orders)
+
+    assert [r.success for r in results] == [False, False]
+    assert results[0].error_message == "sin conexión"
+    assert not executor.has_open_position("EURUSD")
+
+
+def test_order_executor_lote_incompleto_marca_las_ordenes_sin_resultado() -> None:
+    """Si el broker devuelve menos resultados, las órdenes restantes fallan."""
+    executor = OrderExecutor(BatchBroker(drop_last=True))
+    orders = [
+        OrderRequest(symbol="EURUSD", volume=0.01, order_type="BUY", magic_number=1),
+        OrderRequest(symbol="GBPUSD", volume=0.01, order_type="BUY", magic_number=1),
+    ]
+
+    results = executor.execute_orders(orders)
+
+    assert [r.success for r in results] == [True, False]
+    assert executor.has_open_position("EURUSD", magic_number=1)
+    assert not executor.has_open_position("GBPUSD", magic_number=1)
@@ -101,3 +101,75 @@ def test_risk_manager_drawdown_sin_trades() -> None:
     manager = RiskManager(RiskLimits(dd_global=10.0, initial_balance=100.0))
 
     assert manager.check_bot_risk_limits(trades) is True
+
+
+def test_risk_manager_drawdown_incremental_procesa_solo_trades_nuevos() -> None:
+    """El drawdown debe actualizarse al añadir trades y recalcularse si la lista cambia."""
+    trades = [_build_trade("EURUSD", "strat", 1000.0)]
+    manager = RiskManager(RiskLimits(dd_global=50.0, initial_balance=100.0))
+
+    assert manager.check_bot_risk_limits(trades) is True
+    assert manager._dd_state[("", "")].processed == 1
+
+    # Historial que crece por el final: solo se recorre el trade nuevo
+    trades.append(_build_trade("EURUSD", "strat", -600.0))
+    assert manager.check_bot_risk_limits(trades) is False
+    assert manager._dd_state[("", "")].processed == 2
+
+    # Una lista distinta invalida el estado acumulado
+    assert manager.check_bot_risk_limits([_build_trade("EURUSD", "strat", 10.0)]) is True
+
+
+def test_risk_manager_memoiza_comprobaciones_dentro_del_ciclo() -> None:
+    """Dentro de un ciclo, repetir una comprobación no recalcula el drawdown."""
+    trades = [
+        _build_trade("EURUSD", "strat", 500.0),
+        _build_trade("EURUSD", "strat", -350.0),
+    ]
+    manager = RiskManager(RiskLimits(dd_por_activo={"EURUSD": 50.0}, initial_balance=100.0))
+    calls = []
+    original = manager._calculate_drawdown
+
+    def counting_drawdown(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    manager._calculate_drawdown = counting_drawdown
+    manager.begin_cycle()
+
+    assert manager.check_symbol_risk_limits("EURUSD", trades) is False
+    assert manager.check_symbol_risk_limits("EURUSD", trades) is False
+    assert len(calls) == 1
+
+    # Un nuevo ciclo descarta los resultados memoizados
+    manager.begin_cycle()
+    manager.check_symbol_risk_limits("EURUSD", trades)
+    assert len(calls) == 2
+
+
+def test_risk_manager_drawdown_vectorizado_coincide_con_bucle() -> None:
+    """Con muchos trades (ruta NumPy) el drawdown debe coincidir con el cálculo trade a trade."""
+    pnls = [((i * 37) % 23 - 11) * 1.5 for i in range(500)]
+    trades = [_build_trade("EURUSD", "strat", pnl) for pnl in pnls]
+    manager = RiskManager(RiskLimits(initial_balance=100.0))
+
+    equity = max_equity = 100.0
+    expected = 0.0
+    for pnl in pnls:
+        equity += pnl
+        max_equity = max(max_equity, equity)
+        expected = max(expected, (max_equity - equity) / max_equity * 100)
+
+    assert abs(manager._calculate_drawdown(trades) - expected) < 1e-9
+
+
+def test_risk_manager_sin_limites_especializa_comprobaciones() -> None:
+    """Sin límites configurados las comprobaciones no calculan drawdown."""
+    manager = RiskManager(RiskLimits(dd_por_activo={"EURUSD": 50.0}))
+    trades = [_build_trade("GBPUSD", "strat", -10.0)]
+
+    assert "check_bot_risk_limits" in vars(manager)
+    assert "check_strategy_risk_limits" in vars(manager)
+    assert "check_symbol_risk_limits" not in vars(manager)
+    assert manager.check_bot_risk_limits(trades) is True
+    assert manager.check_strategy_risk_limits("strat", trades) is True
@@ -0,0 +1,137 @@
+"""Tests de la estrategia de ejemplo."""
+import numpy as np
+import pandas as pd
+
+from bot_trading.application.strategies.simple_example_strategy import SimpleExampleStrategy
+from bot_trading.domain.entities import MarketSnapshot
+
+
+def _frame(symbol: str, closes: list[float]) -> pd.DataFrame:
+    df = pd.DataFrame({"close": closes})
+    df.attrs["symbol"] = symbol
+    return df
+
+
+def test_generate_signals_batch_coincide_con_evaluacion_individual() -> None:
+    """El lote debe producir las mismas señales que evaluar símbolo a símbolo."""
+    strategy = SimpleExampleStrategy(
+        name="simple", timeframes=["M1"], allowed_symbols=["EURUSD", "GBPUSD", "USDJPY"]
+    )
+    closes = {
+        "EURUSD": [1.0, 1.1, 1.2],
+        "GBPUSD": [1.3, 1.2, 1.1],
+        "USDJPY": [150.0, 149.0, 151.0],
+        "AUDUSD": [0.6, 0.61, 0.62],  # Sube, pero no está permitido
+    }
+
+    expected = [
+        signal
+        for symbol, values in closes.items()
+        for signal in strategy.generate_signals({"M1": _frame(symbol, values)})
+    ]
+    batch = strategy.generate_signals_batch(
+        np.array(list(closes.values()), dtype=np.float64), list(closes)
+    )
+
+    assert batch == expected
+    assert [s.symbol for s in batch] == ["EURUSD", "USDJPY"]
+
+
+def test_generate_signals_batch_sin_velas_suficientes() -> None:
+    """Con menos de dos velas por fila el lote no genera señales."""
+    strategy = SimpleExampleStrategy(name="simple", timeframes=["M1"])
+
+    assert strategy.generate_signals_batch(np.ones((2, 1)), ["EURUSD", "GBPUSD"]) == []
+
+
+def test_multiplicadores_sl_tp_configurables() -> None:
+    """Los multiplicadores de SL/TP se aplican al último cierre."""
+    strategy = SimpleExampleStrategy(
+        name="simple", timeframes=["M1"], sl_multiplier=0.99, tp_multiplier=1.02
+    )
+
+    [signal] = strategy.generate_signals({"M1": _frame("EURUSD", [1.0, 2.0])})
+
+    assert signal.stop_loss == 2.0 * 0.99
+    assert signal.take_profit == 2.0 * 1.02
+
+
+def test_decision_reutilizada_si_la_vela_no_cambia() -> None:
+    """Con la misma última vela se devuelve la decisión cacheada."""
+    strategy = SimpleExampleStrategy(name="simple", timeframes=["M1"])
+    index = pd.date_range("2024-01-01", periods=2, freq="1min")
+    data = pd.DataFrame({"close": [1.0, 2.0]}, index=index)
+    data.attrs["symbol"] = "EURUSD"
+
+    first = strategy.generate_signals({"M1": data})
+    built = []
+    strategy._buy_signal = lambda *args: built.append(args)  # type: ignore[method-assign]
+
+    assert strategy.generate_signals({"M1": data}) == first
+    assert built == []
+
+    # La vela en formación cambia de cierre: se vuelve a evaluar
+    data.iloc[-1, 0] = 0.5
+    assert strategy.generate_signals({"M1": data}) == []
+
+
+def test_usa_el_simbolo_del_snapshot() -> None:
+    """Con un MarketSnapshot el símbolo se toma del snapshot, no de attrs."""
+    strategy = SimpleExampleStrategy(name="simple", timeframes=["M1"])
+    snapshot = MarketSnapshot("GBPUSD", {"M1": pd.DataFrame({"close": [1.0, 2.0]})})
+
+    [signal] = strategy.generate_signals(snapshot)
+
+    assert signal.symbol == "GBPUSD"
+    assert snapshot.frames is snapshot
+
+
+
+
+def test_cache_de_decisiones_segura_entre_hilos(monkeypatch) -> None:
+    """Varios hilos evaluando símbolos distintos no rompen la expulsión de la caché."""
+    import threading
+    import time
+
+    from bot_trading.application.strategies import simple_example_strategy
+
+    class SlowIterDict(dict):
+        """Dict que se detiene al iterar para abrir la ventana de carrera."""
+
+        def __iter__(self):
+            keys = list(dict.__iter__(self))
+            time.sleep(0.002)
+            return iter(keys)
+
+    # Caché diminuta para que cada escritura nueva expulse una entrada
+    monkeypatch.setattr(simple_example_strategy, "_DECISION_CACHE_SIZE", 2)
+    strategy = SimpleExampleStrategy(name="simple", timeframes=["M1"])
+    strategy._decision_cache = SlowIterDict()
+    index = pd.date_range("2024-01-01", periods=2, freq="1min")
+    start = threading.Event()
+    errors: list[BaseException] = []
+    results: list[int] = []
+
+    def worker(worker_id: int) -> None:
+        frames = []
+        for i in range(4):
+            df = pd.DataFrame({"close": [1.0, 2.0 + i]}, index=index)
+            df.attrs["symbol"] = f"SYM{worker_id}_{i}"
+            frames.append({"M1": df})
+        start.wait()
+        try:
+            for frame in frames * 3:
+                results.append(len(strategy.generate_signals(frame)))
+        except BaseException as exc:  # noqa: BLE001 - se comprueba abajo
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert errors == []
+    assert results == [1] * 96
+    assert len(strategy._decision_cache) <= 2
@@ -0,0 +1,102 @@
+"""Tests del almacén columnar de trades."""
+from datetime import datetime, timedelta
+
+from bot_trading.application.risk_management import RiskManager
+from bot_trading.application.trade_store import TradeStore
+from bot_trading.domain.entities import RiskLimits, TradeRecord
+
+
+def _build_trade(symbol: str, strategy: str, pnl: float, minute: int) -> TradeRecord:
+    exit_time = datetime(2023, 1, 1) + timedelta(minutes=minute)
+    return TradeRecord(
+        symbol=symbol,
+        strategy_name=strategy,
+        entry_time=exit_time - timedelta(minutes=1),
+        exit_time=exit_time,
+        entry_price=1.0,
+        exit_price=1.0,
+        size=1.0,
+        pnl=pnl,
+        stop_loss=None,
+        take_profit=None,
+    )
+
+
+def test_trade_store_filtra_pnl_por_simbolo_y_estrategia() -> None:
+    """Los filtros deben devolver el PnL del ámbito en orden cronológico."""
+    trades = [
+        _build_trade("EURUSD", "trend", 10.0, 1),
+        _build_trade("GBPUSD", "trend", -5.0, 2),
+        _build_trade("EURUSD", "scalp", 3.0, 3),
+    ]
+    store = TradeStore(trades)
+
+    assert len(store) == 3
+    assert list(store.pnl_array()) == [10.0, -5.0, 3.0]
+    assert list(store.pnl_for_symbol("EURUSD")) == [10.0, 3.0]
+    assert list(store.pnl_for_strategy("trend")) == [10.0, -5.0]
+    assert len(store.pnl_for_symbol("USDJPY")) == 0
+
+
+def test_trade_store_crece_y_conserva_los_datos() -> None:
+    """Al superar la capacidad inicial no deben perderse trades."""
+    store = TradeStore()
+    for minute in range(200):
+        store.add(_build_trade("EURUSD", "trend", float(minute), minute))
+
+    assert len(store) == 200
+    assert store.pnl_array()[-1] == 199.0
+    assert store.exit_times_ns()[1] - store.exit_times_ns()[0] == 60 * 10**9
+
+
+def test_risk_manager_acepta_pnl_columnar_del_trade_store() -> None:
+    """El drawdown sobre el array de PnL debe coincidir con el de la lista."""
+    trades = [
+        _build_trade("EURUSD", "trend", 500.0, 1),
+        _build_trade("EURUSD", "trend", -350.0, 2),
+    ]
+    store = TradeStore(trades)
+    manager = RiskManager(RiskLimits(dd_por_activo={"EURUSD": 50.0}, initial_balance=100.0))
+
+    assert manager.check_symbol_risk_limits("EURUSD", store.pnl_for_symbol("EURUSD")) is False
+    assert manager._calculate_drawdown(store.pnl_array()) == manager._calculate_drawdown(trades)
+
+
+def test_trade_store_inserta_trades_desordenados_por_cierre() -> None:
+    """Un trade con cierre anterior al último debe quedar en su posición."""
+    late = _build_trade("EURUSD", "trend", 1.0, 10)
+    early = _build_trade("GBPUSD", "trend", 2.0, 5)
+    store = TradeStore([late])
+
+    store.add(early)
+
+    assert list(store.pnl_array()) == [2.0, 1.0]
+    assert store.exit_times_ns()[0] < store.exit_times_ns()[1]
+    assert list(store.pnl_for_strategy("trend")) == [2.0, 1.0]
+    assert list(store.pnl_for_symbol("EURUSD")) == [1.0]
+
+
+def test_risk_manager_drawdown_incremental_sobre_arrays_del_trade_store() -> None:
+    """Con generación, solo se procesa la cola nueva y una inserción desordenada recalcula."""
+    store = TradeStore([_build_trade("EURUSD", "trend", 50.0, 1)])
+    manager = RiskManager(RiskLimits(dd_por_activo={"EURUSD": 90.0}, initial_balance=100.0))
+
+    manager.begin_cycle(store.generation)
+    manager.check_symbol_risk_limits("EURUSD", store.pnl_for_symbol("EURUSD"))
+    store.add(_build_trade("EURUSD", "trend", -75.0, 2))
+    manager.begin_cycle(store.generation)
+    manager.check_symbol_risk_limits("EURUSD", store.pnl_for_symbol("EURUSD"))
+
+    state = manager._dd_state[("symbol", "EURUSD")]
+    assert state.processed == 2
+    assert state.max_drawdown == 50.0
+
+    # Trade con cierre anterior: cambia la generación y el ámbito se recalcula
+    store.add(_build_trade("EURUSD", "trend", -100.0, 0))
+    assert store.generation == 1
+    manager.begin_cycle(store.generation)
+    assert manager.check_symbol_risk_limits("EURUSD", store.pnl_for_symbol("EURUSD")) is False
+    state = manager._dd_state[("symbol", "EURUSD")]
+    assert state.generation == 1
+    assert state.processed == 3
+    assert state.max_drawdown == 125.0
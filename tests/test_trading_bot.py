@@ -1,5 +1,6 @@
 """Tests del motor principal del bot."""
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime, timedelta, timezone
 
 import pandas as pd
 
@@ -8,7 +9,7 @@ from bot_trading.application.engine.order_executor import OrderExecutor
 from bot_trading.application.risk_management import RiskManager
 from bot_trading.application.strategies.base import Strategy
 from bot_trading.application.engine.signals import Signal, SignalType
-from bot_trading.domain.entities import OrderResult, SymbolConfig, RiskLimits
+from bot_trading.domain.entities import OrderResult, SymbolConfig, RiskLimits, TradeRecord
 from bot_trading.infrastructure.data_fetcher import MarketDataService
 
 
@@ -76,3 +77,502 @@ def test_trading_bot_run_once_ejecuta_flujo_basico() -> None:
     bot.run_once(now=now)
 
     assert len(broker.orders_sent) == 1
+
+
+class BarrierBroker(FakeBroker):
+    """Broker cuya descarga solo avanza si varios símbolos se piden a la vez."""
+
+    def __init__(self, parties: int) -> None:
+        super().__init__()
+        self.barrier = threading.Barrier(parties, timeout=2)
+
+    def get_ohlcv(self, symbol: str, timeframe: str, start: datetime, end: datetime) -> pd.DataFrame:
+        self.barrier.wait()
+        return super().get_ohlcv(symbol, timeframe, start, end)
+
+
+class EchoStrategy:
+    """Estrategia que compra el símbolo recibido en attrs."""
+
+    name = "echo"
+    timeframes = ["M1"]
+
+    def generate_signals(self, data_by_timeframe):
+        symbol = data_by_timeframe["M1"].attrs["symbol"]
+        return [
+            Signal(
+                symbol=symbol,
+                strategy_name=self.name,
+                timeframe="M1",
+                signal_type=SignalType.BUY,
+                size=0.01,
+                stop_loss=None,
+                take_profit=None,
+            )
+        ]
+
+
+def test_trading_bot_run_once_descarga_simbolos_en_paralelo() -> None:
+    """Las descargas de distintos símbolos deben solaparse en el tiempo."""
+    broker = BarrierBroker(parties=2)
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[EchoStrategy()],
+        symbols=[
+            SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01),
+            SymbolConfig(name="GBPUSD", min_timeframe="M1", lot_size=0.01),
+        ],
+    )
+
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+
+    # Con descargas en serie la barrera expiraría y no se enviaría ninguna orden
+    assert [order.symbol for order in broker.orders_sent] == ["EURUSD", "GBPUSD"]
+
+
+def test_trading_bot_start_reutiliza_pool_entre_ciclos() -> None:
+    """Tras start() todos los ciclos deben usar el mismo pool de hilos."""
+    broker = FakeBroker()
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[DummyStrategy()],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+
+    bot.start()
+    executor = bot._executor
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+    bot.run_once(now=datetime(2023, 1, 1, 0, 11))
+
+    assert bot._executor is executor
+    bot.stop()
+    assert bot._executor is None
+
+
+class CountingBroker(FakeBroker):
+    """Broker que cuenta las descargas de datos solicitadas."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.ohlcv_calls = 0
+
+    def get_ohlcv(self, symbol: str, timeframe: str, start: datetime, end: datetime) -> pd.DataFrame:
+        self.ohlcv_calls += 1
+        return super().get_ohlcv(symbol, timeframe, start, end)
+
+
+class BlockAllStrategiesRiskManager(RiskManager):
+    """Gestor de riesgo que bloquea todas las estrategias."""
+
+    def check_strategy_risk_limits(self, strategy_name, trades) -> bool:
+        return False
+
+
+def test_trading_bot_no_descarga_datos_sin_estrategias_habilitadas() -> None:
+    """Si el riesgo bloquea todas las estrategias no se descargan datos."""
+    broker = CountingBroker()
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=BlockAllStrategiesRiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[DummyStrategy()],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+
+    assert broker.ohlcv_calls == 0
+    assert broker.orders_sent == []
+
+
+def test_trading_bot_recalcula_plan_si_cambian_las_estrategias() -> None:
+    """Añadir una estrategia en caliente debe actualizar los timeframes a descargar."""
+    broker = FakeBroker()
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[DummyStrategy()],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+    assert bot._fetch_plan["EURUSD"][0] == frozenset({"M1"})
+
+    extra = DummyStrategy()
+    extra.name = "dummy_m5"
+    extra.timeframes = ["M5"]
+    bot.strategies.append(extra)
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+
+    assert bot._fetch_plan["EURUSD"][0] == frozenset({"M1", "M5"})
+    assert "dummy_m5" in bot._magic_by_strategy
+
+
+class ThreadRecordingStrategy(DummyStrategy):
+    """Estrategia que registra el hilo en el que se evalúa."""
+
+    def __init__(self) -> None:
+        self.threads: list[str] = []
+
+    def generate_signals(self, data_by_timeframe):
+        self.threads.append(threading.current_thread().name)
+        return super().generate_signals(data_by_timeframe)
+
+
+def test_trading_bot_evalua_estrategias_en_el_pool_de_hilos() -> None:
+    """Las estrategias se evalúan en el pool y las órdenes se deduplican igual."""
+    broker = FakeBroker()
+    strategy = ThreadRecordingStrategy()
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[strategy],
+        symbols=[
+            SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01),
+            SymbolConfig(name="GBPUSD", min_timeframe="M1", lot_size=0.01),
+        ],
+    )
+
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+
+    assert len(strategy.threads) == 2
+    assert all(name.startswith("bot-worker") for name in strategy.threads)
+    # Ambos símbolos emiten la misma compra de EURUSD: solo se envía una orden
+    assert len(broker.orders_sent) == 1
+
+
+
+class RecordingEchoStrategy(EchoStrategy):
+    """Estrategia restringida que registra los símbolos en los que se evalúa."""
+
+    def __init__(self, name: str, allowed_symbols: list[str]) -> None:
+        self.name = name
+        self.allowed_symbols = allowed_symbols
+        self.evaluated: list[str] = []
+
+    def generate_signals(self, data_by_timeframe):
+        self.evaluated.append(data_by_timeframe["M1"].attrs["symbol"])
+        return super().generate_signals(data_by_timeframe)
+
+
+def test_trading_bot_solo_evalua_pares_permitidos() -> None:
+    """Una estrategia con allowed_symbols no se evalúa en otros símbolos."""
+    broker = FakeBroker()
+    momentum = RecordingEchoStrategy("momentum", ["EURUSD"])
+    trend = RecordingEchoStrategy("trend", ["GBPUSD"])
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[momentum, trend],
+        symbols=[
+            SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01),
+            SymbolConfig(name="GBPUSD", min_timeframe="M1", lot_size=0.01),
+        ],
+    )
+
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+
+    assert [(s.name, t.name) for s, t in bot._pairs] == [
+        ("EURUSD", "momentum"),
+        ("GBPUSD", "trend"),
+    ]
+    assert momentum.evaluated == ["EURUSD"]
+    assert trend.evaluated == ["GBPUSD"]
+    assert [order.symbol for order in broker.orders_sent] == ["EURUSD", "GBPUSD"]
+
+
+def test_trading_bot_detecta_estrategia_sustituida_en_el_sitio() -> None:
+    """Reemplazar un elemento de la lista sin cambiar su longitud recalcula los pares."""
+    broker = FakeBroker()
+    old = RecordingEchoStrategy("momentum", ["EURUSD"])
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[old],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+    new = RecordingEchoStrategy("momentum", ["EURUSD"])
+
+    bot.strategies[0] = new
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+
+    assert old.evaluated == []
+    assert new.evaluated == ["EURUSD"]
+
+
+class RepeatedSignalStrategy(DummyStrategy):
+    """Estrategia que emite dos compras y un cierre del mismo símbolo por ciclo."""
+
+    def generate_signals(self, data_by_timeframe):
+        buy = super().generate_signals(data_by_timeframe)[0]
+        close = Signal(
+            symbol=buy.symbol,
+            strategy_name=self.name,
+            timeframe="M1",
+            signal_type=SignalType.CLOSE,
+            size=0.01,
+            stop_loss=None,
+            take_profit=None,
+        )
+        return [buy, buy, close]
+
+
+def test_trading_bot_run_once_deduplica_ordenes_pendientes_del_ciclo() -> None:
+    """Las señales repetidas de un ciclo deben respetar las órdenes aún no enviadas."""
+    broker = FakeBroker()
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[RepeatedSignalStrategy()],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+
+    assert [order.order_type for order in broker.orders_sent] == ["BUY", "CLOSE"]
+
+
+def test_trading_bot_no_duplica_trades_del_historial_inicial() -> None:
+    """Los trades ya presentes en trade_history no deben añadirse de nuevo."""
+    trade = TradeRecord(
+        symbol="EURUSD",
+        strategy_name="dummy",
+        entry_time=datetime(2023, 1, 1, 0, 0),
+        exit_time=datetime(2023, 1, 1, 0, 5),
+        entry_price=1.0,
+        exit_price=1.0,
+        size=0.01,
+        pnl=0.0,
+        stop_loss=None,
+        take_profit=None,
+    )
+    broker = FakeBroker()
+    broker.get_closed_trades = lambda: [trade]
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[DummyStrategy()],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+        trade_history=[trade],
+    )
+
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+    bot.run_once(now=datetime(2023, 1, 1, 0, 11))
+
+    assert bot.trade_history == [trade]
+
+
+
+def test_trading_bot_trade_fallido_no_se_marca_como_conocido() -> None:
+    """Un trade que no puede insertarse no se pierde: se reintenta en el ciclo siguiente."""
+    def build_trade(exit_time: datetime) -> TradeRecord:
+        return TradeRecord(
+            symbol="EURUSD",
+            strategy_name="dummy",
+            entry_time=datetime(2023, 1, 1, 0, 0),
+            exit_time=exit_time,
+            entry_price=1.0,
+            exit_price=1.0,
+            size=0.01,
+            pnl=-1.0,
+            stop_loss=None,
+            take_profit=None,
+        )
+
+    naive = build_trade(datetime(2023, 1, 1, 0, 5))
+    # Fecha con zona horaria: no se puede ordenar frente a las fechas sin zona
+    aware = build_trade(datetime(2023, 1, 1, 0, 6, tzinfo=timezone.utc))
+    broker = FakeBroker()
+    broker.get_closed_trades = lambda: [naive, aware]
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[DummyStrategy()],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+
+    bot._update_trade_history()
+
+    assert bot.trade_history == [naive]
+    assert len(bot._trade_store) == 1
+    # La clave no queda registrada, así que el trade se reintenta en el siguiente ciclo
+    assert aware.trade_key not in bot._trade_keys
+
+class RecordingRiskManager(RiskManager):
+    """Gestor de riesgo que registra el PnL recibido por símbolo."""
+
+    def __init__(self, risk_limits) -> None:
+        super().__init__(risk_limits)
+        self.symbol_trades: dict[str, list] = {}
+
+    def check_symbol_risk_limits(self, symbol, trades) -> bool:
+        self.symbol_trades[symbol] = list(trades)
+        return super().check_symbol_risk_limits(symbol, trades)
+
+
+def test_trading_bot_pasa_trades_por_simbolo_al_riesgo() -> None:
+    """Cada símbolo debe evaluarse solo con el PnL de sus propios trades cerrados."""
+    def build_trade(symbol: str, minute: int, pnl: float) -> TradeRecord:
+        return TradeRecord(
+            symbol=symbol,
+            strategy_name="dummy",
+            entry_time=datetime(2023, 1, 1, 0, minute),
+            exit_time=datetime(2023, 1, 1, 0, minute + 1),
+            entry_price=1.0,
+            exit_price=1.0,
+            size=0.01,
+            pnl=pnl,
+            stop_loss=None,
+            take_profit=None,
+        )
+
+    eur_trade = build_trade("EURUSD", 0, 1.5)
+    gbp_trade = build_trade("GBPUSD", 2, -2.0)
+    broker = FakeBroker()
+    broker.get_closed_trades = lambda: [eur_trade, gbp_trade]
+    risk_manager = RecordingRiskManager(RiskLimits())
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=risk_manager,
+        order_executor=OrderExecutor(broker),
+        strategies=[DummyStrategy()],
+        symbols=[
+            SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01),
+            SymbolConfig(name="GBPUSD", min_timeframe="M1", lot_size=0.01),
+        ],
+    )
+
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+
+    assert risk_manager.symbol_trades == {"EURUSD": [1.5], "GBPUSD": [-2.0]}
+    assert list(bot._trade_store.pnl_for_strategy("dummy")) == [1.5, -2.0]
+
+
+def test_run_synchronized_espera_hasta_cierre_de_vela_mas_margen(monkeypatch) -> None:
+    """El bucle sincronizado debe dormir hasta el cierre de vela + wait_after_close."""
+    import time
+
+    broker = FakeBroker()
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[DummyStrategy()],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+    candle_close = 1_700_000_100.0  # Múltiplo exacto de 60 y de 300 segundos
+    sleeps: list[float] = []
+    cycle_times: list[datetime] = []
+
+    def stop_loop(now=None):
+        cycle_times.append(now)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(bot, "run_once", stop_loop)
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    # Dentro de la ventana de espera de la vela recién cerrada
+    monkeypatch.setattr(time, "time", lambda: candle_close + 2)
+    bot.run_synchronized(timeframe_minutes=1, wait_after_close=5)
+    # Pasada la ventana: se espera a la siguiente vela M5
+    monkeypatch.setattr(time, "time", lambda: candle_close + 7)
+    bot.run_synchronized(timeframe_minutes=5, wait_after_close=5)
+
+    assert sleeps == [3.0, 298.0]
+    # run_once recibe el instante planificado del ciclo
+    assert [t.timestamp() for t in cycle_times] == [candle_close + 5, candle_close + 305]
+
+
+def test_run_forever_programa_ciclos_en_instantes_fijos(monkeypatch) -> None:
+    """La duración de run_once no debe desplazar los siguientes ciclos."""
+    import time
+
+    broker = FakeBroker()
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[DummyStrategy()],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+    clock = [1000.0]
+    sleeps: list[float] = []
+    # Duración simulada de cada ciclo: normal, normal y uno que excede 2 periodos
+    durations = iter([5.0, 12.0, 130.0])
+
+    def fake_run_once(now=None):
+        try:
+            clock[0] += next(durations)
+        except StopIteration:
+            raise KeyboardInterrupt
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(bot, "run_once", fake_run_once)
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(time, "sleep", fake_sleep)
+
+    try:
+        bot.run_forever(sleep_seconds=60)
+    except KeyboardInterrupt:
+        pass
+
+    # Ciclos en t=1000, 1060, 1120; el tercero termina en 1250 y salta a 1300
+    assert sleeps == [55.0, 48.0, 50.0]
+
+
+def test_trading_bot_ordena_historial_por_cierre() -> None:
+    """Los trades cerrados deben quedar en el historial por orden de cierre."""
+    def build_trade(minute: int) -> TradeRecord:
+        return TradeRecord(
+            symbol="EURUSD",
+            strategy_name="dummy",
+            entry_time=datetime(2023, 1, 1, 0, 0),
+            exit_time=datetime(2023, 1, 1, 0, minute),
+            entry_price=1.0,
+            exit_price=1.0,
+            size=0.01,
+            pnl=float(minute),
+            stop_loss=None,
+            take_profit=None,
+        )
+
+    broker = FakeBroker()
+    broker.get_closed_trades = lambda: [build_trade(9), build_trade(3), build_trade(6)]
+    bot = TradingBot(
+        broker_client=broker,
+        market_data_service=MarketDataService(broker),
+        risk_manager=RiskManager(RiskLimits()),
+        order_executor=OrderExecutor(broker),
+        strategies=[DummyStrategy()],
+        symbols=[SymbolConfig(name="EURUSD", min_timeframe="M1", lot_size=0.01)],
+    )
+
+    bot.run_once(now=datetime(2023, 1, 1, 0, 10))
+
+    assert [t.pnl for t in bot.trade_history] == [3.0, 6.0, 9.0]
+    assert list(bot._trade_store.pnl_array()) == [3.0, 6.0, 9.0]